@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the hybrid search stack.
+
+Loads an index directory in-process (the same way serve_search.py does),
+runs a query set built from paper titles and quiz questions, and reports
+latency percentiles, QPS, vector recall@k against exhaustive Flat search,
+memory use and index load time as JSON.
+
+Unless --ollama is given no Ollama server is needed: each query
+is embedded as a noisy mean of the stored vectors of the paper it was taken
+from, so queries land where real ones would without a live model.
+"""
+import argparse
+import hashlib
+import json
+import platform
+import resource
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+import serve_search
+from search_engine_utils.embeddings_manager import EmbeddingsManager
+from search_engine_utils.paper_sqlite import PaperSqliteManager
+from search_engine_utils.query_cache import QueryEmbeddingCache
+
+
+class StubEmbeddings(Embeddings):
+    """Deterministic embeddings drawn from the stored vectors, for running without Ollama."""
+
+    def __init__(self, vectors: np.ndarray, anchors: Dict[str, List[int]], noise: float = 0.1):
+        """
+        Args:
+            vectors: Stored chunk vectors (rows of the FAISS index)
+            anchors: Query text -> rows it should land near (e.g. its paper's chunks)
+            noise: Gaussian noise added to each query, relative to its norm
+        """
+        self.vectors = vectors
+        self.anchors = anchors
+        self.noise = noise
+
+    def embed_query(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+        rng = np.random.default_rng(seed)
+        rows = self.anchors.get(text) or [int(rng.integers(len(self.vectors)))]
+        vector = np.asarray(self.vectors[sorted(rows)], dtype=np.float32).mean(axis=0)
+        scale = self.noise * np.linalg.norm(vector) / np.sqrt(len(vector))
+        return (vector + rng.normal(scale=scale, size=len(vector))).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def paper_rows(chunk_store, batch_size: int = 5000) -> Dict[str, List[int]]:
+    """Map each paper id to the FAISS rows of its chunks."""
+    rows_of: Dict[str, List[int]] = {}
+    for start in range(0, len(chunk_store), batch_size):
+        rows = range(start, min(start + batch_size, len(chunk_store)))
+        for row, doc in zip(rows, chunk_store.get_many(rows, metadata_fields=['paper_id'])):
+            paper_id = doc.metadata.get('paper_id')
+            if paper_id:
+                rows_of.setdefault(paper_id, []).append(row)
+    return rows_of
+
+
+def paper_queries(title: Optional[str], questions) -> List[str]:
+    """Title plus quiz question texts of one paper."""
+    queries = [title] if title else []
+    if isinstance(questions, dict):
+        questions = list(questions.values())
+    for question in questions or []:
+        if isinstance(question, dict):
+            question = question.get('question')
+        if isinstance(question, str) and question.strip():
+            queries.append(question.strip())
+    return queries
+
+
+def load_queries(
+    rows_of: Dict[str, List[int]],
+    paper_store,
+    summaries_file: Optional[Path] = None
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Build the query set as (query, paper_id) pairs.
+
+    Titles and quiz questions come from summaries_file if given, otherwise
+    from the paper store of the index.
+    """
+    queries = []
+    if summaries_file is not None:
+        with open(summaries_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                summary = json.loads(line)
+                paper_id = summary.get('url')
+                for query in paper_queries(summary.get('title'), summary.get('questions')):
+                    queries.append((query, paper_id))
+    else:
+        papers = paper_store.get_many(rows_of, fields=['title', 'questions'])
+        for paper_id in sorted(papers):
+            paper = papers[paper_id]
+            for query in paper_queries(paper.get('title'), paper.get('questions')):
+                queries.append((query, paper_id))
+    return queries
+
+
+def rss_mb() -> Dict[str, float]:
+    """Current (if available) and peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    peak_mb = peak / 1024 ** 2 if platform.system() == 'Darwin' else peak / 1024
+    usage = {'peak_rss_mb': round(peak_mb, 1)}
+    statm = Path('/proc/self/statm')
+    if statm.exists():
+        pages = int(statm.read_text().split()[1])
+        usage['rss_mb'] = round(pages * resource.getpagesize() / 1024 ** 2, 1)
+    return usage
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds."""
+    ms = np.asarray(seconds) * 1000
+    return {
+        'p50': round(float(np.percentile(ms, 50)), 3),
+        'p95': round(float(np.percentile(ms, 95)), 3),
+        'p99': round(float(np.percentile(ms, 99)), 3),
+        'mean': round(float(ms.mean()), 3),
+        'max': round(float(ms.max()), 3)
+    }
+
+
+def vector_recall(retriever, queries: List[str], vectors: np.ndarray, k: int) -> float:
+    """
+    Mean recall@k of the retriever's FAISS search against exhaustive Flat search.
+
+    Query vectors go through the same normalization as in _vector_search,
+    so both searches see identical inputs.
+    """
+    db = retriever.vector_store.db
+    query_vectors = np.array([retriever.query_cache.embed_query(q) for q in queries], dtype=np.float32)
+    if db._normalize_L2 or db.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    flat = faiss.IndexFlat(vectors.shape[1], db.index.metric_type)
+    for start in range(0, len(vectors), 100000):
+        flat.add(np.ascontiguousarray(vectors[start:start + 100000]))
+    _, exact = flat.search(query_vectors, k)
+    del flat
+
+    recalls = []
+    for query, expected in zip(queries, exact):
+        found, _ = retriever._vector_search(query, k)
+        recalls.append(len(set(found.tolist()) & set(expected.tolist())) / k)
+    return float(np.mean(recalls))
+
+
+def sqlite_ingest(summaries_file: Path) -> dict:
+    """Time a full papers SQLite rebuild (what --overwrite-db does) into a scratch directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = Path(tmp) / "papers.sqlite"
+        manager = PaperSqliteManager(summaries_file, sqlite_path, overwrite=True)
+        build_stats = manager.last_build
+        build_stats['db_mb'] = round(sqlite_path.stat().st_size / 1024 ** 2, 2)
+    return build_stats
+
+
+def run_benchmark(
+    index_dir: Path,
+    summaries_file: Optional[Path] = None,
+    k: int = 10,
+    candidate_k: Optional[int] = None,
+    num_queries: int = 1000,
+    warmup: int = 20,
+    stub_embeddings: bool = True,
+    noise: float = 0.1,
+    seed: int = 0,
+    ingest: bool = False
+) -> dict:
+    """
+    Load index_dir, run the query set and collect the metrics.
+
+    Returns:
+        JSON-serializable results
+    """
+    memory_before = rss_mb()
+    start = time.perf_counter()
+    serve_search.init_retriever(index_dir)
+    load_seconds = time.perf_counter() - start
+    memory_loaded = rss_mb()
+
+    retriever = serve_search.retriever
+    config = serve_search.config
+    chunk_store = retriever.documents
+    ntotal = retriever.vector_store.db.index.ntotal
+
+    vectors = EmbeddingsManager(index_dir).get_vectors()
+    if len(vectors) != ntotal:
+        logger.warning(f"Embedding store has {len(vectors)} rows, index has {ntotal}; skipping recall")
+        vectors = None
+
+    rows_of = paper_rows(chunk_store)
+    queries = load_queries(rows_of, serve_search.paper_store, summaries_file)
+    if not queries:
+        raise ValueError("No queries found (no titles or questions in the summaries / paper store)")
+    rng = np.random.default_rng(seed)
+    if len(queries) > num_queries + warmup:
+        picked = rng.choice(len(queries), num_queries + warmup, replace=False)
+        queries = [queries[i] for i in picked]
+    warmup_queries = [q for q, _ in queries[:warmup]]
+    queries = queries[warmup:]
+    texts = [q for q, _ in queries]
+    logger.info(f"Benchmarking {len(texts)} queries (+{len(warmup_queries)} warmup) at k={k}")
+
+    if stub_embeddings:
+        if vectors is None:
+            raise ValueError("--stub-embeddings needs the embedding store to match the index")
+        anchors = {query: rows_of[paper_id] for query, paper_id in queries if paper_id in rows_of}
+        client = StubEmbeddings(vectors, anchors, noise=noise)
+    else:
+        client = retriever.query_cache.embedding_client
+    # One client at a time: there is nothing to coalesce, so skip the batch window
+    retriever.query_cache = QueryEmbeddingCache(
+        client,
+        max_bytes=config.query_cache_mb * 1024 * 1024,
+        ttl_seconds=config.query_cache_ttl,
+        batch_window_ms=0
+    )
+
+    for query in warmup_queries:
+        retriever.similarity_search(query, k=k, candidate_k=candidate_k)
+
+    latencies = []
+    total_start = time.perf_counter()
+    for query in texts:
+        start = time.perf_counter()
+        retriever.similarity_search(query, k=k, candidate_k=candidate_k)
+        latencies.append(time.perf_counter() - start)
+    total_seconds = time.perf_counter() - total_start
+    memory_queried = rss_mb()
+    cache_stats = retriever.query_cache.stats()
+
+    # Computed last: the exhaustive search holds a full copy of the vectors
+    recall = vector_recall(retriever, texts, vectors, min(k, ntotal)) if vectors is not None else None
+
+    index_file = index_dir / "index.faiss"
+    results = {
+        'index_dir': str(index_dir),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': asdict(config),
+        'params': {
+            'k': k,
+            'candidate_k': retriever.candidate_k if candidate_k is None else candidate_k,
+            'num_queries': len(texts),
+            'warmup': len(warmup_queries),
+            'stub_embeddings': stub_embeddings,
+            'noise': noise if stub_embeddings else None,
+            'seed': seed
+        },
+        'index': {
+            'type': config.faiss_index_type,
+            'metric': config.faiss_metric,
+            'ntotal': ntotal,
+            'faiss_file_mb': round(index_file.stat().st_size / 1024 ** 2, 2),
+            'load_seconds': round(load_seconds, 3)
+        },
+        'latency_ms': latency_summary(latencies),
+        'qps': round(len(texts) / total_seconds, 2),
+        f'recall_at_{k}': round(recall, 4) if recall is not None else None,
+        'memory_mb': {
+            'before_load': memory_before,
+            'after_load': memory_loaded,
+            'after_queries': memory_queried
+        },
+        'query_embedding_cache': cache_stats
+    }
+    if ingest:
+        results['sqlite_ingest'] = sqlite_ingest(summaries_file)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search latency, throughput and recall offline")
+    parser.add_argument(
+        '--index-dir',
+        type=Path,
+        required=True,
+        help='Path to index directory'
+    )
+    parser.add_argument(
+        '--summaries-path',
+        type=Path,
+        default=None,
+        help='Take queries from this summaries.jsonl (default: titles/questions in the index paper store)'
+    )
+    parser.add_argument(
+        '--k',
+        type=int,
+        default=10,
+        help='Results per query, also the k of recall@k (default: 10)'
+    )
+    parser.add_argument(
+        '--candidate-k',
+        type=int,
+        default=None,
+        help='Fusion candidates per query (default: search_candidates from config; 0 = full scan)'
+    )
+    parser.add_argument(
+        '--num-queries',
+        type=int,
+        default=1000,
+        help='Number of timed queries (default: 1000)'
+    )
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        default=20,
+        help='Untimed warmup queries (default: 20)'
+    )
+    parser.add_argument(
+        '--ollama',
+        action='store_true',
+        help='Embed queries with Ollama instead of the stub client'
+    )
+    parser.add_argument(
+        '--noise',
+        type=float,
+        default=0.1,
+        help='Relative noise of stub query vectors (default: 0.1)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed for query sampling (default: 0)'
+    )
+    parser.add_argument(
+        '--sqlite-ingest',
+        action='store_true',
+        help='Also time a papers SQLite rebuild from --summaries-path (rows/sec)'
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=None,
+        help='Write the JSON results to this file (default: stdout only)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.index_dir.exists():
+        logger.error(f"Index directory not found: {args.index_dir}")
+        return
+    if args.sqlite_ingest and args.summaries_path is None:
+        logger.error("--sqlite-ingest needs --summaries-path")
+        return
+
+    results = run_benchmark(
+        args.index_dir,
+        summaries_file=args.summaries_path,
+        k=args.k,
+        candidate_k=args.candidate_k,
+        num_queries=args.num_queries,
+        warmup=args.warmup,
+        stub_embeddings=not args.ollama,
+        noise=args.noise,
+        seed=args.seed,
+        ingest=args.sqlite_ingest
+    )
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + '\n', encoding='utf-8')
+        logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
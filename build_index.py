@@ -6,20 +6,35 @@ Supports incremental updates - only processes new papers not in the existing ind
 """
 import argparse
 import json
+import queue
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Set, Tuple
 from loguru import logger
 
+import numpy as np
 from ollama import Client
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
 from langchain_ollama import OllamaEmbeddings
 
-from utils.arxiv_utils import download_paper_text
-from search_engine_utils.config import SearchEngineConfig
-from search_engine_utils.embeddings_manager import EmbeddingsManager
+from utils.arxiv_utils import (
+    download_paper_text, extract_paper_text, fetch_paper_pdf, get_cached_paper_text, get_pdf_store
+)
+from search_engine_utils.bm25_index import BM25_DIR_NAME, BM25Index, corpus_fingerprint
+from search_engine_utils.chunk_store import CHUNKS_DB_NAME, ChunkStore, faiss_documents
+from search_engine_utils.config import INDEX_LAYOUT_FIELDS, SearchEngineConfig
+from search_engine_utils.embedding_cache import CachedEmbeddings, EmbeddingCache
+from search_engine_utils.embeddings_manager import EmbeddingsManager, l2_normalize
+from search_engine_utils.faiss_vectorstore import faiss_store_kwargs
+from search_engine_utils.paper_metadata import PaperMetadataStore, paper_store_path
 
 
 def clean_text(text: str) -> str:
@@ -102,23 +117,14 @@ def save_processed_papers(index_dir: Path, processed_urls: Set[str]):
         json.dump({'processed_urls': list(processed_urls)}, f, indent=2)
 
 
-def create_chunks_from_paper(
-    summary: Dict[str, Any],
-    config: SearchEngineConfig,
-    all_fields: Set[str]
-) -> List[Document]:
+def build_paper_metadata(summary: Dict[str, Any], all_fields: Set[str]) -> Dict[str, Any]:
     """
-    Create document chunks from a paper.
+    Paper-level metadata for the paper store (every field, None if missing).
 
-    Chunks both the original PDF text and the summary content.
+    Args:
+        summary: Paper entry from summaries.jsonl
+        all_fields: Metadata fields every paper carries
     """
-    documents = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config.chunk_size,
-        chunk_overlap=config.chunk_overlap
-    )
-
-    # Create metadata with all possible fields (None if missing)
     # Clean metadata string values
     metadata = {}
     for field in all_fields:
@@ -146,9 +152,36 @@ def create_chunks_from_paper(
                 logger.warning(f"Failed to load notes for {date_added}: {e}")
 
     metadata['personal_notes'] = personal_notes
+    return metadata
+
+
+def create_chunks_from_paper(
+    summary: Dict[str, Any],
+    config: SearchEngineConfig,
+    pdf_result: Optional[Dict[str, Any]] = None
+) -> List[Document]:
+    """
+    Create document chunks from a paper.
+
+    Chunks both the original PDF text and the summary content. Chunk
+    metadata only identifies the paper (paper_id = URL) and the chunk;
+    paper fields are stored once in the paper store (see build_paper_metadata).
+
+    Args:
+        summary: Paper entry from summaries.jsonl
+        config: Search engine configuration
+        pdf_result: Already extracted PDF text (download_paper_text format);
+            downloaded here if None
+    """
+    documents = []
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap
+    )
 
     url = summary.get('url', '')
     arxiv_id = extract_arxiv_id(url)
+    metadata = {'paper_id': url}
 
     # Chunk 1: Summary content (already concise, AI-generated)
     summary_content = summary.get('content', '')
@@ -172,8 +205,10 @@ def create_chunks_from_paper(
 
     # Chunk 2: Original PDF text (if arxiv_id available)
     if arxiv_id:
-        logger.info(f"Downloading PDF for {arxiv_id}")
-        result = download_paper_text(arxiv_id)
+        if pdf_result is None:
+            logger.info(f"Downloading PDF for {arxiv_id}")
+            pdf_result = download_paper_text(arxiv_id)
+        result = pdf_result
 
         if result['success']:
             pdf_text = result['text']
@@ -202,20 +237,221 @@ def create_chunks_from_paper(
     return documents
 
 
+class StageStats:
+    """Throughput counters for one ingest stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.units = 0  # bytes for downloads, chunks for parse/embed
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, units: int = 0):
+        with self._lock:
+            self.items += 1
+            self.units += units
+            self.busy_seconds += elapsed
+
+    def report(self, wall_seconds: float, unit_name: str):
+        per_item = self.busy_seconds / self.items if self.items else 0.0
+        logger.info(
+            f"  {self.name:<9} {self.items:>5} items, {self.units:>10} {unit_name} | "
+            f"{self.items / wall_seconds if wall_seconds else 0:.2f} items/s wall, "
+            f"{per_item:.2f}s busy per item"
+        )
+
+
+def _timed_call(fn, *args):
+    """Run fn(*args) and return (result, elapsed seconds); picklable for the process pool."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def download_stage(summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Thread-pool stage: fetch raw PDF bytes (None if the paper has no arXiv id).
+
+    Papers whose text is already in the PDF store come back with 'text' set,
+    so the parse stage can skip pypdf.
+    """
+    arxiv_id = extract_arxiv_id(summary.get('url', ''))
+    if not arxiv_id:
+        return None
+    cached = get_cached_paper_text(arxiv_id, count_miss=False)
+    if cached is not None:
+        return cached
+    logger.info(f"Downloading PDF for {arxiv_id}")
+    return fetch_paper_pdf(arxiv_id)
+
+
+def parse_stage(
+    summary: Dict[str, Any],
+    config: SearchEngineConfig,
+    download: Optional[Dict[str, Any]]
+) -> List[Document]:
+    """Process-pool stage: extract PDF text with pypdf and chunk the paper."""
+    pdf_result = None
+    if download is not None:
+        if 'text' in download:
+            pdf_result = download
+        elif download['success']:
+            arxiv_id = extract_arxiv_id(summary.get('url', ''))
+            pdf_result = extract_paper_text(arxiv_id, download['content'], download['pdf_url'])
+        else:
+            pdf_result = {**download, 'text': None, 'pages': 0}
+    return create_chunks_from_paper(summary, config, pdf_result=pdf_result)
+
+
+def iter_paper_chunks(
+    summaries: List[Dict[str, Any]],
+    config: SearchEngineConfig
+) -> Iterator[Tuple[Dict[str, Any], Optional[List[Document]]]]:
+    """
+    Chunk papers one at a time (download, parse and chunk in this thread).
+
+    Yields:
+        (summary, documents) pairs; documents is None if processing failed
+    """
+    for summary in summaries:
+        title = summary.get('title', 'unknown')
+        try:
+            logger.info(f"Processing: {title}")
+            yield summary, create_chunks_from_paper(summary, config)
+        except Exception as e:
+            logger.error(f"✗ Error processing {title}: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            yield summary, None
+
+
+def iter_paper_chunks_pipelined(
+    summaries: List[Dict[str, Any]],
+    config: SearchEngineConfig,
+    stats: Dict[str, StageStats],
+    download_workers: int = 4,
+    parse_workers: int = 2,
+    max_pending: int = 16
+) -> Iterator[Tuple[Dict[str, Any], Optional[List[Document]]]]:
+    """
+    Chunk papers with overlapping download and parse stages.
+
+    Downloads run in a thread pool and feed a process pool that extracts PDF
+    text and chunks it. At most max_pending papers are in flight, so a slow
+    consumer (embedding) applies backpressure instead of buffering the whole
+    corpus. Papers are yielded in completion order.
+
+    Yields:
+        (summary, documents) pairs; documents is None if processing failed
+    """
+    ready = queue.Queue()
+
+    with ThreadPoolExecutor(max_workers=download_workers) as downloads, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+
+        def on_parsed(summary, future):
+            ready.put((summary, future))
+
+        def on_downloaded(summary, future):
+            try:
+                download, elapsed = future.result()
+                content = (download or {}).get('content') or b''
+                stats['download'].record(elapsed, len(content))
+                parsed = parsers.submit(_timed_call, parse_stage, summary, config, download)
+            except Exception as e:
+                parsed = Future()
+                parsed.set_exception(e)
+            parsed.add_done_callback(lambda f: on_parsed(summary, f))
+
+        remaining = iter(summaries)
+        in_flight = 0
+        exhausted = False
+
+        while True:
+            # Keep up to max_pending papers in the download/parse stages
+            while not exhausted and in_flight < max_pending:
+                summary = next(remaining, None)
+                if summary is None:
+                    exhausted = True
+                    break
+                future = downloads.submit(_timed_call, download_stage, summary)
+                future.add_done_callback(lambda f, s=summary: on_downloaded(s, f))
+                in_flight += 1
+
+            if in_flight == 0:
+                break
+
+            summary, future = ready.get()
+            in_flight -= 1
+            title = summary.get('title', 'unknown')
+            try:
+                docs, elapsed = future.result()
+                stats['parse'].record(elapsed, len(docs))
+                logger.info(f"Processed: {title}")
+                yield summary, docs
+            except Exception as e:
+                logger.error(f"✗ Error processing {title}: {e}")
+                yield summary, None
+
+
+def add_to_index(
+    db: FAISS,
+    text_embeddings: Iterable[Tuple[str, Sequence[float]]],
+    metadatas: List[Dict[str, Any]],
+    embedding_client: Embeddings,
+    metric: str = "IP"
+) -> FAISS:
+    """
+    Append vectors to the FAISS index (creating it on first use).
+
+    Uses index.add via FAISS.add_embeddings, which works for Flat, HNSW and
+    trained IVF indexes, so the existing index type is kept. A new index
+    uses the given metric; for "IP" the vectors must already be normalized.
+    """
+    text_embeddings = list(text_embeddings)
+    if db is None:
+        return FAISS.from_embeddings(
+            text_embeddings=text_embeddings,
+            embedding=embedding_client,
+            metadatas=metadatas,
+            **faiss_store_kwargs(metric)
+        )
+    db.add_embeddings(text_embeddings=text_embeddings, metadatas=metadatas)
+    return db
+
+
 def build_index(
     summaries_file: Path = Path("summaries.jsonl"),
     config: SearchEngineConfig = None,
     force_rebuild: bool = False,
-    batch_size: int = 3
+    batch_size: int = 3,
+    checkpoint_every: int = 10,
+    pipeline: bool = False,
+    download_workers: int = 4,
+    parse_workers: int = 2,
+    embed_workers: int = 1,
+    max_pending: int = 16
 ):
     """
     Build or update the vector database index.
 
+    New vectors are appended to the loaded FAISS index instead of rebuilding
+    it from all saved embeddings. The embedding store is the source of truth:
+    if the saved index is behind it (e.g. a crash between checkpoints), the
+    missing rows are appended from the store on the next run.
+
     Args:
         summaries_file: Path to summaries JSONL file
         config: Search engine configuration
         force_rebuild: If True, rebuild from scratch instead of incremental update
-        batch_size: Number of papers to process before saving (default: 3)
+        batch_size: Number of papers to process before saving embeddings (default: 3)
+        checkpoint_every: Save the FAISS index every N batches (default: 10)
+        pipeline: Overlap PDF downloads, parsing and embedding calls
+        download_workers: Download threads in pipeline mode (default: 4)
+        parse_workers: PDF parsing/chunking processes in pipeline mode (default: 2)
+        embed_workers: Concurrent embedding calls (default: 1)
+        max_pending: Papers in flight between download and embedding (default: 16)
     """
     if config is None:
         config = SearchEngineConfig()
@@ -224,6 +460,19 @@ def build_index(
     index_dir = config.get_index_dir()
     index_dir.mkdir(parents=True, exist_ok=True)
 
+    # An existing index keeps the layout it was built with (type, metric, parameters)
+    config_file = index_dir / "config.json"
+    if not force_rebuild and (index_dir / "index.faiss").exists() and config_file.exists():
+        existing = SearchEngineConfig.load(config_file)
+        for field in INDEX_LAYOUT_FIELDS:
+            existing_value = getattr(existing, field)
+            if existing_value != getattr(config, field):
+                logger.warning(
+                    f"Existing index uses {field}={existing_value}, keeping it "
+                    f"(use rebuild_faiss.py or --force-rebuild to change)"
+                )
+                setattr(config, field, existing_value)
+
     # Save config
     config.save(index_dir / "config.json")
     logger.info(f"Index directory: {index_dir}")
@@ -238,9 +487,9 @@ def build_index(
     if force_rebuild:
         processed_urls = set()
         logger.info("Force rebuild mode - processing all papers")
-        # Delete existing index if force rebuild
+        # Delete existing index and saved embeddings if force rebuild
         index_file = index_dir / "index.faiss"
-        if index_file.exists():
+        if index_file.exists() or (index_dir / "embeddings").exists():
             import shutil
             shutil.rmtree(index_dir)
             index_dir.mkdir(parents=True, exist_ok=True)
@@ -253,16 +502,19 @@ def build_index(
     new_summaries = [s for s in summaries if s.get('url') not in processed_urls]
     logger.info(f"Found {len(new_summaries)} new papers to process")
 
-    if not new_summaries:
-        logger.info("No new papers to process. Index is up to date.")
-        return
-
     # Initialize embedding client
-    embedding_client = OllamaEmbeddings(
-        model=config.embedding_model,
-        base_url=config.ollama_host
+    embedding_client = CachedEmbeddings(
+        OllamaEmbeddings(
+            model=config.embedding_model,
+            base_url=config.ollama_host
+        ),
+        EmbeddingCache(config.get_embedding_cache_dir(), config.embedding_model)
     )
 
+    # Initialize embeddings manager and paper metadata store
+    emb_manager = EmbeddingsManager(index_dir, normalize=config.faiss_metric == "IP")
+    paper_store = PaperMetadataStore(paper_store_path(index_dir))
+
     # Load or initialize FAISS index
     index_file = index_dir / "index.faiss"
     db = None
@@ -271,43 +523,122 @@ def build_index(
         db = FAISS.load_local(
             str(index_dir),
             embedding_client,
-            allow_dangerous_deserialization=True
+            allow_dangerous_deserialization=True,
+            **faiss_store_kwargs(config.faiss_metric)
+        )
+
+    # Catch up with embeddings saved after the last checkpoint
+    indexed = db.index.ntotal if db is not None else 0
+    if emb_manager.get_total_chunks() > indexed:
+        logger.info(f"Index has {indexed}/{emb_manager.get_total_chunks()} saved embeddings, appending the rest...")
+        seen = 0
+        for batch_texts, batch_emb, batch_meta in emb_manager.iter_all_embeddings(batch_size=1000):
+            skip = min(max(indexed - seen, 0), len(batch_texts))
+            seen += len(batch_texts)
+            if skip < len(batch_texts):
+                db = add_to_index(
+                    db, zip(batch_texts[skip:], batch_emb[skip:]), batch_meta[skip:], embedding_client,
+                    metric=config.faiss_metric
+                )
+        db.save_local(str(index_dir))
+    elif emb_manager.get_total_chunks() < indexed:
+        logger.warning(
+            f"FAISS index has {indexed} rows but only {emb_manager.get_total_chunks()} embeddings are saved; "
+            f"run with --force-rebuild if search results look wrong"
+        )
+
+    if not new_summaries:
+        logger.info("No new papers to process. Index is up to date.")
+        return
+
+    # Produce chunks per paper, either sequentially or through the pipeline
+    stats = {name: StageStats(name) for name in ('download', 'parse', 'embed')}
+    if pipeline:
+        paper_chunks = iter_paper_chunks_pipelined(
+            new_summaries, config, stats,
+            download_workers=download_workers,
+            parse_workers=parse_workers,
+            max_pending=max_pending
         )
+    else:
+        paper_chunks = iter_paper_chunks(new_summaries, config)
 
     # Process papers in batches
     total_processed = 0
+    batches_since_checkpoint = 0
+    num_batches = (len(new_summaries) - 1) // batch_size + 1
+    start_time = time.perf_counter()
+
+    # Embedding calls in flight, oldest first; results are stored in this order
+    embed_pool = ThreadPoolExecutor(max_workers=embed_workers)
+    pending_embeds = deque()
+
+    def store_oldest_batch():
+        nonlocal db, batches_since_checkpoint
+        batch_documents, batch_processed, future = pending_embeds.popleft()
+        embeddings, elapsed = future.result()
+        stats['embed'].record(elapsed, len(batch_documents))
+
+        texts = [doc.page_content for doc in batch_documents]
+        metadatas = [doc.metadata for doc in batch_documents]
+
+        # Inner-product indexes hold unit vectors, so scores are cosine
+        if config.faiss_metric == "IP":
+            embeddings = l2_normalize(np.array(embeddings, dtype=np.float32))
+
+        # Create text_embeddings list
+        batch_text_embeddings = list(zip(texts, embeddings))
 
-    for batch_start in range(0, len(new_summaries), batch_size):
-        batch = new_summaries[batch_start:batch_start + batch_size]
+        # Extract paper URLs from this batch
+        batch_urls = list({doc.metadata.get('paper_id') for doc in batch_documents if doc.metadata.get('paper_id')})
+
+        # Append embeddings to the memory-mapped store
+        logger.info("Saving embeddings to embedding store...")
+        emb_manager.append_embeddings(batch_text_embeddings, metadatas, batch_urls)
+
+        # Append new vectors and docstore entries to the loaded index
+        db = add_to_index(db, batch_text_embeddings, metadatas, embedding_client, metric=config.faiss_metric)
+        batches_since_checkpoint += 1
+
+        # Save processed papers log after each batch (the store now holds them)
+        processed_urls.update(batch_processed)
+        save_processed_papers(index_dir, processed_urls)
+
+        if batches_since_checkpoint >= checkpoint_every:
+            logger.info(f"Checkpointing FAISS index ({db.index.ntotal} vectors) to {index_dir}...")
+            db.save_local(str(index_dir))
+            batches_since_checkpoint = 0
+
+        logger.info(f"✓ Batch saved! Total papers processed so far: {len(processed_urls)}")
+
+    for batch_num in range(1, num_batches + 1):
+        batch = list(islice(paper_chunks, batch_size))
+        batch_start = (batch_num - 1) * batch_size
         logger.info(f"\n{'='*60}")
-        logger.info(f"Processing batch {batch_start//batch_size + 1}/{(len(new_summaries)-1)//batch_size + 1}")
-        logger.info(f"Papers {batch_start+1}-{min(batch_start+batch_size, len(new_summaries))} of {len(new_summaries)}")
+        logger.info(f"Processing batch {batch_num}/{num_batches}")
+        logger.info(f"Papers {batch_start+1}-{batch_start+len(batch)} of {len(new_summaries)}")
         logger.info(f"{'='*60}")
 
         batch_documents = []
+        batch_papers = []
+        batch_processed = set()
 
-        # Process each paper in the batch
-        for summary in batch:
+        # Collect chunks of each paper in the batch
+        for summary, docs in batch:
             title = summary.get('title', 'unknown')
             url = summary.get('url', '')
 
-            try:
-                logger.info(f"Processing: {title}")
-                docs = create_chunks_from_paper(summary, config, all_fields)
-
-                if docs:
-                    batch_documents.extend(docs)
-                    processed_urls.add(url)
-                    total_processed += 1
-                    logger.info(f"✓ Created {len(docs)} chunks")
-                else:
-                    logger.warning(f"⚠ No chunks created for {title}")
+            if docs:
+                batch_papers.append((url, build_paper_metadata(summary, all_fields)))
+                batch_documents.extend(docs)
+                batch_processed.add(url)
+                total_processed += 1
+                logger.info(f"✓ Created {len(docs)} chunks")
+            elif docs is not None:
+                logger.warning(f"⚠ No chunks created for {title}")
 
-            except Exception as e:
-                logger.error(f"✗ Error processing {title}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-                continue
+        # Paper fields are stored once, not copied into every chunk
+        paper_store.upsert_many(batch_papers)
 
         # Save batch to index
         if batch_documents:
@@ -316,51 +647,54 @@ def build_index(
             # Generate embeddings for batch
             logger.info("Generating embeddings...")
             texts = [doc.page_content for doc in batch_documents]
-            metadatas = [doc.metadata for doc in batch_documents]
-            embeddings = embedding_client.embed_documents(texts)
-
-            # Create text_embeddings list
-            batch_text_embeddings = list(zip(texts, embeddings))
-
-            # Extract paper URLs from this batch
-            batch_urls = list({doc.metadata.get('url') for doc in batch_documents if doc.metadata.get('url')})
-
-            # Initialize embeddings manager
-            emb_manager = EmbeddingsManager(index_dir, shard_size=500)
-
-            # Append embeddings to sharded storage
-            logger.info("Saving embeddings to sharded storage...")
-            emb_manager.append_embeddings(batch_text_embeddings, metadatas, batch_urls)
-
-            # Rebuild FAISS index from all embeddings
-            # Note: We rebuild the entire index instead of using merge_from()
-            # because merge_from() is not supported by all FAISS index types (e.g., HNSW, IVF)
-            logger.info("Rebuilding FAISS index from all embeddings...")
-            all_text_embeddings = []
-            all_metadatas = []
-
-            for batch_emb, batch_meta in emb_manager.iter_all_embeddings(batch_size=1000):
-                all_text_embeddings.extend(batch_emb)
-                all_metadatas.extend(batch_meta)
-
-            logger.info(f"Creating FAISS index with {len(all_text_embeddings)} total embeddings...")
-            db = FAISS.from_embeddings(
-                text_embeddings=all_text_embeddings,
-                embedding=embedding_client,
-                metadatas=all_metadatas
-            )
+            future = embed_pool.submit(_timed_call, embedding_client.embed_documents, texts)
+            pending_embeds.append((batch_documents, batch_processed, future))
 
-            # Save FAISS index
-            logger.info(f"Saving FAISS index to {index_dir}...")
-            db.save_local(str(index_dir))
-
-            # Save processed papers log after each batch
-            save_processed_papers(index_dir, processed_urls)
-
-            logger.info(f"✓ Batch saved! Total papers processed so far: {len(processed_urls)}")
+            # Backpressure: wait for the oldest call once all embed workers are busy
+            while len(pending_embeds) >= embed_workers:
+                store_oldest_batch()
         else:
             logger.warning("No documents in this batch to save")
 
+    while pending_embeds:
+        store_oldest_batch()
+    embed_pool.shutdown()
+
+    wall_seconds = time.perf_counter() - start_time
+    logger.info(f"Ingest stage throughput ({wall_seconds:.1f}s wall):")
+    if pipeline:
+        stats['download'].report(wall_seconds, 'bytes')
+        stats['parse'].report(wall_seconds, 'chunks')
+    stats['embed'].report(wall_seconds, 'chunks')
+    emb_stats = embedding_client.cache.stats()
+    logger.info(
+        f"  embedding cache: {emb_stats['hits']} hits, {emb_stats['misses']} misses, "
+        f"{emb_stats['entries']} entries"
+    )
+    pdf_stats = get_pdf_store().stats()
+    logger.info(
+        f"  pdf cache: {pdf_stats['hits']} hits, {pdf_stats['misses']} misses, "
+        f"{pdf_stats['entries']} entries ({pdf_stats['bytes'] / 1024 ** 2:.0f} MB)"
+    )
+
+    if db is not None and batches_since_checkpoint:
+        logger.info(f"Saving FAISS index ({db.index.ntotal} vectors) to {index_dir}...")
+        db.save_local(str(index_dir))
+
+    # Save BM25 index and chunk store over the final FAISS rows, so the
+    # server can memory-map BM25 and read documents from disk
+    if db is not None:
+        logger.info("Building BM25 index...")
+        documents = list(faiss_documents(db))
+        texts = [doc.page_content for doc in documents]
+        fingerprint = corpus_fingerprint(texts, config.get_config_hash())
+        BM25Index.from_texts(texts).save(index_dir / BM25_DIR_NAME, fingerprint)
+
+        # Only rows added since the last build are written
+        chunk_store = ChunkStore(index_dir / CHUNKS_DB_NAME)
+        start = min(len(chunk_store), len(documents))
+        chunk_store.write(documents[start:], fingerprint, start=start)
+
     logger.info(f"\n{'='*60}")
     logger.info(f"✓ Index built successfully!")
     logger.info(f"Total papers processed: {len(processed_urls)}")
@@ -394,6 +728,13 @@ def main():
         default='embeddinggemma:300m',
         help='Ollama embedding model (default: embeddinggemma:300m)'
     )
+    parser.add_argument(
+        '--metric',
+        type=str,
+        choices=['IP', 'L2'],
+        default='IP',
+        help='FAISS metric for a new index: IP = cosine on normalized vectors (default: IP)'
+    )
     parser.add_argument(
         '--batch-size',
         type=int,
@@ -405,20 +746,62 @@ def main():
         action='store_true',
         help='Force rebuild from scratch instead of incremental update'
     )
+    parser.add_argument(
+        '--checkpoint-every',
+        type=int,
+        default=10,
+        help='Save the FAISS index every N batches (default: 10)'
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Overlap PDF downloads, parsing and embedding calls'
+    )
+    parser.add_argument(
+        '--download-workers',
+        type=int,
+        default=4,
+        help='Download threads in --pipeline mode (default: 4)'
+    )
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=2,
+        help='PDF parsing/chunking processes in --pipeline mode (default: 2)'
+    )
+    parser.add_argument(
+        '--embed-workers',
+        type=int,
+        default=1,
+        help='Concurrent embedding calls (default: 1)'
+    )
+    parser.add_argument(
+        '--max-pending',
+        type=int,
+        default=16,
+        help='Papers in flight between download and embedding in --pipeline mode (default: 16)'
+    )
 
     args = parser.parse_args()
 
     config = SearchEngineConfig(
         chunk_size=args.chunk_size,
         chunk_overlap=args.chunk_overlap,
-        embedding_model=args.embedding_model
+        embedding_model=args.embedding_model,
+        faiss_metric=args.metric
     )
 
     build_index(
         summaries_file=args.summaries,
         config=config,
         force_rebuild=args.force_rebuild,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        checkpoint_every=args.checkpoint_every,
+        pipeline=args.pipeline,
+        download_workers=args.download_workers,
+        parse_workers=args.parse_workers,
+        embed_workers=args.embed_workers,
+        max_pending=args.max_pending
     )
 
 
@@ -2,8 +2,9 @@
 """
 Rebuild FAISS index from saved embeddings.
 
-This allows you to change FAISS index type (Flat, HNSW, IVF) without
-regenerating embeddings from PDFs.
+This allows you to change FAISS index type (Flat, HNSW, IVF, IVFPQ,
+OPQ+IVFPQ, SQ8, SQfp16) without regenerating embeddings from PDFs. Settings
+not given on the command line are kept from the index's config.json.
 
 Can also update metadata without recalculating embeddings.
 """
@@ -20,8 +21,12 @@ from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document as LCDocument
 from langchain_ollama import OllamaEmbeddings
 
+from search_engine_utils.bm25_index import BM25_DIR_NAME, BM25Index, corpus_fingerprint
+from search_engine_utils.chunk_store import CHUNKS_DB_NAME, ChunkStore
 from search_engine_utils.config import SearchEngineConfig
-from search_engine_utils.embeddings_manager import EmbeddingsManager
+from search_engine_utils.embeddings_manager import EmbeddingsManager, l2_normalize
+from search_engine_utils.faiss_vectorstore import faiss_store_kwargs, rerank_exact
+from search_engine_utils.paper_metadata import PaperMetadataStore, paper_store_path, split_chunk_metadata
 
 
 def load_summaries_metadata(summaries_file: Path) -> dict:
@@ -66,48 +71,60 @@ def load_summaries_metadata(summaries_file: Path) -> dict:
     return url_to_metadata
 
 
-def update_metadata_from_summaries(metadatas: list, summaries_file: Path) -> list:
+def update_metadata_from_summaries(paper_store: PaperMetadataStore, summaries_file: Path):
     """
-    Update metadata list with fresh data from summaries.jsonl.
+    Refresh paper-level fields in the paper store from summaries.jsonl.
 
     Args:
-        metadatas: Original metadata list
+        paper_store: Paper metadata store of the index
         summaries_file: Path to summaries.jsonl
-
-    Returns:
-        Updated metadata list
     """
     if not summaries_file.exists():
         logger.warning(f"Summaries file not found: {summaries_file}")
-        return metadatas
+        return
 
     logger.info(f"Updating metadata from {summaries_file}...")
     url_to_metadata = load_summaries_metadata(summaries_file)
 
-    updated_metadatas = []
-    updated_count = 0
+    # Only papers that are in the index; other stored fields are kept
+    indexed = paper_store.get_many(url_to_metadata, fields=['url'])
+    paper_store.upsert_many(
+        (url, metadata) for url, metadata in url_to_metadata.items() if url in indexed
+    )
+    logger.info(f"Updated metadata for {len(indexed)}/{paper_store.count()} papers")
 
-    for old_meta in metadatas:
-        url = old_meta.get('url')
 
-        if url and url in url_to_metadata:
-            # Merge: keep chunk-specific fields, update paper-level fields
-            new_meta = old_meta.copy()
-            paper_meta = url_to_metadata[url]
+def move_paper_fields(metadatas: list, paper_store: PaperMetadataStore) -> list:
+    """
+    Move paper-level fields out of chunk metadata into the paper store.
 
-            # Update paper-level fields
-            for key in ['title', 'published_at', 'url', 'content', 'date_added', 'personal_notes']:
-                if key in paper_meta:
-                    new_meta[key] = paper_meta[key]
+    Indexes built before the paper store copied every paper field into each
+    chunk; this keeps only the chunk fields and stores the paper fields once.
 
-            updated_metadatas.append(new_meta)
-            updated_count += 1
-        else:
-            # Keep original if no match found
-            updated_metadatas.append(old_meta)
+    Returns:
+        Chunk metadata list (paper_id, chunk_index, chunk_source, ...)
+    """
+    papers = {}
+    chunk_metadatas = []
+    for metadata in metadatas:
+        paper_id, paper_metadata, chunk_metadata = split_chunk_metadata(metadata)
+        if paper_metadata and paper_id not in papers:
+            papers[paper_id] = paper_metadata
+        chunk_metadatas.append(chunk_metadata)
 
-    logger.info(f"Updated metadata for {updated_count}/{len(metadatas)} chunks")
-    return updated_metadatas
+    if papers:
+        logger.info(f"Moving metadata of {len(papers)} papers from chunks to {paper_store.db_path}")
+        paper_store.upsert_many(papers.items())
+    return chunk_metadatas
+
+
+# index_factory descriptions of the compressed index types
+FACTORY_INDEX_TYPES = {
+    "IVFPQ": "IVF{nlist},PQ{m}x{nbits}",
+    "OPQ+IVFPQ": "OPQ{m},IVF{nlist},PQ{m}x{nbits}",
+    "SQ8": "SQ8",
+    "SQfp16": "SQfp16",
+}
 
 
 def load_embeddings_legacy(index_dir: Path):
@@ -124,7 +141,7 @@ def load_embeddings_legacy(index_dir: Path):
 
 
 def create_faiss_index(
-    text_embeddings: list,
+    embeddings: np.ndarray,
     config: SearchEngineConfig,
     embedding_dim: int
 ) -> faiss.Index:
@@ -132,38 +149,104 @@ def create_faiss_index(
     Create FAISS index based on configuration.
 
     Args:
-        text_embeddings: List of (text, embedding) tuples
+        embeddings: float32 array of shape (n, embedding_dim), used for training
         config: Search engine configuration
         embedding_dim: Dimension of embeddings
 
     Returns:
         faiss.Index: Configured FAISS index
     """
+    # IP expects normalized vectors (see EmbeddingsManager(normalize=True))
+    if config.faiss_metric == "IP":
+        metric = faiss.METRIC_INNER_PRODUCT
+    elif config.faiss_metric == "L2":
+        metric = faiss.METRIC_L2
+    else:
+        raise ValueError(f"Unknown FAISS metric: {config.faiss_metric}")
+
     if config.faiss_index_type == "Flat":
-        logger.info("Creating Flat (brute force) index")
-        index = faiss.IndexFlatL2(embedding_dim)
+        logger.info(f"Creating Flat (brute force) index, metric={config.faiss_metric}")
+        return faiss.IndexFlat(embedding_dim, metric)
 
-    elif config.faiss_index_type == "HNSW":
-        logger.info(f"Creating HNSW index (M={config.hnsw_m}, ef_construction={config.hnsw_ef_construction})")
-        index = faiss.IndexHNSWFlat(embedding_dim, config.hnsw_m)
+    if config.faiss_index_type == "HNSW":
+        logger.info(
+            f"Creating HNSW index (M={config.hnsw_m}, ef_construction={config.hnsw_ef_construction}), "
+            f"metric={config.faiss_metric}"
+        )
+        index = faiss.IndexHNSWFlat(embedding_dim, config.hnsw_m, metric)
         index.hnsw.efConstruction = config.hnsw_ef_construction
-
-    elif config.faiss_index_type == "IVF":
-        logger.info(f"Creating IVF index (nlist={config.ivf_nlist})")
-        quantizer = faiss.IndexFlatL2(embedding_dim)
-        index = faiss.IndexIVFFlat(quantizer, embedding_dim, config.ivf_nlist)
-
-        # Train the index
-        logger.info("Training IVF index...")
-        embeddings_array = np.array([emb for _, emb in text_embeddings], dtype=np.float32)
-        index.train(embeddings_array)
-
+        return index
+
+    if config.faiss_index_type == "IVF":
+        logger.info(f"Creating IVF index (nlist={config.ivf_nlist}), metric={config.faiss_metric}")
+        quantizer = faiss.IndexFlat(embedding_dim, metric)
+        index = faiss.IndexIVFFlat(quantizer, embedding_dim, config.ivf_nlist, metric)
+    elif config.faiss_index_type in FACTORY_INDEX_TYPES:
+        description = FACTORY_INDEX_TYPES[config.faiss_index_type].format(
+            nlist=config.ivf_nlist, m=config.pq_m, nbits=config.pq_nbits
+        )
+        logger.info(f"Creating {config.faiss_index_type} index ({description}), metric={config.faiss_metric}")
+        index = faiss.index_factory(embedding_dim, description, metric)
     else:
         raise ValueError(f"Unknown FAISS index type: {config.faiss_index_type}")
 
+    # Train on a sample; clustering and codebooks do not need every vector
+    sample = sample_rows(embeddings, config.faiss_train_size)
+    logger.info(f"Training {config.faiss_index_type} index on {len(sample)}/{len(embeddings)} vectors...")
+    index.train(sample)
+
+    # nprobe is saved with the index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = config.ivf_nprobe
+
     return index
 
 
+def sample_rows(embeddings: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """Random rows (in storage order, so a memmap is read sequentially)."""
+    if size <= 0 or size >= len(embeddings):
+        return np.ascontiguousarray(embeddings)
+    rows = np.sort(np.random.default_rng(seed).choice(len(embeddings), size, replace=False))
+    return np.ascontiguousarray(embeddings[rows])
+
+
+def report_recall(
+    index: faiss.Index,
+    embeddings: np.ndarray,
+    config: SearchEngineConfig,
+    k: int = 10,
+    num_queries: int = 200
+):
+    """
+    Log recall@k of the new index against exact (Flat) search.
+
+    Queries are stored vectors; with rerank_k set, recall after re-ranking
+    the top rerank_k hits with the exact vectors is logged too.
+    """
+    k = min(k, len(embeddings))
+    queries = sample_rows(embeddings, num_queries, seed=1)
+    inner_product = config.faiss_metric == "IP"
+
+    flat = faiss.IndexFlat(embeddings.shape[1], index.metric_type)
+    flat.add(np.ascontiguousarray(embeddings))
+    _, exact = flat.search(queries, k)
+    del flat
+
+    def recall(found):
+        return np.mean([len(set(f[:k]) & set(e)) / k for f, e in zip(found, exact)])
+
+    _, approx = index.search(queries, max(k, config.rerank_k))
+    logger.info(f"Recall@{k} vs Flat ({len(queries)} queries): {recall(approx):.3f}")
+
+    if config.rerank_k:
+        reranked = [
+            rerank_exact(query, rows[rows >= 0], embeddings, inner_product)[0]
+            for query, rows in zip(queries, approx)
+        ]
+        logger.info(f"Recall@{k} with exact re-rank of top {config.rerank_k}: {recall(reranked):.3f}")
+
+
 def rebuild_index(
     index_dir: Path,
     config: SearchEngineConfig = None,
@@ -188,7 +271,7 @@ def rebuild_index(
             config = SearchEngineConfig()
 
     # Initialize embeddings manager
-    emb_manager = EmbeddingsManager(index_dir)
+    emb_manager = EmbeddingsManager(index_dir, normalize=config.faiss_metric == "IP")
 
     # Check for legacy single file (backward compatibility)
     text_embeddings_legacy, metadatas_legacy = load_embeddings_legacy(index_dir)
@@ -196,16 +279,16 @@ def rebuild_index(
     if text_embeddings_legacy is not None:
         # Use legacy file
         logger.info(f"Using legacy embeddings file")
-        text_embeddings = text_embeddings_legacy
+        texts = [te[0] for te in text_embeddings_legacy]
+        embeddings = np.array([te[1] for te in text_embeddings_legacy], dtype=np.float32)
+        if config.faiss_metric == "IP":
+            l2_normalize(embeddings)
         metadatas = metadatas_legacy
-        use_batched = False
     elif emb_manager.exists():
-        # Use sharded storage with batched loading
-        logger.info(f"Using sharded embeddings storage")
+        # Use memory-mapped storage (vectors are not copied into Python lists)
+        logger.info(f"Using memory-mapped embeddings storage")
         logger.info(f"Total chunks: {emb_manager.get_total_chunks()}")
-        use_batched = True
-        text_embeddings = None
-        metadatas = None
+        texts, embeddings, metadatas = emb_manager.get_all_embeddings()
     else:
         raise FileNotFoundError(
             f"No embeddings found in {index_dir}\n"
@@ -218,98 +301,58 @@ def rebuild_index(
         base_url=config.ollama_host
     )
 
-    if use_batched:
-        # Build index in batches (memory efficient)
-        logger.info("Building FAISS index in batches (memory efficient)...")
-
-        # First pass: collect all embeddings and metadata
-        logger.info("Collecting embeddings from shards...")
-        all_text_embeddings = []
-        all_metadatas = []
-        embedding_dim = None
-
-        for i, (batch_text_emb, batch_meta) in enumerate(emb_manager.iter_all_embeddings(batch_size=5000)):
-            logger.info(f"Loading batch {i+1} with {len(batch_text_emb)} embeddings...")
+    logger.info(f"Loaded {len(texts)} embeddings")
+    embedding_dim = embeddings.shape[1]
+    logger.info(f"Embedding dimension: {embedding_dim}")
 
-            if embedding_dim is None:
-                embedding_dim = len(batch_text_emb[0][1])
-                logger.info(f"Embedding dimension: {embedding_dim}")
+    # Paper fields live in the paper store; chunks only reference the paper
+    paper_store = PaperMetadataStore(paper_store_path(index_dir))
+    metadatas = move_paper_fields(metadatas, paper_store)
 
-            all_text_embeddings.extend(batch_text_emb)
-            all_metadatas.extend(batch_meta)
+    # Update metadata from summaries.jsonl if requested
+    if update_metadata and summaries_file:
+        update_metadata_from_summaries(paper_store, summaries_file)
 
-        logger.info(f"Total embeddings collected: {len(all_text_embeddings)}")
+    # Create FAISS index with specified type
+    custom_index = create_faiss_index(embeddings, config, embedding_dim)
 
-        # Update metadata from summaries.jsonl if requested
-        if update_metadata and summaries_file:
-            all_metadatas = update_metadata_from_summaries(all_metadatas, summaries_file)
+    # Add embeddings to custom index
+    logger.info("Adding embeddings to custom index...")
+    custom_index.add(embeddings)
+    if config.faiss_index_type != "Flat":
+        report_recall(custom_index, embeddings, config)
 
-        # Create custom FAISS index
-        custom_index = create_faiss_index(all_text_embeddings, config, embedding_dim)
+    # Create LangChain FAISS wrapper
+    logger.info("Creating LangChain FAISS wrapper...")
 
-        # Add embeddings to custom index
-        logger.info("Adding embeddings to custom index...")
-        texts = [te[0] for te in all_text_embeddings]
-        embeddings_array = np.array([te[1] for te in all_text_embeddings], dtype=np.float32)
-        custom_index.add(embeddings_array)
+    # Create docstore with documents
+    documents = [LCDocument(page_content=text, metadata=meta)
+                for text, meta in zip(texts, metadatas)]
 
-        # Create LangChain FAISS wrapper
-        logger.info("Creating LangChain FAISS wrapper...")
+    index_to_id = {i: str(i) for i in range(len(documents))}
+    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
 
-        # Create docstore with documents
-        documents = [LCDocument(page_content=text, metadata=meta)
-                    for text, meta in zip(texts, all_metadatas)]
-
-        index_to_id = {i: str(i) for i in range(len(documents))}
-        docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
-
-        # Create FAISS instance with custom index
-        db = FAISS(
-            embedding_function=embedding_client.embed_query,
-            index=custom_index,
-            docstore=docstore,
-            index_to_docstore_id=index_to_id
-        )
-    else:
-        # Load all at once (legacy mode)
-        logger.info(f"Loaded {len(text_embeddings)} embeddings")
-        embedding_dim = len(text_embeddings[0][1])
-        logger.info(f"Embedding dimension: {embedding_dim}")
-
-        # Update metadata from summaries.jsonl if requested
-        if update_metadata and summaries_file:
-            metadatas = update_metadata_from_summaries(metadatas, summaries_file)
-
-        # Create FAISS index with specified type
-        custom_index = create_faiss_index(text_embeddings, config, embedding_dim)
-
-        # Add embeddings to custom index
-        logger.info("Adding embeddings to custom index...")
-        texts = [te[0] for te in text_embeddings]
-        embeddings_array = np.array([te[1] for te in text_embeddings], dtype=np.float32)
-        custom_index.add(embeddings_array)
-
-        # Create LangChain FAISS wrapper
-        logger.info("Creating LangChain FAISS wrapper...")
-
-        # Create docstore with documents
-        documents = [LCDocument(page_content=text, metadata=meta)
-                    for text, meta in zip(texts, metadatas)]
-
-        index_to_id = {i: str(i) for i in range(len(documents))}
-        docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
-
-        # Create FAISS instance with custom index
-        db = FAISS(
-            embedding_function=embedding_client.embed_query,
-            index=custom_index,
-            docstore=docstore,
-            index_to_docstore_id=index_to_id
-        )
+    # Create FAISS instance with custom index
+    db = FAISS(
+        embedding_function=embedding_client,
+        index=custom_index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_id,
+        **faiss_store_kwargs(config.faiss_metric)
+    )
 
     # Save new index
     logger.info(f"Saving rebuilt index to {index_dir}")
     db.save_local(str(index_dir))
+    index_mb = (index_dir / "index.faiss").stat().st_size / 1024 ** 2
+    raw_mb = embeddings.nbytes / 1024 ** 2
+    logger.info(f"index.faiss: {index_mb:.1f} MB ({raw_mb:.1f} MB of float32 vectors)")
+
+    # Save BM25 index and chunk store over the same rows for serve_search.py
+    logger.info("Building BM25 index...")
+    fingerprint = corpus_fingerprint(texts, config.get_config_hash())
+    BM25Index.from_texts(texts).save(index_dir / BM25_DIR_NAME, fingerprint)
+    ChunkStore(index_dir / CHUNKS_DB_NAME).write(documents, fingerprint)
 
     # Update config
     config.save(index_dir / "config.json")
@@ -341,27 +384,64 @@ def main():
     parser.add_argument(
         '--faiss-type',
         type=str,
-        choices=['Flat', 'HNSW', 'IVF'],
-        default='Flat',
-        help='FAISS index type (default: Flat)'
+        choices=['Flat', 'HNSW', 'IVF', *FACTORY_INDEX_TYPES],
+        default=None,
+        help='FAISS index type (default: keep current)'
+    )
+    parser.add_argument(
+        '--metric',
+        type=str,
+        choices=['IP', 'L2'],
+        default=None,
+        help='FAISS metric: IP = cosine on normalized vectors, L2 = Euclidean (default: keep current)'
     )
     parser.add_argument(
         '--hnsw-m',
         type=int,
-        default=32,
-        help='HNSW M parameter (default: 32)'
+        default=None,
+        help='HNSW M parameter (default: keep current)'
     )
     parser.add_argument(
         '--hnsw-ef',
         type=int,
-        default=200,
-        help='HNSW efConstruction parameter (default: 200)'
+        default=None,
+        help='HNSW efConstruction parameter (default: keep current)'
     )
     parser.add_argument(
         '--ivf-nlist',
         type=int,
-        default=100,
-        help='IVF nlist parameter (default: 100)'
+        default=None,
+        help='IVF nlist parameter (default: keep current)'
+    )
+    parser.add_argument(
+        '--ivf-nprobe',
+        type=int,
+        default=None,
+        help='IVF clusters visited per query (default: keep current)'
+    )
+    parser.add_argument(
+        '--pq-m',
+        type=int,
+        default=None,
+        help='PQ sub-quantizers for IVFPQ / OPQ+IVFPQ, must divide the dimension (default: keep current)'
+    )
+    parser.add_argument(
+        '--pq-nbits',
+        type=int,
+        default=None,
+        help='Bits per PQ code (default: keep current)'
+    )
+    parser.add_argument(
+        '--train-size',
+        type=int,
+        default=None,
+        help='Vectors sampled to train IVF/PQ/SQ indexes (default: keep current)'
+    )
+    parser.add_argument(
+        '--rerank-k',
+        type=int,
+        default=None,
+        help='Server re-scores the top N hits with exact vectors from embeddings/, 0 = off (default: keep current)'
     )
 
     args = parser.parse_args()
@@ -377,11 +457,22 @@ def main():
     else:
         config = SearchEngineConfig()
 
-    # Update FAISS configuration
-    config.faiss_index_type = args.faiss_type
-    config.hnsw_m = args.hnsw_m
-    config.hnsw_ef_construction = args.hnsw_ef
-    config.ivf_nlist = args.ivf_nlist
+    # Update only the FAISS settings given on the command line
+    overrides = {
+        'faiss_index_type': args.faiss_type,
+        'faiss_metric': args.metric,
+        'hnsw_m': args.hnsw_m,
+        'hnsw_ef_construction': args.hnsw_ef,
+        'ivf_nlist': args.ivf_nlist,
+        'ivf_nprobe': args.ivf_nprobe,
+        'pq_m': args.pq_m,
+        'pq_nbits': args.pq_nbits,
+        'faiss_train_size': args.train_size,
+        'rerank_k': args.rerank_k,
+    }
+    for field, value in overrides.items():
+        if value is not None:
+            setattr(config, field, value)
 
     rebuild_index(
         index_dir=args.index_dir,
@@ -0,0 +1,399 @@
+"""
+Background job queue for long-running agent calls (/ask_wiki, /lint_wiki).
+
+An `ollama launch claude` run takes minutes. Instead of holding a request
+thread for that long, the endpoints submit a job and return its id; the
+agent runs on a small per-process thread pool. Job state lives in SQLite
+and each job's stdout is appended to a log file, so any gunicorn worker can
+answer polls and streams for a job started by another. A job submitted
+while an identical one (same dedup key) is queued or running gets the
+existing job back.
+
+A job runs in the process that submitted it. If that process dies (e.g. a
+gunicorn worker is restarted), its active jobs are failed the next time any
+process submits or looks at a job, so they do not hold their dedup key and
+a max_pending slot forever.
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# A running job past its timeout plus this grace period has lost its process
+ORPHAN_GRACE_SECONDS = 60
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class QueueFullError(Exception):
+    """Raised when max_pending jobs are already queued or running."""
+
+
+class AgentJobQueue:
+    """Bounded pool of agent subprocess jobs with SQLite-backed state."""
+
+    def __init__(
+        self,
+        jobs_dir: Path,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        retention_seconds: float = 24 * 60 * 60
+    ):
+        """
+        Open (or create) the job store.
+
+        Args:
+            jobs_dir: Directory for jobs.sqlite and the {job_id}.log output files
+            max_workers: Agent processes run at once by this process
+            max_pending: Jobs queued or running (across processes) before submit is refused
+            retention_seconds: How long finished jobs and their output are kept
+        """
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.jobs_dir / "jobs.sqlite"
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+
+        # Created on first submit in each process: pool threads do not survive a fork
+        self._executor = None
+        self._pid = None
+        self._pool_lock = threading.Lock()
+
+        # Readers (polls, streams) never block the job threads' writes
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                owner_pid INTEGER,
+                timeout REAL
+            )
+            """)
+            # Job stores created before owner tracking
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (('owner_pid', 'INTEGER'), ('timeout', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+
+    @contextmanager
+    def _connect(self, write: bool = True):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # Writers lock up front, so check-then-insert in submit() is atomic across processes
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # BEGIN itself may have failed (e.g. database is locked)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def log_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.log"
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-job")
+                self._pid = os.getpid()
+            return self._executor
+
+    def recover(self):
+        """Fail jobs left queued or running by a previous server process (call once at startup)."""
+        with self._connect() as conn:
+            count = conn.execute(
+                f"UPDATE jobs SET status = 'failed', error = 'Server restarted', finished_at = ? "
+                f"WHERE status IN {ACTIVE_STATUSES}",
+                (time.time(),)
+            ).rowcount
+        if count:
+            logger.warning(f"Marked {count} interrupted agent jobs as failed")
+
+    @staticmethod
+    def _orphan_error(job, now: float) -> Optional[str]:
+        """Why an active job can no longer finish, or None if it still can."""
+        if job['owner_pid'] is not None and not _pid_alive(job['owner_pid']):
+            return 'Agent worker process exited'
+        if job['started_at'] and job['timeout'] and now > job['started_at'] + job['timeout'] + ORPHAN_GRACE_SECONDS:
+            return 'Agent job outlived its timeout'
+        return None
+
+    def _fail_orphans(self, conn) -> int:
+        """Fail active jobs whose process is gone or that outlived their timeout."""
+        now = time.time()
+        orphans = []
+        for job in conn.execute(
+            f"SELECT id, owner_pid, started_at, timeout FROM jobs WHERE status IN {ACTIVE_STATUSES}"
+        ).fetchall():
+            error = self._orphan_error(job, now)
+            if error is not None:
+                orphans.append((error, now, job['id']))
+        conn.executemany("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?", orphans)
+        if orphans:
+            logger.warning(f"Marked {len(orphans)} orphaned agent jobs as failed")
+        return len(orphans)
+
+    def _prune(self, conn):
+        """Drop finished jobs (and their output) older than retention_seconds."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [row['id'] for row in conn.execute(
+            f"SELECT id FROM jobs WHERE status NOT IN {ACTIVE_STATUSES} AND finished_at < ?", (cutoff,)
+        )]
+        for job_id in expired:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self.log_path(job_id).unlink(missing_ok=True)
+
+    def submit(
+        self,
+        kind: str,
+        dedup_key: str,
+        command: List[str],
+        cwd: Path,
+        timeout: float,
+        on_success: Optional[Callable[[str], Dict[str, Any]]] = None,
+        line_filter: Optional[Callable[[str], str]] = None
+    ) -> Tuple[str, bool]:
+        """
+        Queue an agent command, or join an identical job already in flight.
+
+        Args:
+            kind: Job kind, e.g. "ask" or "lint"
+            dedup_key: Jobs with the same key share one run while it is active
+            command: Subprocess argv
+            cwd: Working directory of the subprocess
+            timeout: Seconds before the subprocess is killed
+            on_success: Turns the agent's stdout into the job result (runs in
+                the job thread); defaults to {"output": stdout}
+            line_filter: Applied to each stdout line before it is written to
+                the job's output (e.g. PII filtering for streamed answers)
+
+        Returns:
+            (job_id, created); created is False when an existing job was joined
+
+        Raises:
+            QueueFullError: max_pending jobs are already queued or running
+        """
+        with self._connect() as conn:
+            self._fail_orphans(conn)
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE dedup_key = ? AND status IN {ACTIVE_STATUSES}",
+                (dedup_key,)
+            ).fetchone()
+            if row is not None:
+                return row['id'], False
+
+            active = conn.execute(f"SELECT COUNT(*) FROM jobs WHERE status IN {ACTIVE_STATUSES}").fetchone()[0]
+            if active >= self.max_pending:
+                raise QueueFullError(f"{active} agent jobs already queued or running")
+
+            self._prune(conn)
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, status, created_at, owner_pid, timeout) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, dedup_key, time.time(), os.getpid(), timeout)
+            )
+
+        self.log_path(job_id).touch()
+        self._pool().submit(self._run, job_id, command, cwd, timeout, on_success, line_filter)
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id, True
+
+    def _update(self, job_id: str, **fields):
+        assignments = ', '.join(f"{field} = ?" for field in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id: str, command: List[str], cwd: Path, timeout: float, on_success, line_filter):
+        """Run one job and record its result or error."""
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            stdout, error = self._execute(job_id, command, cwd, timeout, line_filter)
+            result = None
+            if error is None:
+                result = on_success(stdout) if on_success else {'output': stdout}
+        except Exception as e:
+            stdout, error = '', f"Agent job failed: {e}"
+
+        if error is not None:
+            logger.error(f"Agent job {job_id}: {error}")
+            self._update(job_id, status='failed', error=error, finished_at=time.time())
+        else:
+            logger.info(f"Agent job {job_id} completed ({len(stdout)} chars)")
+            self._update(
+                job_id,
+                status='completed',
+                result=json.dumps(result, ensure_ascii=False),
+                finished_at=time.time()
+            )
+
+    def _execute(self, job_id: str, command: List[str], cwd: Path, timeout: float, line_filter):
+        """
+        Run the subprocess, appending its stdout to the job's log file as it comes.
+
+        Returns:
+            (stdout, error); error is None on success
+        """
+        proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            cwd=str(cwd)
+        )
+
+        # Drain stderr on the side so a chatty agent cannot block on a full pipe
+        stderr_lines = []
+        stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+        stderr_thread.start()
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+
+        output = []
+        try:
+            with open(self.log_path(job_id), 'a', encoding='utf-8') as log:
+                for line in proc.stdout:
+                    output.append(line)
+                    log.write(line_filter(line) if line_filter else line)
+                    log.flush()
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            stderr_thread.join(timeout=5)
+
+        if timed_out.is_set():
+            return '', f"Agent timed out ({timeout / 60:g} min limit)"
+        if returncode != 0:
+            return '', f"Agent failed: {''.join(stderr_lines)}"
+        return ''.join(output).strip(), None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status (with result once completed), or None for unknown jobs."""
+        sql = (
+            "SELECT id, kind, status, created_at, started_at, finished_at, result, error, owner_pid, timeout "
+            "FROM jobs WHERE id = ?"
+        )
+        with self._connect(write=False) as conn:
+            row = conn.execute(sql, (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row['status'] in ACTIVE_STATUSES and self._orphan_error(row, time.time()) is not None:
+            with self._connect() as conn:
+                self._fail_orphans(conn)
+                row = conn.execute(sql, (job_id,)).fetchone()
+        job = dict(row)
+        del job['owner_pid'], job['timeout']
+        job['job_id'] = job.pop('id')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def read_output(self, job_id: str, offset: int = 0, final: bool = False) -> Tuple[str, int]:
+        """
+        Agent output written since byte offset.
+
+        Only whole lines are returned while the job runs (a line may still be
+        half-written); pass final=True once it has finished to get the rest.
+
+        Returns:
+            (text, new_offset)
+        """
+        path = self.log_path(job_id)
+        if not path.exists():
+            return '', offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        if not final:
+            data = data[:data.rfind(b'\n') + 1]
+        return data.decode('utf-8', errors='replace'), offset + len(data)
+
+    def wait(self, job_id: str, timeout: float, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes or timeout passes; returns its latest status."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] not in ACTIVE_STATUSES or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def stream(self, job_id: str, poll_interval: float = 0.5, keepalive: float = 15.0) -> Iterator[str]:
+        """
+        Server-sent events for a job: "output" events with new stdout, then
+        one "done" event with the final status.
+        """
+        offset = 0
+        last_sent = time.monotonic()
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            finished = job['status'] not in ACTIVE_STATUSES
+            text, offset = self.read_output(job_id, offset, final=finished)
+            if text:
+                yield f"event: output\ndata: {json.dumps(text, ensure_ascii=False)}\n\n"
+                last_sent = time.monotonic()
+            if finished:
+                yield f"event: done\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            if time.monotonic() - last_sent > keepalive:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status, for /stats."""
+        with self._connect(write=False) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            **{status: counts.get(status, 0) for status in ('queued', 'running', 'completed', 'failed')}
+        }
@@ -0,0 +1,201 @@
+"""
+Persistent cache of /ask_wiki answers.
+
+An answer depends on the question, the model, the conversation history the
+prompt includes and the wiki it was read from. The cache key covers all of
+them; the wiki part is a fingerprint of every file under wiki/ plus
+llm-wiki.md, so rebuilding the wiki (wiki_build.sh) invalidates old answers.
+Entries also expire after a TTL and are evicted least recently used first.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question."""
+    return ' '.join(question.lower().split())
+
+
+class WikiFingerprint:
+    """Fingerprint of the wiki files, recomputed at most every refresh_seconds."""
+
+    def __init__(self, paths: List[Path], refresh_seconds: float = 10.0):
+        """
+        Args:
+            paths: Files and directories (walked recursively) the answers depend on
+            refresh_seconds: How long a computed fingerprint is reused
+        """
+        self.paths = [Path(path) for path in paths]
+        self.refresh_seconds = refresh_seconds
+        self._value = None
+        self._computed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _compute(self) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for root in self.paths:
+            if root.is_file():
+                files = [root]
+            elif root.is_dir():
+                files = sorted(p for p in root.rglob('*') if p.is_file())
+            else:
+                continue
+            for path in files:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                # Size + mtime stand in for content; any edit changes mtime
+                digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            if self._value is None or now - self._computed_at > self.refresh_seconds:
+                self._value = self._compute()
+                self._computed_at = now
+            return self._value
+
+
+class AnswerCache:
+    """SQLite map from (question, model, history, wiki fingerprint) to answer."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        wiki_fingerprint: WikiFingerprint,
+        max_entries: int = 1000,
+        ttl_seconds: float = 7 * 24 * 60 * 60
+    ):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path of the SQLite file
+            wiki_fingerprint: Fingerprint of the files answers are read from
+            max_entries: Entries kept before least recently used ones are evicted
+            ttl_seconds: How long an answer stays valid (0 = no expiry)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.wiki_fingerprint = wiki_fingerprint
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._seen_fingerprint = None
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                wiki_fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _current_fingerprint(self) -> str:
+        """Current wiki fingerprint; answers from other versions are dropped when it changes."""
+        fingerprint = self.wiki_fingerprint.get()
+        with self._lock:
+            changed = fingerprint != self._seen_fingerprint
+            self._seen_fingerprint = fingerprint
+        if changed:
+            with self._connect() as conn:
+                stale = conn.execute(
+                    "DELETE FROM answers WHERE wiki_fingerprint != ?", (fingerprint,)
+                ).rowcount
+            if stale:
+                logger.info(f"Answer cache dropped {stale} answers from an older wiki version")
+        return fingerprint
+
+    def lookup(
+        self,
+        question: str,
+        model: str,
+        history: List[Dict[str, str]]
+    ) -> Tuple[Tuple[str, str], Optional[Dict[str, Any]]]:
+        """
+        Look up the answer to a question asked with the given history window.
+
+        Returns:
+            (cache_key, result); pass cache_key to put() once the answer is
+            ready. result is None on a miss (or expired entry).
+        """
+        fingerprint = self._current_fingerprint()
+        payload = json.dumps([normalize_question(question), model, history, fingerprint], ensure_ascii=False)
+        key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT result, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+
+        with self._lock:
+            if row is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (key, fingerprint), json.loads(row[0]) if row is not None else None
+
+    def put(self, cache_key: Tuple[str, str], result: Dict[str, Any]):
+        """Store a result from lookup()'s cache_key, unless the wiki changed in the meantime."""
+        key, fingerprint = cache_key
+        if fingerprint != self._current_fingerprint():
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, wiki_fingerprint, result, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            if self.ttl_seconds:
+                conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (this process) and current size."""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds
+        }
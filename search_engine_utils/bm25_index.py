@@ -0,0 +1,225 @@
+"""
+Sparse BM25 index backed by a CSR-style inverted index.
+
+Scores match rank_bm25.BM25Okapi (same k1, b, epsilon and idf floor), but a
+query only touches the postings of its own terms instead of looping over
+every document in Python.
+
+The index can be saved next to index.faiss and memory-mapped back at server
+start, so chunks are not re-tokenized on every restart.
+"""
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from nltk.tokenize import TreebankWordTokenizer
+
+# Saved alongside index.faiss / index.pkl in the index directory
+BM25_DIR_NAME = "bm25"
+BM25_ARRAYS = ("indptr", "doc_ids", "term_freqs", "doc_len", "idf")
+
+_tokenizer = TreebankWordTokenizer()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text for BM25 (lowercased Treebank tokens)."""
+    return _tokenizer.tokenize(text.lower())
+
+
+def tokenize_corpus(texts: List[str]) -> List[List[str]]:
+    """Tokenize every document, with a progress bar for large corpora."""
+    if len(texts) > 1000:
+        from tqdm import tqdm
+        texts = tqdm(texts, desc="Tokenizing for BM25")
+    return [tokenize(text) for text in texts]
+
+
+def corpus_fingerprint(texts: List[str], config_hash: str) -> str:
+    """Fingerprint of the config and chunk texts, used to detect a stale saved index."""
+    digest = hashlib.md5(config_hash.encode())
+    for text in texts:
+        digest.update(text.encode('utf-8', errors='ignore'))
+        digest.update(b"\0")
+    return f"{config_hash}_{len(texts)}_{digest.hexdigest()}"
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored in NumPy arrays."""
+
+    def __init__(
+        self,
+        tokenized_docs: List[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ):
+        """
+        Build the inverted index.
+
+        Args:
+            tokenized_docs: One token list per document (row id = list position)
+            k1: Term frequency saturation (BM25Okapi default: 1.5)
+            b: Length normalization (BM25Okapi default: 0.75)
+            epsilon: Floor for negative idf, as a fraction of the average idf
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.vocab: Dict[str, int] = {}
+        term_ids = []
+        doc_ids = []
+        freqs = []
+        doc_len = np.zeros(len(tokenized_docs), dtype=np.int32)
+
+        for doc_id, tokens in enumerate(tokenized_docs):
+            doc_len[doc_id] = len(tokens)
+            for token, freq in Counter(tokens).items():
+                term_ids.append(self.vocab.setdefault(token, len(self.vocab)))
+                doc_ids.append(doc_id)
+                freqs.append(freq)
+
+        term_ids = np.array(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')  # keeps doc ids sorted per term
+
+        # Postings of term t are doc_ids[indptr[t]:indptr[t + 1]]
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocab)), out=self.indptr[1:])
+        self.doc_ids = np.array(doc_ids, dtype=np.int32)[order]
+        self.term_freqs = np.array(freqs, dtype=np.int32)[order]
+        self.doc_len = doc_len
+
+        self.idf = self._calc_idf(np.diff(self.indptr), len(tokenized_docs))
+        self._init_norms()
+
+    @classmethod
+    def from_texts(cls, texts: List[str], **kwargs) -> 'BM25Index':
+        """Tokenize raw chunk texts and build the index."""
+        return cls(tokenize_corpus(texts), **kwargs)
+
+    def save(self, path: Path, fingerprint: str):
+        """
+        Save the index as .npy arrays plus vocab.json and meta.json.
+
+        meta.json is written last, so an interrupted save is seen as stale.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        meta_file = path / "meta.json"
+        meta_file.unlink(missing_ok=True)
+
+        for name in BM25_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        with open(path / "vocab.json", 'w', encoding='utf-8') as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        with open(meta_file, 'w') as f:
+            json.dump({
+                'fingerprint': fingerprint,
+                'k1': self.k1,
+                'b': self.b,
+                'epsilon': self.epsilon,
+                'corpus_size': int(self.corpus_size),
+                'vocab_size': len(self.vocab)
+            }, f, indent=2)
+        logger.info(f"Saved BM25 index ({len(self.vocab)} terms) to {path}")
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str, mmap_mode: str = 'r') -> Optional['BM25Index']:
+        """
+        Memory-map a saved index.
+
+        Returns:
+            The index, or None if it is missing or was built for a different
+            config/corpus (caller should rebuild)
+        """
+        meta_file = Path(path) / "meta.json"
+        if not meta_file.exists():
+            return None
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') != fingerprint:
+            logger.warning(f"Saved BM25 index at {path} is stale (config or chunks changed)")
+            return None
+
+        index = cls.__new__(cls)
+        index.k1, index.b, index.epsilon = meta['k1'], meta['b'], meta['epsilon']
+        for name in BM25_ARRAYS:
+            setattr(index, name, np.load(Path(path) / f"{name}.npy", mmap_mode=mmap_mode))
+        with open(Path(path) / "vocab.json", 'r', encoding='utf-8') as f:
+            index.vocab = json.load(f)
+        index._init_norms()
+        return index
+
+    def _calc_idf(self, doc_freqs: np.ndarray, corpus_size: int) -> np.ndarray:
+        """idf = log(N - n + 0.5) - log(n + 0.5), floored like BM25Okapi."""
+        doc_freqs = doc_freqs.astype(np.float64)
+        idf = np.log(corpus_size - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if len(idf):
+            # Terms in more than half the corpus get epsilon * average idf
+            idf[idf < 0] = self.epsilon * idf.mean()
+        return idf
+
+    def _init_norms(self):
+        """Precompute the per-document length normalization term."""
+        self.corpus_size = len(self.doc_len)
+        self.avgdl = float(self.doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+        if self.avgdl > 0:
+            self._doc_norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+        else:
+            self._doc_norm = np.full(self.corpus_size, self.k1 * (1 - self.b))
+
+    def _score_postings(self, query: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score only documents that contain at least one query term.
+
+        Returns:
+            (doc_ids, scores) for the matched documents, doc_ids sorted ascending
+        """
+        ids = []
+        contributions = []
+        for token, count in Counter(query).items():
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, end = self.indptr[term], self.indptr[term + 1]
+            postings = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            # Repeated query terms count once per occurrence, as in BM25Okapi
+            weight = count * self.idf[term]
+            ids.append(postings)
+            contributions.append(weight * tf * (self.k1 + 1) / (tf + self._doc_norm[postings]))
+
+        if not ids:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+        ids = np.concatenate(ids)
+        contributions = np.concatenate(contributions)
+        matched, inverse = np.unique(ids, return_inverse=True)
+        return matched, np.bincount(inverse, weights=contributions)
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """Dense scores for every document (drop-in for BM25Okapi.get_scores)."""
+        scores = np.zeros(self.corpus_size)
+        matched, matched_scores = self._score_postings(query)
+        scores[matched] = matched_scores
+        return scores
+
+    def top_k(self, query: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents with a positive score, best first.
+
+        Returns:
+            (doc_ids, scores) arrays of length <= k
+        """
+        matched, scores = self._score_postings(query)
+        positive = scores > 0
+        matched, scores = matched[positive], scores[positive]
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+            matched, scores = matched[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return matched[order], scores[order]
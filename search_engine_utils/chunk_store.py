@@ -0,0 +1,162 @@
+"""
+Disk-backed docstore for search results.
+
+Holds chunk text and chunk metadata by FAISS row in SQLite, so the search
+server does not unpickle index.pkl or keep every Document in memory. A
+Document is only built for rows that make the final top-k, and only with
+the metadata fields the caller asks for.
+"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Set
+
+from langchain_core.documents import Document
+
+# Saved alongside index.faiss / index.pkl in the index directory
+CHUNKS_DB_NAME = "chunks.sqlite"
+
+
+def faiss_documents(db, start: int = 0) -> Iterator[Document]:
+    """Documents of a LangChain FAISS store in row order, from row start on."""
+    for i in range(start, db.index.ntotal):
+        yield db.docstore.search(db.index_to_docstore_id[i])
+
+
+class ChunkStore:
+    """Read-mostly store of (row -> text, metadata), indexable like a list of Documents."""
+
+    def __init__(self, db_path: Path):
+        """
+        Open (or create) the store.
+
+        Args:
+            db_path: Path of the SQLite file (usually index_dir / CHUNKS_DB_NAME)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._size = self._count()
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _get_meta(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write(self, documents: Iterable[Document], fingerprint: str, start: int = 0):
+        """
+        Store documents as rows start, start + 1, ... (later rows are dropped).
+
+        Args:
+            documents: Documents in FAISS row order
+            fingerprint: corpus_fingerprint of all rows, checked against the BM25 index
+            start: First row to (re)write; earlier rows are kept
+        """
+        fields = set(self.fields()) if start else set()
+        rows = []
+        for row, doc in enumerate(documents, start=start):
+            fields.update(doc.metadata)
+            rows.append((row, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE row >= ?", (start,))
+            conn.executemany("INSERT INTO chunks (row, text, metadata) VALUES (?, ?, ?)", rows)
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [('fingerprint', json.dumps(fingerprint)), ('fields', json.dumps(sorted(fields)))]
+            )
+        self._size = self._count()
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """corpus_fingerprint recorded by the last write."""
+        return self._get_meta('fingerprint')
+
+    def fields(self) -> Set[str]:
+        """Chunk metadata field names."""
+        return set(self._get_meta('fields') or [])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> Document:
+        return self.get_many([row])[0]
+
+    def get_many(self, rows: Sequence[int], metadata_fields: Optional[List[str]] = None) -> List[Document]:
+        """
+        Materialize Documents for the given rows, in the given order.
+
+        Args:
+            rows: FAISS row ids
+            metadata_fields: Chunk metadata fields to read (None = all); fields
+                a chunk does not have are left out
+
+        Returns:
+            One Document per row
+        """
+        rows = [int(row) for row in rows]
+        if not rows:
+            return []
+        placeholders = ','.join('?' * len(rows))
+
+        if metadata_fields is None:
+            sql = f"SELECT row, text, metadata FROM chunks WHERE row IN ({placeholders})"
+            params = rows
+        else:
+            # Extract only the requested fields inside SQLite: (type, value) per field
+            columns = ''.join(", json_type(metadata, ?), json_extract(metadata, ?)" for _ in metadata_fields)
+            sql = f"SELECT row, text{columns} FROM chunks WHERE row IN ({placeholders})"
+            params = [path for field in metadata_fields for path in (f'$."{field}"',) * 2] + rows
+
+        found = {}
+        with self._connect() as conn:
+            for row, text, *values in conn.execute(sql, params):
+                if metadata_fields is None:
+                    metadata = json.loads(values[0])
+                else:
+                    metadata = {}
+                    for field, json_type, value in zip(metadata_fields, values[::2], values[1::2]):
+                        if json_type is None:  # field not present
+                            continue
+                        if json_type in ('object', 'array'):
+                            value = json.loads(value)
+                        elif json_type in ('true', 'false'):
+                            value = json_type == 'true'
+                        metadata[field] = value
+                found[row] = Document(page_content=text, metadata=metadata)
+
+        return [found[row] for row in rows]
+
+    def iter_texts(self, batch_size: int = 10000) -> Iterator[str]:
+        """Iterate over chunk texts in row order."""
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT text FROM chunks ORDER BY row")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for (text,) in batch:
+                    yield text
@@ -6,6 +6,16 @@ import json
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+# Fields describing how a saved FAISS index was built; an incremental build
+# appends to that index, so these come from its config.json, not the CLI
+INDEX_LAYOUT_FIELDS = (
+    'faiss_index_type', 'faiss_metric',
+    'hnsw_m', 'hnsw_ef_construction',
+    'ivf_nlist', 'ivf_nprobe',
+    'pq_m', 'pq_nbits',
+    'faiss_train_size', 'rerank_k',
+)
+
 
 @dataclass
 class SearchEngineConfig:
@@ -20,19 +30,42 @@ class SearchEngineConfig:
     ollama_host: str = "http://localhost:11434"
 
     # FAISS index type
-    faiss_index_type: str = "Flat"  # Options: "Flat" (brute force), "HNSW", "IVF"
+    # Options: "Flat" (brute force), "HNSW", "IVF", and compressed
+    # "IVFPQ", "OPQ+IVFPQ", "SQ8", "SQfp16" (see rebuild_faiss.py)
+    faiss_index_type: str = "Flat"
+
+    # FAISS metric: "IP" (inner product on L2-normalized vectors, i.e. cosine)
+    # or "L2" (Euclidean; indexes built before the metric was recorded)
+    faiss_metric: str = "IP"
 
     # HNSW parameters (if using HNSW)
     hnsw_m: int = 32  # Number of connections per layer
     hnsw_ef_construction: int = 200  # Size of dynamic candidate list during construction
 
-    # IVF parameters (if using IVF)
+    # IVF parameters (if using IVF, IVFPQ or OPQ+IVFPQ)
     ivf_nlist: int = 100  # Number of clusters
+    ivf_nprobe: int = 8  # Clusters visited per query
+
+    # Product quantization (IVFPQ, OPQ+IVFPQ)
+    pq_m: int = 32  # Sub-quantizers (must divide the embedding dimension)
+    pq_nbits: int = 8  # Bits per sub-quantizer code
+
+    # Training and re-ranking for trained/compressed indexes
+    faiss_train_size: int = 50000  # Vectors sampled for training
+    rerank_k: int = 0  # Re-score the top-N FAISS hits with exact vectors (0 = off)
 
     # Retrieval weights
     vector_weight: float = 0.7
     bm25_weight: float = 0.3
 
+    # Candidate-bounded fusion: top-N from FAISS and BM25 each (0 = full-corpus scan)
+    search_candidates: int = 200
+
+    # Query embedding cache in the search server
+    query_cache_mb: int = 64
+    query_cache_ttl: float = 3600.0  # Seconds (0 = no expiry)
+    query_batch_ms: float = 5.0  # Window for batching concurrent query embeddings
+
     # Index settings
     index_base_dir: str = "vector_indices"
 
@@ -46,6 +79,10 @@ class SearchEngineConfig:
         folder_name = f"chunk{self.chunk_size}_overlap{self.chunk_overlap}_model_{self.embedding_model.replace(':', '_')}"
         return Path(self.index_base_dir) / folder_name
 
+    def get_embedding_cache_dir(self) -> Path:
+        """Embedding cache shared by every index under index_base_dir."""
+        return Path(self.index_base_dir) / "embedding_cache"
+
     def save(self, path: Path):
         """Save config to JSON file."""
         with open(path, 'w') as f:
@@ -56,6 +93,8 @@ class SearchEngineConfig:
         """Load config from JSON file."""
         with open(path, 'r') as f:
             data = json.load(f)
+        # Configs written before faiss_metric existed describe L2 indexes
+        data.setdefault('faiss_metric', 'L2')
         return cls(**data)
 
     def __eq__(self, other):
@@ -0,0 +1,181 @@
+"""
+Persistent embedding cache keyed by (embedding model, chunk text hash).
+
+Rebuilding an index with a different chunk_overlap, or with --force-rebuild,
+produces mostly the same chunk texts again. Caching their vectors means only
+new texts go through Ollama.
+
+Each model gets its own directory with an append-only float32 matrix
+(vectors.f32) and a parallel file of 16-byte BLAKE2b digests (keys.bin);
+row i of one belongs to row i of the other. Appends take an flock, so
+builds of several indexes can share one cache.
+"""
+import fcntl
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DIGEST_SIZE = 16
+
+
+def text_digest(text: str) -> bytes:
+    """Cache key for a chunk text."""
+    # The "document" prefix is part of every key already on disk
+    digest = hashlib.blake2b(b"document", digest_size=DIGEST_SIZE)
+    digest.update(b"\0")
+    digest.update(text.encode('utf-8', errors='surrogatepass'))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """Append-only on-disk map from text digest to float32 embedding."""
+
+    def __init__(self, cache_dir: Path, model: str):
+        """
+        Open (or create) the cache for one embedding model.
+
+        Args:
+            cache_dir: Base cache directory (one subdirectory per model)
+            model: Embedding model name, e.g. "embeddinggemma:300m"
+        """
+        self.model = model
+        self.cache_dir = Path(cache_dir) / model.replace(':', '_').replace('/', '_')
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.keys_file = self.cache_dir / "keys.bin"
+        self.vectors_file = self.cache_dir / "vectors.f32"
+        self.meta_file = self.cache_dir / "meta.json"
+        self.lock_file = self.cache_dir / ".lock"
+
+        self.dim: Optional[int] = None
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._row_of = {}
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        """Pick up rows appended since the last sync (possibly by another process)."""
+        if self.dim is None:
+            if not self.meta_file.exists():
+                return
+            with open(self.meta_file, 'r') as f:
+                self.dim = json.load(f)['dim']
+
+        key_rows = self.keys_file.stat().st_size // DIGEST_SIZE if self.keys_file.exists() else 0
+        vector_rows = self.vectors_file.stat().st_size // (self.dim * 4) if self.vectors_file.exists() else 0
+        # Vectors are written before keys, so only rows with both are complete
+        rows = min(key_rows, vector_rows)
+        if rows <= self.rows:
+            return
+
+        with open(self.keys_file, 'rb') as f:
+            f.seek(self.rows * DIGEST_SIZE)
+            keys = f.read((rows - self.rows) * DIGEST_SIZE)
+        for i in range(rows - self.rows):
+            self._row_of.setdefault(keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], self.rows + i)
+        self.rows = rows
+        self._vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def get_many(self, digests: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for each digest (None where missing)."""
+        with self._lock:
+            if any(d not in self._row_of for d in digests):
+                self._sync()
+            results = [
+                np.array(self._vectors[self._row_of[d]]) if d in self._row_of else None
+                for d in digests
+            ]
+            found = sum(r is not None for r in results)
+            self.hits += found
+            self.misses += len(results) - found
+        return results
+
+    def put_many(self, digests: List[bytes], vectors: List[List[float]]):
+        """Append vectors for digests that are not cached yet."""
+        if not digests:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock, open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.dim is None and not self.meta_file.exists():
+                with open(self.meta_file, 'w') as f:
+                    json.dump({'model': self.model, 'dim': int(vectors.shape[1])}, f)
+            self._sync()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cached dimension {self.dim}")
+
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self._row_of:
+                    new.setdefault(digest, vector)
+            if not new:
+                return
+
+            # Drop any partial tail left by an interrupted append, then add rows
+            with open(self.vectors_file, 'ab') as f:
+                f.truncate(self.rows * self.dim * 4)
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(self.keys_file, 'ab') as f:
+                f.truncate(self.rows * DIGEST_SIZE)
+                f.write(b"".join(new))
+            self._sync()
+
+    def stats(self) -> dict:
+        """Hit/miss counters (this process) and cache size."""
+        return {
+            'model': self.model,
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': self.rows,
+            'bytes': self.rows * ((self.dim or 0) * 4 + DIGEST_SIZE)
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends uncached texts to the underlying client."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [text_digest(text) for text in texts]
+        cached = self.cache.get_many(digests)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for text, digest, vector in zip(texts, digests, cached):
+            if vector is None:
+                missing.setdefault(digest, text)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), vectors)
+            fresh = dict(zip(missing, vectors))
+        else:
+            fresh = {}
+
+        return [
+            vector.tolist() if vector is not None else list(fresh[digest])
+            for digest, vector in zip(digests, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are not persisted: the set is unbounded, and the search
+        # server keeps recent ones in memory (QueryEmbeddingCache)
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one call (not cached, like embed_query)."""
+        # OllamaEmbeddings.embed_query is embed_documents([text])[0], so one
+        # embed_documents call on the wrapped client embeds a batch of queries
+        return self.embeddings.embed_documents(texts)
@@ -1,49 +1,118 @@
 """
-Embeddings manager with sharded storage.
+Embeddings manager with memory-mapped storage.
 
-Stores embeddings in multiple shard files to avoid loading/saving
-huge files repeatedly.
+Vectors live in one append-only float32 matrix (vectors.f32) that readers
+open with np.memmap, so rebuilding FAISS gets array slices instead of
+unpickling lists of Python floats. Chunk texts and metadata are kept in an
+append-only JSONL file alongside it.
+
+Indexes built with the older pickled shards (shard_XXXX.pkl) are converted
+to this layout the first time they are opened.
 """
 import json
 import pickle
 from pathlib import Path
 from typing import List, Tuple, Iterator
+
+import numpy as np
 from loguru import logger
 
+STORE_FORMAT = "memmap-f32"
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length in place (zero rows are left as is)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
 
 class EmbeddingsManager:
-    """Manages sharded embedding storage."""
+    """Manages memory-mapped embedding storage."""
 
-    def __init__(self, index_dir: Path, shard_size: int = 500):
+    def __init__(self, index_dir: Path, normalize: bool = False):
         """
         Initialize embeddings manager.
 
         Args:
             index_dir: Directory to store embeddings
-            shard_size: Number of chunks per shard file (default: 500)
+            normalize: Store L2-normalized vectors (for inner-product indexes);
+                vectors already stored unnormalized are normalized once
         """
         self.index_dir = Path(index_dir)
         self.embeddings_dir = self.index_dir / "embeddings"
         self.embeddings_dir.mkdir(parents=True, exist_ok=True)
         self.index_file = self.embeddings_dir / "index.json"
-        self.shard_size = shard_size
+        self.vectors_file = self.embeddings_dir / "vectors.f32"
+        self.records_file = self.embeddings_dir / "records.jsonl"
         self.index_data = self._load_index()
 
+        if self.index_data.get('format') != STORE_FORMAT:
+            self._migrate_shards()
+
+        if normalize and not self.index_data.get('normalized'):
+            self._normalize_stored()
+
     def _load_index(self) -> dict:
         """Load embeddings index."""
         if self.index_file.exists():
             with open(self.index_file, 'r') as f:
                 return json.load(f)
         return {
-            'shards': [],
+            'format': STORE_FORMAT,
             'total_chunks': 0,
-            'shard_size': self.shard_size
+            'dim': None,
+            'records_bytes': 0,
+            'papers': []
         }
 
     def _save_index(self):
-        """Save embeddings index."""
-        with open(self.index_file, 'w') as f:
+        """Save embeddings index (written last, so it only ever counts complete rows)."""
+        tmp_file = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
             json.dump(self.index_data, f, indent=2)
+        tmp_file.replace(self.index_file)
+
+    def _migrate_shards(self):
+        """Convert legacy pickled shards into the memory-mapped layout."""
+        shards = self.index_data.get('shards', [])
+        papers = sorted({url for shard in shards for url in shard.get('papers', [])})
+        self.index_data = {
+            'format': STORE_FORMAT,
+            'total_chunks': 0,
+            'dim': None,
+            'records_bytes': 0,
+            'papers': []
+        }
+        if not shards:
+            return
+
+        logger.info(f"Converting {len(shards)} pickled shards to memory-mapped storage...")
+        for shard_info in shards:
+            with open(self.embeddings_dir / shard_info['file'], 'rb') as f:
+                data = pickle.load(f)
+            self._append(data['text_embeddings'], data['metadatas'])
+
+        # index.json stays in the old format until every shard is converted
+        self.index_data['papers'] = papers
+        self._save_index()
+        logger.info(
+            f"Converted {self.index_data['total_chunks']} embeddings; "
+            f"old shard_*.pkl files in {self.embeddings_dir} can be deleted"
+        )
+
+    def _normalize_stored(self, batch_size: int = 100000):
+        """Normalize stored vectors in place and mark the store as normalized."""
+        total = self.index_data['total_chunks']
+        if total:
+            logger.info(f"Normalizing {total} stored embeddings for inner-product search...")
+            vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r+', shape=(total, self.index_data['dim']))
+            for start in range(0, total, batch_size):
+                l2_normalize(vectors[start:start + batch_size])
+            vectors.flush()
+            del vectors
+        self.index_data['normalized'] = True
+        self._save_index()
 
     def append_embeddings(
         self,
@@ -54,94 +123,81 @@ class EmbeddingsManager:
         """
         Append new embeddings to storage.
 
-        Fills up existing shards before creating new ones.
+        Only appends to the vector and record files; existing rows are never
+        rewritten. Bytes left over from an interrupted append are truncated
+        first.
 
         Args:
             text_embeddings: List of (text, embedding) tuples
             metadatas: List of metadata dicts
             paper_urls: List of paper URLs (for tracking)
         """
-        remaining_embeddings = text_embeddings
-        remaining_metadatas = metadatas
-        remaining_urls = paper_urls
-
-        while remaining_embeddings:
-            # Check if we have an incomplete shard
-            if self.index_data['shards']:
-                last_shard = self.index_data['shards'][-1]
-                space_left = self.shard_size - last_shard['num_chunks']
-
-                if space_left > 0:
-                    # Fill up the last shard
-                    to_add = min(space_left, len(remaining_embeddings))
-                    logger.info(f"Adding {to_add} embeddings to existing shard {last_shard['id']} ({last_shard['num_chunks']}/{self.shard_size})")
-
-                    # Load existing shard
-                    shard_file = self.embeddings_dir / last_shard['file']
-                    with open(shard_file, 'rb') as f:
-                        shard_data = pickle.load(f)
-
-                    # Append new data
-                    shard_data['text_embeddings'].extend(remaining_embeddings[:to_add])
-                    shard_data['metadatas'].extend(remaining_metadatas[:to_add])
-
-                    # Save updated shard
-                    with open(shard_file, 'wb') as f:
-                        pickle.dump(shard_data, f)
-
-                    # Update index
-                    last_shard['num_chunks'] += to_add
-                    last_shard['papers'] = list(set(last_shard['papers'] + remaining_urls[:to_add]))
-
-                    # Update remaining
-                    remaining_embeddings = remaining_embeddings[to_add:]
-                    remaining_metadatas = remaining_metadatas[to_add:]
-                    remaining_urls = remaining_urls[to_add:]
-
-                    self.index_data['total_chunks'] += to_add
-                    self._save_index()
-
-                    logger.info(f"Shard {last_shard['id']} now has {last_shard['num_chunks']} chunks")
-                    continue
-
-            # Create new shard if we still have remaining embeddings
-            if remaining_embeddings:
-                shard_id = len(self.index_data['shards'])
-                shard_file = self.embeddings_dir / f"shard_{shard_id:04d}.pkl"
-
-                # Take up to shard_size embeddings
-                to_add = min(self.shard_size, len(remaining_embeddings))
-                logger.info(f"Creating new shard {shard_id} with {to_add} embeddings")
-
-                # Save new shard
-                with open(shard_file, 'wb') as f:
-                    pickle.dump({
-                        'text_embeddings': remaining_embeddings[:to_add],
-                        'metadatas': remaining_metadatas[:to_add]
-                    }, f)
-
-                # Update index
-                self.index_data['shards'].append({
-                    'id': shard_id,
-                    'file': shard_file.name,
-                    'num_chunks': to_add,
-                    'papers': list(set(remaining_urls[:to_add]))
-                })
-
-                # Update remaining
-                remaining_embeddings = remaining_embeddings[to_add:]
-                remaining_metadatas = remaining_metadatas[to_add:]
-                remaining_urls = remaining_urls[to_add:]
-
-                self.index_data['total_chunks'] += to_add
-                self._save_index()
+        if not text_embeddings:
+            return
+
+        self._append(text_embeddings, metadatas)
+        self.index_data['papers'] = sorted(set(self.index_data['papers']) | set(paper_urls))
+        self._save_index()
 
         logger.info(f"Total chunks: {self.index_data['total_chunks']}")
 
+    def _append(self, text_embeddings: List[Tuple[str, List[float]]], metadatas: List[dict]):
+        """Write rows to the vector and record files and update the in-memory index."""
+        texts = [text for text, _ in text_embeddings]
+        vectors = np.array([emb for _, emb in text_embeddings], dtype=np.float32)
+        if self.index_data.get('normalized'):
+            l2_normalize(vectors)
+
+        dim = self.index_data['dim']
+        if dim is None:
+            dim = self.index_data['dim'] = int(vectors.shape[1])
+        elif vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match stored dimension {dim}")
+
+        vector_bytes = self.index_data['total_chunks'] * dim * 4
+        with open(self.vectors_file, 'ab') as f:
+            f.truncate(vector_bytes)
+            f.write(vectors.tobytes())
+
+        records = "".join(
+            json.dumps({'text': text, 'metadata': metadata}, ensure_ascii=False) + "\n"
+            for text, metadata in zip(texts, metadatas)
+        ).encode('utf-8')
+        with open(self.records_file, 'ab') as f:
+            f.truncate(self.index_data['records_bytes'])
+            f.write(records)
+
+        self.index_data['total_chunks'] += len(texts)
+        self.index_data['records_bytes'] += len(records)
+
+    def get_vectors(self) -> np.ndarray:
+        """
+        Memory-map all stored vectors.
+
+        Returns:
+            Read-only float32 array of shape (total_chunks, dim)
+        """
+        total = self.index_data['total_chunks']
+        if total == 0:
+            return np.empty((0, self.index_data['dim'] or 0), dtype=np.float32)
+        return np.memmap(
+            self.vectors_file,
+            dtype=np.float32,
+            mode='r',
+            shape=(total, self.index_data['dim'])
+        )
+
+    def iter_records(self) -> Iterator[Tuple[str, dict]]:
+        """Iterate over (text, metadata) in row order."""
+        with open(self.records_file, 'rb') as f:
+            for _ in range(self.index_data['total_chunks']):
+                record = json.loads(f.readline())
+                yield record['text'], record['metadata']
+
     def iter_all_embeddings(
         self,
         batch_size: int = 1000
-    ) -> Iterator[Tuple[List[Tuple[str, List[float]]], List[dict]]]:
+    ) -> Iterator[Tuple[List[str], np.ndarray, List[dict]]]:
         """
         Iterate over all embeddings in batches.
 
@@ -149,49 +205,41 @@ class EmbeddingsManager:
             batch_size: Number of embeddings per batch
 
         Yields:
-            (text_embeddings, metadatas) tuples
+            (texts, embeddings, metadatas) tuples; embeddings is a memmap
+            slice of shape (len(texts), dim)
         """
-        batch_text_embeddings = []
+        vectors = self.get_vectors()
+        batch_texts = []
         batch_metadatas = []
+        start = 0
 
-        for shard_info in self.index_data['shards']:
-            shard_file = self.embeddings_dir / shard_info['file']
-            logger.info(f"Loading shard {shard_info['id']}: {shard_file}")
+        for text, metadata in self.iter_records():
+            batch_texts.append(text)
+            batch_metadatas.append(metadata)
 
-            with open(shard_file, 'rb') as f:
-                data = pickle.load(f)
-
-            text_embeddings = data['text_embeddings']
-            metadatas = data['metadatas']
-
-            for text_emb, metadata in zip(text_embeddings, metadatas):
-                batch_text_embeddings.append(text_emb)
-                batch_metadatas.append(metadata)
-
-                if len(batch_text_embeddings) >= batch_size:
-                    yield batch_text_embeddings, batch_metadatas
-                    batch_text_embeddings = []
-                    batch_metadatas = []
+            if len(batch_texts) >= batch_size:
+                yield batch_texts, vectors[start:start + len(batch_texts)], batch_metadatas
+                start += len(batch_texts)
+                batch_texts = []
+                batch_metadatas = []
 
         # Yield remaining
-        if batch_text_embeddings:
-            yield batch_text_embeddings, batch_metadatas
+        if batch_texts:
+            yield batch_texts, vectors[start:start + len(batch_texts)], batch_metadatas
 
-    def get_all_embeddings(self) -> Tuple[List[Tuple[str, List[float]]], List[dict]]:
+    def get_all_embeddings(self) -> Tuple[List[str], np.ndarray, List[dict]]:
         """
-        Load all embeddings (use with caution for large datasets).
+        Load all texts and metadata, with the vectors memory-mapped.
 
         Returns:
-            (text_embeddings, metadatas) tuple
+            (texts, embeddings, metadatas) tuple
         """
-        all_text_embeddings = []
-        all_metadatas = []
-
-        for batch_text_emb, batch_meta in self.iter_all_embeddings(batch_size=10000):
-            all_text_embeddings.extend(batch_text_emb)
-            all_metadatas.extend(batch_meta)
-
-        return all_text_embeddings, all_metadatas
+        texts = []
+        metadatas = []
+        for text, metadata in self.iter_records():
+            texts.append(text)
+            metadatas.append(metadata)
+        return texts, self.get_vectors(), metadatas
 
     def get_total_chunks(self) -> int:
         """Get total number of chunks."""
@@ -199,4 +247,4 @@ class EmbeddingsManager:
 
     def exists(self) -> bool:
         """Check if embeddings exist."""
-        return len(self.index_data['shards']) > 0
+        return self.index_data['total_chunks'] > 0
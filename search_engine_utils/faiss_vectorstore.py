@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import Dict, Iterable, List, Tuple
 
 import loguru
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_core.documents import Document
@@ -18,6 +19,49 @@ ALLOWED_DISTANCE_STRATEGY = [
 ]
 
 
+def faiss_store_kwargs(metric: str) -> Dict:
+    """
+    LangChain FAISS keyword arguments for an index metric.
+
+    "IP" indexes hold L2-normalized vectors, so inner product is cosine
+    similarity. Callers normalize vectors before adding them (LangChain's
+    normalize_L2 flag is only meant for Euclidean indexes).
+    """
+    if metric == "IP":
+        return {'distance_strategy': DistanceStrategy.MAX_INNER_PRODUCT}
+    if metric == "L2":
+        return {'distance_strategy': DistanceStrategy.EUCLIDEAN_DISTANCE}
+    raise ValueError(f"Unknown FAISS metric: {metric}")
+
+
+def rerank_exact(
+    query_vector: np.ndarray,
+    rows: np.ndarray,
+    vectors: np.ndarray,
+    inner_product: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score FAISS hits with exact vectors (e.g. the memory-mapped store).
+
+    Args:
+        query_vector: Query of shape (dim,), normalized for inner product
+        rows: Candidate row ids from an approximate/compressed index
+        vectors: Exact vectors indexed by row id
+        inner_product: Score by inner product (cosine) instead of L2
+
+    Returns:
+        (rows, similarities) best first; L2 distances map to 1 - d / 2
+    """
+    order = np.argsort(rows)  # read the memmap in file order
+    exact = np.asarray(vectors[rows[order]], dtype=np.float32)
+    if inner_product:
+        scores = exact @ query_vector
+    else:
+        scores = 1 - ((exact - query_vector) ** 2).sum(axis=1) / 2
+    ranked = np.argsort(-scores, kind='stable')
+    return rows[order][ranked], scores[ranked]
+
+
 class FaissVectorStore:
     """In-memory FAISS vector store."""
 
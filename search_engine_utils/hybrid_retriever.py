@@ -3,15 +3,16 @@
 Hybrid retrieval combining vector search (FAISS) and keyword search (BM25)
 """
 
+import faiss
 import numpy as np
-from typing import List, Tuple, Dict, Any
+from typing import List, Optional, Sequence, Tuple, Dict, Any
 
 from langchain_core.documents import Document
 from langchain_ollama import OllamaEmbeddings
-from nltk.tokenize import TreebankWordTokenizer
-from rank_bm25 import BM25Okapi
 
-from search_engine_utils.faiss_vectorstore import FaissVectorStore
+from search_engine_utils.bm25_index import BM25Index, tokenize, tokenize_corpus
+from search_engine_utils.faiss_vectorstore import FaissVectorStore, rerank_exact
+from search_engine_utils.query_cache import QueryEmbeddingCache
 
 
 class HybridRetriever:
@@ -27,29 +28,50 @@ class HybridRetriever:
 
     def __init__(
         self,
-        documents: List[Document],
+        documents: Sequence[Document],
         embedding_client: OllamaEmbeddings,
         vector_weight: float = 0.7,
         bm25_weight: float = 0.3,
-        similarity_threshold: float = 0.0,  # Minimum similarity score
-        faiss_db = None  # Optional: pre-loaded FAISS database
+        similarity_threshold: float | None = None,  # Minimum cosine similarity
+        faiss_db = None,  # Optional: pre-loaded FAISS database
+        candidate_k: int = 0,  # Top-N candidates per retriever (0 = full scan)
+        bm25_index: BM25Index | None = None,  # Optional: pre-built BM25 index
+        query_cache: QueryEmbeddingCache | None = None,  # Optional: configured query cache
+        exact_vectors: np.ndarray | None = None,  # Optional: uncompressed vectors by row
+        rerank_k: int = 0  # Re-score top-N FAISS hits with exact_vectors (0 = off)
     ):
         """
         Initialize hybrid retriever.
 
         Args:
-            documents: List of Document objects with content and metadata
+            documents: Documents in FAISS row order; a list, or a ChunkStore
+                that loads them from disk on demand
             embedding_client: Embedding model for vector search
             vector_weight: Weight for vector search scores (default: 0.7)
             bm25_weight: Weight for BM25 scores (default: 0.3)
-            similarity_threshold: Minimum similarity threshold for vector search
+            similarity_threshold: Minimum cosine similarity for vector search
+                candidates (None = no filtering)
             faiss_db: Optional pre-loaded FAISS database (to avoid recreating embeddings)
+            candidate_k: Number of candidates taken from FAISS and from BM25 before
+                fusion. 0 (default) scores the whole corpus, as before.
+            bm25_index: Optional pre-built BM25 index over the same documents
+                (to avoid re-tokenizing at startup)
+            query_cache: Optional query embedding cache; a default one around
+                embedding_client is created if not given
+            exact_vectors: Uncompressed vectors in FAISS row order (e.g. the
+                memory-mapped embedding store), used for re-ranking
+            rerank_k: Number of top FAISS hits re-scored with exact_vectors,
+                for quantized indexes (0 = off)
         """
         self.documents = documents
         self.embedding_client = embedding_client
         self.vector_weight = vector_weight
         self.bm25_weight = bm25_weight
         self.similarity_threshold = similarity_threshold
+        self.candidate_k = candidate_k
+        self.query_cache = query_cache or QueryEmbeddingCache(embedding_client)
+        self.exact_vectors = exact_vectors
+        self.rerank_k = rerank_k if exact_vectors is not None else 0
 
         # Use pre-loaded FAISS db if provided, otherwise create new one
         if faiss_db is not None:
@@ -66,36 +88,43 @@ class HybridRetriever:
                 metadatas=[doc.metadata for doc in documents]
             )
 
+        # Row i of the FAISS index is self.documents[i] and BM25 document i,
+        # so fusion works on integer row ids instead of page_content keys
+        ntotal = self.vector_store.db.index.ntotal
+        if ntotal != len(documents):
+            raise ValueError(
+                f"FAISS index has {ntotal} vectors but {len(documents)} documents were given"
+            )
+
         # Initialize BM25
-        self._init_bm25()
+        self._init_bm25(bm25_index)
 
-    def _init_bm25(self):
+    def _init_bm25(self, bm25_index: BM25Index | None = None):
         """Initialize BM25 index."""
         from loguru import logger
 
+        if bm25_index is not None:
+            if bm25_index.corpus_size != len(self.documents):
+                raise ValueError(
+                    f"BM25 index has {bm25_index.corpus_size} documents but {len(self.documents)} documents were given"
+                )
+            logger.info("Using pre-built BM25 index (skipping tokenization)")
+            self.bm25 = bm25_index
+            return
+
         # Extract text content from documents
         logger.info(f"Extracting text from {len(self.documents)} documents...")
-        self.doc_texts = [doc.page_content for doc in self.documents]
+        if hasattr(self.documents, 'iter_texts'):
+            doc_texts = list(self.documents.iter_texts())
+        else:
+            doc_texts = [doc.page_content for doc in self.documents]
 
         # Create BM25 index
         logger.info("Tokenizing documents for BM25...")
-        self.tokenizer = TreebankWordTokenizer()
-
-        # Show progress for large document sets
-        if len(self.doc_texts) > 1000:
-            from tqdm import tqdm
-            tokenized_docs = [
-                self.tokenizer.tokenize(doc.lower())
-                for doc in tqdm(self.doc_texts, desc="Tokenizing for BM25")
-            ]
-        else:
-            tokenized_docs = [
-                self.tokenizer.tokenize(doc.lower())
-                for doc in self.doc_texts
-            ]
+        tokenized_docs = tokenize_corpus(doc_texts)
 
         logger.info("Building BM25 index...")
-        self.bm25 = BM25Okapi(tokenized_docs)
+        self.bm25 = BM25Index(tokenized_docs)
         logger.info("✓ BM25 index ready")
 
     def _get_ranks_from_scores(self, scores: List[float]) -> np.ndarray:
@@ -109,68 +138,152 @@ class HybridRetriever:
         ranks[sorted_indices] = np.arange(len(arr))
         return ranks + 1  # 1-indexed ranks
 
+    def _query_vector(self, query: str) -> np.ndarray:
+        """Query embedding of shape (1, dim), normalized like the indexed vectors."""
+        db = self.vector_store.db
+        query_vector = np.array([self.query_cache.embed_query(query)], dtype=np.float32)
+        if db._normalize_L2 or db.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            query_vector /= np.linalg.norm(query_vector, axis=1, keepdims=True)
+        return query_vector
+
+    def _vector_search(
+        self,
+        query: str,
+        k: int,
+        query_vector: np.ndarray | None = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the FAISS index directly and return (row ids, similarities).
+
+        Row ids are FAISS positions, which are also positions in
+        self.documents and the BM25 corpus. Similarities are cosine for
+        inner-product indexes over normalized vectors; squared L2 distances
+        are mapped to 1 - d / 2, which is the same cosine for unit vectors.
+        """
+        db = self.vector_store.db
+        if query_vector is None:
+            query_vector = self._query_vector(query)
+
+        inner_product = db.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        distances, rows = db.index.search(query_vector, max(k, self.rerank_k))
+        valid = rows[0] >= 0  # FAISS pads with -1 when fewer than k hits
+        rows, similarities = rows[0][valid], distances[0][valid]
+        if not inner_product:
+            similarities = 1 - similarities / 2
+
+        if self.rerank_k:
+            # Quantized scores are approximate; re-score the head exactly
+            head, head_scores = rerank_exact(
+                query_vector[0], rows[:self.rerank_k], self.exact_vectors, inner_product
+            )
+            rows = np.concatenate([head, rows[self.rerank_k:]])
+            similarities = np.concatenate([head_scores, similarities[self.rerank_k:]])
+        return rows[:k], similarities[:k]
+
+    def _row_similarities(self, query_vector: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Similarities of given rows to the query, on the same scale as _vector_search.
+
+        Uses exact_vectors when available, otherwise vectors reconstructed
+        from the FAISS index (approximate for quantized indexes, like the
+        scores FAISS returns for them).
+        """
+        index = self.vector_store.db.index
+        if self.exact_vectors is not None:
+            order = np.argsort(rows)  # read the memmap in file order
+            vectors = np.empty((len(rows), index.d), dtype=np.float32)
+            vectors[order] = self.exact_vectors[rows[order]]
+        else:
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+                ivf.make_direct_map()
+            vectors = index.reconstruct_batch(rows.astype(np.int64))
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return vectors @ query_vector[0]
+        return 1 - ((vectors - query_vector[0]) ** 2).sum(axis=1) / 2
+
     def similarity_search(
         self,
         query: str,
         k: int = 5,
-        return_scores: bool = False
+        return_scores: bool = False,
+        candidate_k: int | None = None,
+        metadata_fields: Optional[List[str]] = None
     ) -> List[Document] | List[Tuple[Document, float]]:
         """
         Hybrid similarity search combining vector and BM25.
 
+        In candidate-bounded mode only the top-N documents from FAISS and the
+        top-N from BM25 are fused. Documents in both lists keep the ranks they get
+        in a full scan; any other document's score can differ by at most
+        (vector_weight + bm25_weight) / (N + 1), the rank-score it would have
+        had just outside the candidate list. BM25 candidates go through the
+        similarity threshold too, so both modes return only documents above
+        it. Pass candidate_k=0 to compare against the full scan.
+
         Args:
             query: Search query
             k: Number of results to return
             return_scores: Whether to return scores with documents
+            candidate_k: Override self.candidate_k for this call (0 = full scan)
+            metadata_fields: Only load these metadata fields for the returned
+                documents (None = all; honoured when documents is a ChunkStore)
 
         Returns:
             List of documents or list of (document, score) tuples
         """
-        # Step 1: Vector search with all documents
-        vector_results = self.vector_store.db.similarity_search_with_score(
+        if candidate_k is None:
+            candidate_k = self.candidate_k
+        bounded = 0 < candidate_k < len(self.documents)
+
+        # Step 1: Vector search (top candidates only when bounded)
+        query_vector = self._query_vector(query)
+        rows, similarities = self._vector_search(
             query,
-            k=len(self.documents)  # Get all for filtering
+            k=candidate_k if bounded else len(self.documents),
+            query_vector=query_vector
         )
 
         # Filter by similarity threshold
-        filtered_results = [
-            (doc, score) for doc, score in vector_results
-            if score >= self.similarity_threshold
-        ]
+        if self.similarity_threshold is not None:
+            rows = rows[similarities >= self.similarity_threshold]
 
-        if not filtered_results:
+        if len(rows) == 0:
             return [] if return_scores else []
 
-        # Create mapping from content to document
-        content_to_doc = {doc.page_content: doc for doc, _ in filtered_results}
-        doc_contents = list(content_to_doc.keys())
-
         # Step 2: Calculate vector scores (using ranks)
-        vector_ranks = np.arange(len(doc_contents)) + 1
+        vector_ranks = np.arange(len(rows)) + 1
         vector_scores = 1 / vector_ranks
 
         # Step 3: Calculate BM25 scores
-        tokenized_query = self.tokenizer.tokenize(query.lower())
-        bm25_scores_all = self.bm25.get_scores(tokenized_query)
-
-        # Map BM25 scores to filtered documents
-        doc_to_index = {content: i for i, content in enumerate(self.doc_texts)}
-        bm25_scores = []
-        for content in doc_contents:
-            idx = doc_to_index.get(content, -1)
-            if idx >= 0:
-                bm25_scores.append(bm25_scores_all[idx])
-            else:
-                bm25_scores.append(0.0)
-
-        bm25_scores = np.array(bm25_scores)
-
-        # Convert BM25 scores to ranks then to normalized scores
-        if bm25_scores.max() > 0:
-            bm25_ranks = self._get_ranks_from_scores(bm25_scores)
-            bm25_norm_scores = 1 / bm25_ranks
+        tokenized_query = tokenize(query)
+
+        # Map BM25 scores to candidate rows
+        if bounded:
+            # BM25 top candidates, ranked against the whole corpus
+            bm25_top, _ = self.bm25.top_k(tokenized_query, candidate_k)
+            bm25_ranks = np.full(len(self.documents), np.inf)
+            bm25_ranks[bm25_top] = np.arange(len(bm25_top)) + 1
+
+            # Add BM25-only candidates to the pool (no vector score)
+            bm25_only = bm25_top[~np.isin(bm25_top, rows)]
+            # Same threshold as in a full scan, where every row has a vector score
+            if self.similarity_threshold is not None and len(bm25_only):
+                keep = self._row_similarities(query_vector, bm25_only) >= self.similarity_threshold
+                bm25_only = bm25_only[keep]
+            rows = np.concatenate([rows, bm25_only])
+            vector_scores = np.concatenate([vector_scores, np.zeros(len(bm25_only))])
+
+            bm25_norm_scores = 1 / bm25_ranks[rows]
         else:
-            bm25_norm_scores = np.zeros_like(bm25_scores)
+            bm25_scores = self.bm25.get_scores(tokenized_query)[rows]
+
+            # Convert BM25 scores to ranks then to normalized scores
+            if bm25_scores.max() > 0:
+                bm25_ranks = self._get_ranks_from_scores(bm25_scores)
+                bm25_norm_scores = 1 / bm25_ranks
+            else:
+                bm25_norm_scores = np.zeros_like(bm25_scores)
 
         # Step 4: Combine scores with weights
         combined_scores = (
@@ -181,15 +294,15 @@ class HybridRetriever:
         # Step 5: Get top-k results
         top_indices = np.argsort(-combined_scores)[:k]
 
-        results = []
-        for idx in top_indices:
-            doc = content_to_doc[doc_contents[idx]]
-            if return_scores:
-                results.append((doc, combined_scores[idx]))
-            else:
-                results.append(doc)
+        # Only the final top-k documents are materialized
+        if hasattr(self.documents, 'get_many'):
+            docs = self.documents.get_many(rows[top_indices], metadata_fields=metadata_fields)
+        else:
+            docs = [self.documents[row] for row in rows[top_indices]]
 
-        return results
+        if return_scores:
+            return list(zip(docs, combined_scores[top_indices]))
+        return docs
 
     def get_relevant_documents(self, query: str, k: int = 5) -> List[Document]:
         """
@@ -0,0 +1,157 @@
+"""
+Paper-level metadata stored once per paper, next to the FAISS index.
+
+Chunks in the docstore only carry a paper id and their position in the
+paper; paper fields (title, content, personal_notes, flow_chart, ...) live
+here and are joined in when search results are returned. Each field is a
+separate row, so a lookup for a few fields never reads the large ones.
+"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Saved alongside index.faiss / index.pkl in the index directory
+PAPERS_DB_NAME = "paper_metadata.sqlite"
+
+# Name used before the rename; it clashed with the top-level papers.sqlite
+LEGACY_PAPERS_DB_NAME = "papers.sqlite"
+
+# Paper ids per SELECT; stays under SQLite's bound-variable limit (999 on old builds)
+GET_MANY_BATCH = 500
+
+# Fields kept on each chunk; everything else is paper-level
+CHUNK_FIELDS = ('paper_id', 'chunk_index', 'chunk_source', 'total_chunks', 'pdf_pages')
+
+
+def split_chunk_metadata(metadata: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any], Dict[str, Any]]:
+    """
+    Split full (pre-side-table) chunk metadata into paper and chunk parts.
+
+    Returns:
+        (paper_id, paper_metadata, chunk_metadata); paper_id is the paper URL
+    """
+    paper_id = metadata.get('paper_id') or metadata.get('url')
+    paper_metadata = {k: v for k, v in metadata.items() if k not in CHUNK_FIELDS}
+    chunk_metadata = {k: v for k, v in metadata.items() if k in CHUNK_FIELDS}
+    chunk_metadata['paper_id'] = paper_id
+    return paper_id, paper_metadata, chunk_metadata
+
+
+def paper_store_path(index_dir: Path) -> Path:
+    """
+    Path of the paper store in an index directory.
+
+    An index written under the old file name is renamed in place, so older
+    indexes keep working without a rebuild.
+    """
+    index_dir = Path(index_dir)
+    db_path = index_dir / PAPERS_DB_NAME
+    legacy_path = index_dir / LEGACY_PAPERS_DB_NAME
+    if not db_path.exists() and legacy_path.exists():
+        try:
+            legacy_path.replace(db_path)
+        except FileNotFoundError:
+            pass  # Another process migrated it first
+    return db_path
+
+
+class PaperMetadataStore:
+    """SQLite table of (paper_id, field) -> JSON value."""
+
+    def __init__(self, db_path: Path):
+        """
+        Open (or create) the store.
+
+        Args:
+            db_path: Path of the SQLite file (usually paper_store_path(index_dir))
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS paper_fields (
+                paper_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (paper_id, field)
+            ) WITHOUT ROWID
+            """)
+            # Lets fields() list field names without reading any values
+            conn.execute("CREATE INDEX IF NOT EXISTS paper_fields_field ON paper_fields (field)")
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upsert_many(self, papers: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Set the given fields of each (paper_id, metadata) pair; other stored fields are kept."""
+        papers = [(paper_id, metadata) for paper_id, metadata in papers if paper_id]
+        if not papers:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO paper_fields (paper_id, field, value) VALUES (?, ?, ?)",
+                [
+                    (paper_id, field, json.dumps(value, ensure_ascii=False))
+                    for paper_id, metadata in papers
+                    for field, value in metadata.items()
+                ]
+            )
+
+    def upsert(self, paper_id: str, metadata: Dict[str, Any]):
+        """Set the given fields of one paper."""
+        self.upsert_many([(paper_id, metadata)])
+
+    def get_many(
+        self,
+        paper_ids: Iterable[str],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch metadata for several papers.
+
+        Args:
+            paper_ids: Papers to look up (missing ones are left out of the result)
+            fields: Only read these fields (None = all fields)
+
+        Returns:
+            {paper_id: {field: value}}
+        """
+        paper_ids = list(set(paper_ids))
+        if not paper_ids or fields == []:
+            return {}
+
+        field_filter = ""
+        if fields is not None:
+            fields = list(fields)
+            field_filter = f" AND field IN ({','.join('?' * len(fields))})"
+
+        papers: Dict[str, Dict[str, Any]] = {}
+        with self._connect() as conn:
+            for start in range(0, len(paper_ids), GET_MANY_BATCH):
+                batch = paper_ids[start:start + GET_MANY_BATCH]
+                sql = (
+                    f"SELECT paper_id, field, value FROM paper_fields "
+                    f"WHERE paper_id IN ({','.join('?' * len(batch))}){field_filter}"
+                )
+                for paper_id, field, value in conn.execute(sql, batch + (fields or [])):
+                    papers.setdefault(paper_id, {})[field] = json.loads(value)
+        return papers
+
+    def fields(self) -> Set[str]:
+        """All field names stored for any paper."""
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute("SELECT DISTINCT field FROM paper_fields")}
+
+    def count(self) -> int:
+        """Number of papers in the store."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(DISTINCT paper_id) FROM paper_fields").fetchone()[0]
@@ -3,14 +3,19 @@ SQLite database manager for paper data.
 
 Provides functionality to create and query a SQLite database from paper summaries.
 """
+import hashlib
 import json
+import os
+import re
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import pandas as pd
+from typing import BinaryIO, Callable, Dict, Iterator, List, Any, Optional, Tuple
+from urllib.parse import quote
 from loguru import logger
 
-from .search_utils import fuzzy_match
+from .search_utils import FuzzyMatcher
 
 
 # Database schema definition
@@ -47,9 +52,149 @@ DB_SCHEMA = {
             "type": "TEXT",
             "description": "personal notes written by Xin (from dailies/notes/{date_added}.md)"
         }
-    ]
+    ],
+    "fulltext": {
+        "table_name": "papers_fts",
+        "columns": ["title", "content", "personal_notes"],
+        "description": "FTS5 index over papers (rowid = papers.rowid); rank with bm25(papers_fts), lower is better",
+        "example": (
+            "SELECT p.title, snippet(papers_fts, -1, '**', '**', '…', 16) AS snippet "
+            "FROM papers_fts JOIN papers p ON p.rowid = papers_fts.rowid "
+            "WHERE papers_fts MATCH 'retrieval augmented' ORDER BY bm25(papers_fts) LIMIT 10"
+        )
+    }
 }
 
+# Secondary indexes, created after the bulk load
+INDEXED_COLUMNS = ("published_at", "date_added")
+
+# Page cache used while building the database (KiB)
+BUILD_CACHE_KB = 64 * 1024
+
+NOTES_DIR = Path('dailies') / 'notes'
+
+# Query connections: memory-mapped reads and a larger prepared statement cache
+READ_MMAP_BYTES = 256 * 1024 * 1024
+READ_CACHED_STATEMENTS = 256
+
+# What has been ingested so far: how far into summaries.jsonl (with a hash of
+# those bytes, to detect rewrites) and the hash of every notes file
+SYNC_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS sync_summaries (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        offset INTEGER NOT NULL,
+        lines INTEGER NOT NULL,
+        content_hash TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_notes (
+        date TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        content_hash TEXT NOT NULL
+    )
+    """,
+)
+
+# Full-text index over papers (external content: the text is stored once, in
+# papers). Filled in one pass after a bulk load; triggers keep it in sync
+# with later inserts and updates.
+FTS_TABLE = "papers_fts"
+FTS_COLUMNS = ("title", "content", "personal_notes")
+# bm25() column weights, in FTS_COLUMNS order: title matches count most
+FTS_WEIGHTS = (5.0, 1.0, 1.0)
+FTS_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, content, personal_notes,
+        content='papers', content_rowid='rowid',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+    f"""
+    CREATE TRIGGER papers_fts_insert AFTER INSERT ON papers BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, content, personal_notes)
+        VALUES (new.rowid, new.title, new.content, new.personal_notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER papers_fts_delete AFTER DELETE ON papers BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content, personal_notes)
+        VALUES ('delete', old.rowid, old.title, old.content, old.personal_notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER papers_fts_update AFTER UPDATE ON papers BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content, personal_notes)
+        VALUES ('delete', old.rowid, old.title, old.content, old.personal_notes);
+        INSERT INTO {FTS_TABLE} (rowid, title, content, personal_notes)
+        VALUES (new.rowid, new.title, new.content, new.personal_notes);
+    END
+    """,
+)
+
+# Trigram index over titles: candidates for the fuzzy_match() UDF, so it
+# does not have to score every title
+TRIGRAM_TABLE = "papers_title_trgm"
+TRIGRAM_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5(
+        title, content='papers', content_rowid='rowid', tokenize='trigram'
+    )
+    """,
+    f"INSERT INTO {TRIGRAM_TABLE} ({TRIGRAM_TABLE}) VALUES ('rebuild')",
+    f"""
+    CREATE TRIGGER papers_trgm_insert AFTER INSERT ON papers BEGIN
+        INSERT INTO {TRIGRAM_TABLE} (rowid, title) VALUES (new.rowid, new.title);
+    END
+    """,
+    f"""
+    CREATE TRIGGER papers_trgm_delete AFTER DELETE ON papers BEGIN
+        INSERT INTO {TRIGRAM_TABLE} ({TRIGRAM_TABLE}, rowid, title) VALUES ('delete', old.rowid, old.title);
+    END
+    """,
+    f"""
+    CREATE TRIGGER papers_trgm_update AFTER UPDATE OF title ON papers BEGIN
+        INSERT INTO {TRIGRAM_TABLE} ({TRIGRAM_TABLE}, rowid, title) VALUES ('delete', old.rowid, old.title);
+        INSERT INTO {TRIGRAM_TABLE} (rowid, title) VALUES (new.rowid, new.title);
+    END
+    """,
+)
+
+# Derived indexes, created after a bulk load (or on sync if missing)
+DERIVED_INDEXES = ((FTS_TABLE, FTS_SCHEMA), (TRIGRAM_TABLE, TRIGRAM_SCHEMA))
+
+INSERT_COLUMNS = "title, published_at, url, content, date_added, personal_notes"
+
+# Incremental sync: insert new titles, update existing ones only if something changed
+UPSERT_SQL = f"""
+INSERT INTO papers ({INSERT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (title) DO UPDATE SET
+    published_at = excluded.published_at,
+    url = excluded.url,
+    content = excluded.content,
+    date_added = excluded.date_added,
+    personal_notes = excluded.personal_notes
+WHERE papers.published_at IS NOT excluded.published_at
+    OR papers.url IS NOT excluded.url
+    OR papers.content IS NOT excluded.content
+    OR papers.date_added IS NOT excluded.date_added
+    OR papers.personal_notes IS NOT excluded.personal_notes
+"""
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def fulltext_query(text: str) -> str:
+    """FTS5 query matching all words of free text (each quoted, so punctuation is not syntax)."""
+    terms = re.findall(r"\w+", text)
+    return ' '.join(f'"{term}"' for term in terms)
+
 
 class PaperSqliteManager:
     """Manager for SQLite database of paper summaries."""
@@ -58,7 +203,9 @@ class PaperSqliteManager:
         self,
         paper_summaries_path: Path,
         sqlite_path: Path,
-        overwrite: bool = False
+        overwrite: bool = False,
+        notes_dir: Path = NOTES_DIR,
+        sync_interval: float = 5.0
     ):
         """
         Initialize the SQLite manager.
@@ -66,91 +213,360 @@ class PaperSqliteManager:
         Args:
             paper_summaries_path: Path to summaries.jsonl file
             sqlite_path: Path where SQLite database should be created/loaded
-            overwrite: If True, recreate the database from scratch
+            overwrite: If True, recreate the database from scratch; otherwise an
+                existing database is brought up to date with sync()
+            notes_dir: Directory of personal notes files ({date_added}.md)
+            sync_interval: Minimum seconds between file checks in sync_if_changed()
         """
         self.paper_summaries_path = paper_summaries_path
         self.sqlite_path = sqlite_path
+        self.notes_dir = Path(notes_dir)
+        self.sync_interval = sync_interval
+        # Statistics of the last create_database() run (None if the existing file was used)
+        self.last_build: Optional[Dict[str, Any]] = None
+        # Statistics of the last sync() that found changes
+        self.last_sync: Optional[Dict[str, Any]] = None
+        self._sync_lock = threading.Lock()
+        self._checked_at = 0.0
+        self._seen_signature = None
+        self.fuzzy_matcher = FuzzyMatcher(self._trigram_candidates, self._all_titles)
+        # Read-only connections, one per thread (see _reader)
+        self._reset_readers()
+        os.register_at_fork(after_in_child=self._reset_readers)
 
         if overwrite or not sqlite_path.exists():
             self.create_database()
         else:
             logger.info(f"Using existing SQLite database at {sqlite_path}")
+            self.sync()
+        self._seen_signature = self._files_signature()
 
-    def create_database(self):
-        """Create SQLite database from summaries.jsonl file."""
-        logger.info(f"Creating SQLite database at {self.sqlite_path}")
+    def create_database(self) -> Dict[str, Any]:
+        """
+        Create SQLite database from summaries.jsonl file.
 
-        # Use dict to deduplicate by title, keeping the latest entry
-        papers_dict = {}
-        with self.paper_summaries_path.open(encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    paper_data = json.loads(line)
-                    title = paper_data.get('title')
-                    if title:  # Only add if title exists
-                        papers_dict[title] = paper_data
+        The database is built in a temporary file and moved into place when
+        complete, so readers see either the old or the new database, never a
+        half-loaded one. That makes it safe to load with journaling and fsync
+        off, in a single transaction.
 
-        # Convert dict back to list
-        all_paper_data = list(papers_dict.values())
-        logger.info(f"Loaded {len(all_paper_data)} unique papers")
+        Returns:
+            Build statistics: papers, seconds and rows_per_sec
+        """
+        logger.info(f"Creating SQLite database at {self.sqlite_path}")
+        start = time.perf_counter()
+
+        tmp_path = self.sqlite_path.with_name(f"{self.sqlite_path.name}.{os.getpid()}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        conn = sqlite3.connect(str(tmp_path))
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"PRAGMA cache_size=-{BUILD_CACHE_KB}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+
+            with conn:
+                conn.execute("""
+                CREATE TABLE papers (
+                    title TEXT PRIMARY KEY,
+                    published_at TEXT,
+                    url TEXT,
+                    content TEXT,
+                    date_added TEXT,
+                    personal_notes TEXT
+                )
+                """)
+                for statement in SYNC_SCHEMA:
+                    conn.execute(statement)
+
+                # Each notes file is read once, up front
+                notes = {}
+                for date_added, (text, size, mtime_ns, content_hash) in self._read_notes_files().items():
+                    notes[date_added] = text
+                    conn.execute(
+                        "INSERT INTO sync_notes (date, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                        (date_added, size, mtime_ns, content_hash)
+                    )
+
+                digest = hashlib.blake2b(digest_size=16)
+                progress = {'offset': 0, 'lines': 0}
+                with self.paper_summaries_path.open('rb') as f:
+                    # Later lines replace earlier ones with the same title, keeping the latest entry
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO papers ({INSERT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                        self._paper_rows(f, digest, progress, notes.get)
+                    )
+                self._save_summaries_state(conn, progress, digest)
+
+                # Secondary and full-text indexes are cheaper to build once over the loaded table
+                for column in INDEXED_COLUMNS:
+                    conn.execute(f"CREATE INDEX papers_{column} ON papers ({column})")
+                for _, schema in DERIVED_INDEXES:
+                    for statement in schema:
+                        conn.execute(statement)
+            count = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.sqlite_path)
+
+        seconds = time.perf_counter() - start
+        build_stats = {
+            "papers": count,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(count / seconds, 1) if seconds > 0 else None
+        }
+        self.last_build = build_stats
+        logger.info(
+            f"Database created successfully with {count} papers "
+            f"in {seconds:.2f}s ({build_stats['rows_per_sec']} rows/s)"
+        )
+        return build_stats
 
-        conn = sqlite3.connect(str(self.sqlite_path))
-        cur = conn.cursor()
+    def sync(self) -> Dict[str, Any]:
+        """
+        Bring the database up to date with summaries.jsonl and the notes files.
 
-        # Drop existing table to ensure clean state
-        cur.execute("DROP TABLE IF EXISTS papers")
+        Lines appended to summaries.jsonl since the last sync are upserted and
+        changed notes files update the personal_notes of their date. If the
+        already ingested part of summaries.jsonl was rewritten (or the
+        database predates sync tracking), the database is rebuilt instead.
 
-        # Create table
-        cur.execute("""
-        CREATE TABLE papers (
-            title TEXT PRIMARY KEY,
-            published_at TEXT,
-            url TEXT,
-            content TEXT,
-            date_added TEXT,
-            personal_notes TEXT
-        )
-        """)
+        Returns:
+            Statistics: mode ("unchanged", "incremental" or "rebuild"), rows, notes and seconds
+        """
+        with self._sync_lock:
+            start = time.perf_counter()
+            # BEGIN IMMEDIATE: one process syncs at a time; the others then find nothing to do
+            conn = sqlite3.connect(str(self.sqlite_path), timeout=30, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = self._sync_incremental(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.close()
+
+            if result is None:
+                build_stats = self.create_database()
+                result = {'mode': 'rebuild', 'rows': build_stats['papers'], 'notes': None}
+            result['seconds'] = round(time.perf_counter() - start, 3)
+
+            if result['mode'] != 'unchanged':
+                self.last_sync = result
+                logger.info(
+                    f"Synced SQLite database ({result['mode']}): {result['rows']} papers, "
+                    f"{result['notes']} notes files in {result['seconds']}s"
+                )
+            return result
+
+    def _sync_incremental(self, conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+        """Apply new summaries lines and notes changes in conn's transaction; None if a rebuild is needed."""
+        has_state = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN ('sync_summaries', 'sync_notes')"
+        ).fetchone()[0] == 2
+        state = conn.execute(
+            "SELECT offset, lines, content_hash FROM sync_summaries"
+        ).fetchone() if has_state else None
+        if state is None:
+            logger.info("SQLite database has no sync state; rebuilding")
+            return None
+        offset, lines, content_hash = state
+
+        for table, schema in DERIVED_INDEXES:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone() is None:
+                logger.info(f"Creating index table {table}")
+                for statement in schema:
+                    conn.execute(statement)
+        if self.paper_summaries_path.stat().st_size < offset:
+            logger.info(f"{self.paper_summaries_path} shrank; rebuilding")
+            return None
+
+        notes_changed = self._sync_notes(conn)
+
+        with self.paper_summaries_path.open('rb') as f:
+            digest = hashlib.blake2b(digest_size=16)
+            remaining = offset
+            while remaining:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+            if digest.hexdigest() != content_hash:
+                logger.info(f"Ingested part of {self.paper_summaries_path} was rewritten; rebuilding")
+                return None
+
+            progress = {'offset': offset, 'lines': lines}
+            notes: Dict[str, Optional[str]] = {}
+
+            def notes_for(date_added: str) -> Optional[str]:
+                if date_added not in notes:
+                    notes[date_added] = self._load_notes(date_added)
+                return notes[date_added]
+
+            # rowcount leaves out the full-text index rows the triggers write
+            rows = conn.executemany(UPSERT_SQL, self._paper_rows(f, digest, progress, notes_for)).rowcount
+
+        if progress['offset'] != offset:
+            self._save_summaries_state(conn, progress, digest)
+        if not rows and not notes_changed and progress['offset'] == offset:
+            return {'mode': 'unchanged', 'rows': 0, 'notes': 0}
+        return {'mode': 'incremental', 'rows': rows, 'notes': notes_changed}
+
+    def _sync_notes(self, conn: sqlite3.Connection) -> int:
+        """Update personal_notes for notes files that changed since the last sync; returns how many changed."""
+        stored = {
+            date_added: (size, mtime_ns, content_hash)
+            for date_added, size, mtime_ns, content_hash in conn.execute(
+                "SELECT date, size, mtime_ns, content_hash FROM sync_notes"
+            )
+        }
+        changed = 0
+        for path in self._notes_files():
+            date_added = path.stem
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            old = stored.pop(date_added, None)
+            if old is not None and old[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            loaded = self._read_notes_file(path)
+            if loaded is None:
+                continue
+            text, size, mtime_ns, content_hash = loaded
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_notes (date, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (date_added, size, mtime_ns, content_hash)
+            )
+            if old is None or old[2] != content_hash:
+                conn.execute("UPDATE papers SET personal_notes = ? WHERE date_added = ?", (text, date_added))
+                changed += 1
+
+        # Notes files that were deleted
+        for date_added in stored:
+            conn.execute("DELETE FROM sync_notes WHERE date = ?", (date_added,))
+            conn.execute("UPDATE papers SET personal_notes = NULL WHERE date_added = ?", (date_added,))
+            changed += 1
+        return changed
+
+    def sync_if_changed(self) -> Optional[Dict[str, Any]]:
+        """
+        Run sync() if summaries.jsonl or a notes file changed on disk.
 
-        conn.commit()
+        Cheap enough to call per request: files are stat()ed at most every
+        sync_interval seconds.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.sync_interval:
+            return None
+        self._checked_at = now
+        signature = self._files_signature()
+        if signature == self._seen_signature:
+            return None
+        result = self.sync()
+        self._seen_signature = signature
+        # Titles may have changed, here or in another process
+        self.fuzzy_matcher.refresh()
+        return result
+
+    def _files_signature(self) -> Tuple:
+        """(size, mtime) of summaries.jsonl and of every notes file."""
+        paths = [self.paper_summaries_path] + self._notes_files()
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(signature)
+
+    def _paper_rows(
+        self,
+        f: BinaryIO,
+        digest,
+        progress: Dict[str, int],
+        notes_for: Callable[[str], Optional[str]]
+    ) -> Iterator[Tuple]:
+        """
+        Stream insert rows from summaries.jsonl, starting at f's position.
 
-        # Insert data
-        insert_sql = """
-        INSERT OR REPLACE INTO papers (
-            title, published_at, url, content, date_added, personal_notes
-        ) VALUES (?, ?, ?, ?, ?, ?)
+        Every consumed line is added to digest and counted in progress
+        (offset, lines). A last line without a newline is consumed only if it
+        parses: otherwise it is probably still being written.
         """
+        for line in f:
+            complete = line.endswith(b'\n')
+            if line.strip():
+                try:
+                    paper = json.loads(line)
+                except json.JSONDecodeError:
+                    if not complete:
+                        return
+                    logger.warning(f"Skipping malformed line {progress['lines'] + 1} of {self.paper_summaries_path}")
+                    paper = {}
+            else:
+                paper = {}
+            digest.update(line)
+            progress['offset'] += len(line)
+            progress['lines'] += 1
+
+            if not paper.get('title'):  # Only add if title exists
+                continue
 
-        for paper in all_paper_data:
             # Get date_added from 'date' field
             date_added = paper.get("date")
-
-            # Load personal notes if available
-            personal_notes = None
-            if date_added:
-                notes_file = Path('dailies') / 'notes' / f'{date_added}.md'
-                if notes_file.exists():
-                    try:
-                        with open(notes_file, 'r', encoding='utf-8') as f:
-                            personal_notes = f.read().strip()
-                    except Exception as e:
-                        logger.warning(f"Failed to load notes for {date_added}: {e}")
-
-            cur.execute(
-                insert_sql,
-                (
-                    paper.get("title"),
-                    paper.get("published_at"),
-                    paper.get("url"),
-                    paper.get("content"),
-                    date_added,
-                    personal_notes,
-                )
+            yield (
+                paper.get("title"),
+                paper.get("published_at"),
+                paper.get("url"),
+                paper.get("content"),
+                date_added,
+                notes_for(date_added) if date_added else None,
             )
 
-        conn.commit()
-        conn.close()
-        logger.info(f"Database created successfully with {len(all_paper_data)} papers")
+    @staticmethod
+    def _save_summaries_state(conn: sqlite3.Connection, progress: Dict[str, int], digest):
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_summaries (id, offset, lines, content_hash) VALUES (1, ?, ?, ?)",
+            (progress['offset'], progress['lines'], digest.hexdigest())
+        )
+
+    def _notes_files(self) -> List[Path]:
+        if not self.notes_dir.is_dir():
+            return []
+        return sorted(self.notes_dir.glob('*.md'))
+
+    def _read_notes_file(self, path: Path) -> Optional[Tuple[str, int, int, str]]:
+        """(notes text, size, mtime_ns, content hash) of a notes file, or None if unreadable."""
+        try:
+            stat = path.stat()
+            data = path.read_bytes()
+            return data.decode('utf-8').strip(), stat.st_size, stat.st_mtime_ns, _content_hash(data)
+        except Exception as e:
+            logger.warning(f"Failed to load notes for {path.stem}: {e}")
+            return None
+
+    def _read_notes_files(self) -> Dict[str, Tuple[str, int, int, str]]:
+        """Every notes file, read once: date -> (text, size, mtime_ns, content hash)."""
+        notes = {}
+        for path in self._notes_files():
+            loaded = self._read_notes_file(path)
+            if loaded is not None:
+                notes[path.stem] = loaded
+        return notes
+
+    def _load_notes(self, date_added: str) -> Optional[str]:
+        """Personal notes for a date, or None if there are none."""
+        notes_file = self.notes_dir / f'{date_added}.md'
+        if not notes_file.exists():
+            return None
+        loaded = self._read_notes_file(notes_file)
+        return loaded[0] if loaded is not None else None
 
     def _register_udfs(self, conn: sqlite3.Connection):
         """
@@ -159,10 +575,57 @@ class PaperSqliteManager:
         Args:
             conn: SQLite connection
         """
-        # Register the fuzzy_match function from search_utils
-        conn.create_function(name="fuzzy_match", narg=2, func=fuzzy_match)
+        # fuzzy_match from search_utils, prefiltered by the title trigram index
+        conn.create_function(name="fuzzy_match", narg=2, func=self.fuzzy_matcher)
+
+    def _reset_readers(self):
+        """Drop pooled connections (also run in forked children: connections must not cross a fork)."""
+        self._readers = threading.local()
+
+    def _reader(self) -> sqlite3.Connection:
+        """
+        This thread's read-only connection, opened once per thread and process.
+
+        Reopened when the database file was replaced (create_database swaps
+        in a new file; an open connection would keep reading the old one).
+        """
+        inode = os.stat(self.sqlite_path).st_ino
+        pooled = getattr(self._readers, 'conn', None)
+        if pooled is not None and pooled[0] == inode:
+            return pooled[1]
+        if pooled is not None:
+            pooled[1].close()
+
+        conn = sqlite3.connect(
+            f"file:{quote(str(Path(self.sqlite_path).resolve()))}?mode=ro",
+            uri=True,
+            timeout=30,
+            cached_statements=READ_CACHED_STATEMENTS
+        )
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA mmap_size={READ_MMAP_BYTES}")
+        self._register_udfs(conn)
+        self._readers.conn = (inode, conn)
+        return conn
 
-    def query_df(self, sql: str) -> pd.DataFrame:
+    @staticmethod
+    def _dict_rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        if cursor.description is None:
+            return []
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _all_titles(self) -> List[str]:
+        return [row[0] for row in self._reader().execute("SELECT title FROM papers")]
+
+    def _trigram_candidates(self, trigrams: List[str]) -> List[str]:
+        """Titles containing any of the trigrams (case-insensitive)."""
+        match = ' OR '.join(f'"{trigram}"' for trigram in trigrams)
+        return [row[0] for row in self._reader().execute(
+            f"SELECT title FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH ?", (match,)
+        )]
+
+    def query_df(self, sql: str):
         """
         Execute SQL query and return results as pandas DataFrame.
 
@@ -172,10 +635,9 @@ class PaperSqliteManager:
         Returns:
             DataFrame with query results
         """
-        with sqlite3.connect(str(self.sqlite_path)) as conn:
-            # Register any custom UDFs
-            self._register_udfs(conn)
-            return pd.read_sql_query(sql, conn)
+        # Imported here: the server's query path does not need pandas
+        import pandas as pd
+        return pd.DataFrame(self.query_dict(sql))
 
     def query_dict(self, sql: str) -> List[Dict[str, Any]]:
         """
@@ -187,8 +649,68 @@ class PaperSqliteManager:
         Returns:
             List of dictionaries, one per row
         """
-        df = self.query_df(sql)
-        return df.to_dict(orient="records")
+        return self._dict_rows(self._reader().execute(sql))
+
+    def fulltext(
+        self,
+        query: str,
+        k: int = 10,
+        raw: bool = False,
+        snippet_tokens: int = 16
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyword search over title, content and personal_notes, ranked by bm25().
+
+        Args:
+            query: Search terms; all of them must match (stemmed, case- and
+                accent-insensitive)
+            k: Maximum number of results
+            raw: Pass query through as FTS5 query syntax (OR, NEAR, "phrases",
+                prefix*, column filters like title:...) instead of plain terms
+            snippet_tokens: Length of the returned snippet in tokens
+
+        Returns:
+            List of {title, url, published_at, date_added, score, snippet}
+            dicts, best first; higher score is better. Matches in the
+            snippet are wrapped in **...**.
+
+        Raises:
+            sqlite3.OperationalError: raw query is not valid FTS5 syntax
+        """
+        match = query if raw else fulltext_query(query)
+        if not match:
+            return []
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        sql = f"""
+        SELECT p.title, p.url, p.published_at, p.date_added,
+               -bm25({FTS_TABLE}, {weights}) AS score,
+               snippet({FTS_TABLE}, -1, '**', '**', '…', ?) AS snippet
+        FROM {FTS_TABLE}
+        JOIN papers p ON p.rowid = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY bm25({FTS_TABLE}, {weights})
+        LIMIT ?
+        """
+        return self._dict_rows(self._reader().execute(sql, (snippet_tokens, match, k)))
+
+    def fuzzy_titles(self, search_term: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Papers whose title fuzzy-matches search_term (same scoring as the fuzzy_match UDF).
+
+        Returns:
+            List of {title, url, published_at, date_added, score} dicts, best
+            first; score is fuzz.token_set_ratio (0-100)
+        """
+        matches = self.fuzzy_matcher.best(search_term, limit=k)
+        if not matches:
+            return []
+        placeholders = ', '.join('?' for _ in matches)
+        cursor = self._reader().execute(
+            f"SELECT title, url, published_at, date_added FROM papers WHERE title IN ({placeholders})",
+            [title for title, _ in matches]
+        )
+        rows = {row['title']: row for row in self._dict_rows(cursor)}
+        return [{**rows[title], 'score': score} for title, score in matches if title in rows]
 
     @staticmethod
     def get_schema() -> Dict[str, Any]:
@@ -207,26 +729,25 @@ class PaperSqliteManager:
         Returns:
             Dictionary with database statistics
         """
-        with sqlite3.connect(str(self.sqlite_path)) as conn:
-            cur = conn.cursor()
-
-            # Get total count
-            cur.execute("SELECT COUNT(*) FROM papers")
-            total_count = cur.fetchone()[0]
-
-            # Get date range
-            cur.execute("""
-                SELECT
-                    MIN(published_at) as earliest,
-                    MAX(published_at) as latest
-                FROM papers
-                WHERE published_at IS NOT NULL
-            """)
-            date_range = cur.fetchone()
-
-            return {
-                "total_papers": total_count,
-                "earliest_paper": date_range[0],
-                "latest_paper": date_range[1],
-                "database_path": str(self.sqlite_path)
-            }
+        cur = self._reader().cursor()
+
+        # Get total count
+        cur.execute("SELECT COUNT(*) FROM papers")
+        total_count = cur.fetchone()[0]
+
+        # Get date range
+        cur.execute("""
+            SELECT
+                MIN(published_at) as earliest,
+                MAX(published_at) as latest
+            FROM papers
+            WHERE published_at IS NOT NULL
+        """)
+        date_range = cur.fetchone()
+
+        return {
+            "total_papers": total_count,
+            "earliest_paper": date_range[0],
+            "latest_paper": date_range[1],
+            "database_path": str(self.sqlite_path)
+        }
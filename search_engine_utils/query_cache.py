@@ -0,0 +1,167 @@
+"""
+In-process cache and request coalescing for query embeddings.
+
+The search server embeds every /search query through Ollama, and /ask_wiki
+tends to repeat the same queries within a session. Query vectors are kept in
+an LRU bounded by bytes (with a TTL), and misses that arrive within a short
+window are sent to Ollama as one embed_queries call.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class QueryEmbeddingCache:
+    """LRU + TTL cache of query embeddings with batched misses."""
+
+    def __init__(
+        self,
+        embedding_client: Embeddings,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        batch_window_ms: float = 5.0
+    ):
+        """
+        Args:
+            embedding_client: Client used for cache misses
+            max_bytes: Memory budget for cached vectors (and their query strings)
+            ttl_seconds: How long a cached vector stays valid (0 = no expiry)
+            batch_window_ms: How long the first miss waits for other misses
+                before embedding them together (0 = embed immediately)
+        """
+        self.embedding_client = embedding_client
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.batch_window = batch_window_ms / 1000
+
+        self._entries: OrderedDict = OrderedDict()  # query -> (vector, expires_at)
+        self._bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.embed_seconds = 0.0
+        self.embedded = 0
+        self.saved_seconds = 0.0
+
+    def _entry_size(self, query: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(query.encode('utf-8'))
+
+    def _avg_embed_seconds(self) -> float:
+        return self.embed_seconds / self.batches if self.batches else 0.0
+
+    def _store(self, query: str, vector: np.ndarray):
+        """Insert under self._lock, evicting least recently used entries."""
+        size = self._entry_size(query, vector)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(query, None)
+        if old is not None:
+            self._bytes -= self._entry_size(query, old[0])
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else float('inf')
+        self._entries[query] = (vector, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            evicted, (evicted_vector, _) = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(evicted, evicted_vector)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embedding for a query, from cache or from the embedding client.
+
+        Returns:
+            float32 vector (shared with the cache; do not modify in place)
+        """
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(query)
+                    self.hits += 1
+                    self.saved_seconds += self._avg_embed_seconds()
+                    return vector
+                del self._entries[query]
+                self._bytes -= self._entry_size(query, vector)
+
+            self.misses += 1
+            future = self._inflight.get(query)
+            if future is not None:
+                # Same query already being embedded for another request
+                self.coalesced += 1
+                leader = False
+            else:
+                future = self._inflight[query] = Future()
+                self._pending.append(query)
+                leader = len(self._pending) == 1
+
+        if leader:
+            self._flush()
+        return future.result()
+
+    def _flush(self):
+        """Embed every query queued during the batch window in one call."""
+        if self.batch_window:
+            time.sleep(self.batch_window)
+        with self._lock:
+            batch, self._pending = self._pending, []
+
+        start = time.perf_counter()
+        try:
+            if len(batch) == 1:
+                vectors = [self.embedding_client.embed_query(batch[0])]
+            elif hasattr(self.embedding_client, 'embed_queries'):
+                vectors = self.embedding_client.embed_queries(batch)
+            else:
+                # Ollama embeds queries and documents the same way
+                vectors = self.embedding_client.embed_documents(batch)
+        except Exception as e:
+            logger.error(f"Query embedding failed for {len(batch)} queries: {e}")
+            with self._lock:
+                futures = [self._inflight.pop(query) for query in batch]
+            for future in futures:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.batches += 1
+            self.embedded += len(batch)
+            self.embed_seconds += elapsed
+            futures = []
+            for query, vector in zip(batch, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                vector.flags.writeable = False
+                self._store(query, vector)
+                futures.append((self._inflight.pop(query), vector))
+        for future, vector in futures:
+            future.set_result(vector)
+
+    def stats(self) -> dict:
+        """Hit rate, coalescing and latency counters for /stats."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'embedding_calls': self.batches,
+                'avg_batch_size': round(self.embedded / self.batches, 2) if self.batches else 0.0,
+                'avg_embed_ms': round(self._avg_embed_seconds() * 1000, 2),
+                'saved_ms': round(self.saved_seconds * 1000, 1)
+            }
@@ -2,8 +2,13 @@
 """
 Search utilities for fuzzy matching and other search operations
 """
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
-from thefuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz as rfuzz, process, utils as rutils
+from thefuzz import fuzz, utils
 
 
 def fuzzy_match(text: str, search_term: str, threshold: int = 60) -> int:
@@ -41,3 +46,144 @@ def fuzzy_match(text: str, search_term: str, threshold: int = 60) -> int:
 
     # Return 1 if similarity >= threshold, else 0
     return 1 if similarity >= threshold else 0
+
+
+def fuzzy_score(text: str, processed_term: str) -> int:
+    """token_set_ratio of text against an already processed search term (same result as fuzz.token_set_ratio)."""
+    return int(round(rfuzz.token_set_ratio(utils.full_process(text, force_ascii=True), processed_term)))
+
+
+def term_trigrams(processed_term: str) -> List[str]:
+    """Distinct 3-character sequences within the words of a processed search term."""
+    trigrams = []
+    for token in processed_term.split():
+        for i in range(len(token) - 2):
+            trigram = token[i:i + 3]
+            if trigram not in trigrams:
+                trigrams.append(trigram)
+    return trigrams
+
+
+class FuzzyMatcher:
+    """
+    fuzzy_match() for use as an SQLite UDF, without scoring every row.
+
+    The first call for a search term asks `candidates` for the indexed texts
+    sharing at least one trigram with it (e.g. from an FTS5 trigram index),
+    scores them in one vectorized rapidfuzz pass and remembers the scores.
+    Every other indexed text (`corpus`) is a non-match, so a row then costs
+    a dict and a set lookup. Terms without a word of 3+ characters have no
+    trigrams; the whole corpus is scored for them. Texts outside the corpus
+    (other columns, rows added since) are rejected when they share no
+    trigram with the term and scored individually otherwise.
+
+    Results match fuzzy_match() except for texts that share no 3-character
+    sequence with any word of the term, which are treated as non-matches.
+    """
+
+    def __init__(
+        self,
+        candidates: Callable[[List[str]], Iterable[str]],
+        corpus: Callable[[], Iterable[str]],
+        threshold: int = 60,
+        max_terms: int = 16,
+        batch_min: int = 64
+    ):
+        """
+        Args:
+            candidates: Returns the indexed texts containing any of the given
+                trigrams (case-insensitive)
+            corpus: Returns all indexed texts
+            threshold: Minimum similarity score (0-100) to consider a match
+            max_terms: Search terms whose scores are kept (least recently used are dropped)
+            batch_min: Texts needed before scoring with process.cdist
+        """
+        self.candidates = candidates
+        self.corpus = corpus
+        self.threshold = threshold
+        self.max_terms = max_terms
+        self.batch_min = batch_min
+        self._corpus: Optional[FrozenSet[str]] = None
+        self._terms: OrderedDict = OrderedDict()  # search term -> (processed, trigrams, scores, corpus)
+        # (search term, entry) of the last call: a query passes the same term for every row
+        self._last: Optional[Tuple[str, Tuple]] = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Forget the corpus and all term scores (call when the indexed texts changed)."""
+        with self._lock:
+            self._corpus = None
+            self._terms.clear()
+            self._last = None
+
+    def _term(self, search_term: str) -> Tuple[str, List[str], Dict[str, int], FrozenSet[str]]:
+        with self._lock:
+            # Loaded before any candidates are fetched: every corpus text not
+            # among a term's candidates then really shares no trigram with it
+            if self._corpus is None:
+                self._corpus = frozenset(self.corpus())
+            corpus = self._corpus
+            entry = self._terms.get(search_term)
+            if entry is not None:
+                self._terms.move_to_end(search_term)
+                return entry
+
+        processed = utils.full_process(search_term, force_ascii=True)
+        trigrams = term_trigrams(processed)
+        texts = list(dict.fromkeys(self.candidates(trigrams))) if trigrams else list(corpus)
+        scores = dict(zip(texts, self.score_batch(texts, processed)))
+
+        entry = (processed, trigrams, scores, corpus)
+        with self._lock:
+            if self._corpus is corpus:
+                self._terms[search_term] = entry
+                while len(self._terms) > self.max_terms:
+                    self._terms.popitem(last=False)
+        return entry
+
+    def score_batch(self, texts: List[str], processed_term: str) -> List[int]:
+        """fuzz.token_set_ratio scores of texts, vectorized when there are enough of them."""
+        if len(texts) < self.batch_min:
+            return [fuzzy_score(text, processed_term) for text in texts]
+        # utils.full_process(force_ascii=True), with the default_process step done in C
+        scores = process.cdist(
+            [processed_term],
+            [text if text.isascii() else utils.ascii_only(text) for text in texts],
+            scorer=rfuzz.token_set_ratio,
+            processor=rutils.default_process,
+            dtype=np.float64,
+            workers=-1
+        )[0]
+        # Rounded like fuzz.token_set_ratio
+        return np.round(scores).astype(int).tolist()
+
+    def best(self, search_term: str, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(text, score) of the indexed texts matching search_term, best first."""
+        _, _, scores, _ = self._term(search_term)
+        matches = sorted(
+            ((text, score) for text, score in scores.items() if score >= self.threshold),
+            key=lambda item: -item[1]
+        )
+        return matches[:limit] if limit else matches
+
+    def __call__(self, text: str, search_term: str) -> int:
+        if text is None or search_term is None:
+            return 0
+        last = self._last
+        if last is not None and last[0] == search_term:
+            entry = last[1]
+        else:
+            entry = self._term(search_term)
+            self._last = (search_term, entry)
+        processed, trigrams, scores, corpus = entry
+
+        score = scores.get(text)
+        if score is not None:
+            return 1 if score >= self.threshold else 0
+        if text in corpus:
+            return 0
+        if trigrams:
+            lowered = text.lower()
+            if not any(trigram in lowered for trigram in trigrams):
+                return 0
+        return 1 if fuzzy_score(text, processed) >= self.threshold else 0
@@ -0,0 +1,235 @@
+"""
+Write-behind store for /ask_wiki conversation histories.
+
+Messages are appended to an SQLite table (WAL mode) instead of rewriting a
+JSON file per session on every answer. Appends are buffered and written by a
+background thread in batches, one transaction per batch, so a crash loses at
+most the last flush interval and never leaves a half-written file. Recently
+used sessions are kept in a bounded in-memory LRU; a cached history is
+reused only while nothing newer was written for the session, so gunicorn
+workers sharing the database stay consistent.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+SESSIONS_DB_NAME = "sessions.sqlite"
+
+
+class SessionStore:
+    """Conversation histories by session id, with an LRU cache and batched writes."""
+
+    def __init__(
+        self,
+        sessions_dir: Path,
+        max_messages: int = 20,
+        max_cached_sessions: int = 256,
+        flush_interval: float = 1.0,
+        batch_size: int = 64
+    ):
+        """
+        Open (or create) the store; legacy {session_id}.json files are imported once.
+
+        Args:
+            sessions_dir: Directory for sessions.sqlite (and legacy JSON files)
+            max_messages: Messages kept per session (older ones are dropped)
+            max_cached_sessions: Sessions held in the in-memory LRU
+            flush_interval: Seconds buffered appends may wait before being written
+            batch_size: Buffered messages that trigger an immediate flush
+        """
+        self.sessions_dir = Path(sessions_dir)
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.sessions_dir / SESSIONS_DB_NAME
+        self.max_messages = max_messages
+        self.max_cached_sessions = max_cached_sessions
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            empty = conn.execute("SELECT 1 FROM messages LIMIT 1").fetchone() is None
+        if empty:
+            self._import_json_files()
+
+    def _reset(self):
+        """Fresh in-memory state (also run in forked children: threads and locks do not carry over)."""
+        self._cache: OrderedDict = OrderedDict()  # session_id -> (last message id, messages)
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                yield conn
+        finally:
+            conn.close()
+
+    def _import_json_files(self):
+        """Move histories from the old one-JSON-file-per-session layout into the table."""
+        rows = []
+        files = sorted(self.sessions_dir.glob("*.json"))
+        for path in files:
+            try:
+                messages = json.loads(path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable session file {path.name}: {e}")
+                continue
+            mtime = path.stat().st_mtime
+            rows.extend((path.stem, m['role'], m['content'], mtime) for m in messages[-self.max_messages:])
+        if rows:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)", rows
+                )
+            logger.info(f"Imported {len(rows)} messages from {len(files)} session files into {self.db_path.name}")
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        """History of a session, oldest first (empty for unknown sessions)."""
+        with self._lock:
+            has_pending = any(row[0] == session_id for row in self._pending)
+        if has_pending:
+            self.flush()
+
+        with self._connect() as conn:
+            last_id = conn.execute(
+                "SELECT MAX(id) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            with self._lock:
+                cached = self._cache.get(session_id)
+                if cached is not None and cached[0] == last_id:
+                    self._cache.move_to_end(session_id)
+                    return list(cached[1])
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages)
+            ).fetchall()
+
+        messages = [{'role': role, 'content': content} for role, content in reversed(rows)]
+        with self._lock:
+            self._cache[session_id] = (last_id, messages)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_cached_sessions:
+                self._cache.popitem(last=False)
+        return list(messages)
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        """Queue messages for a session; they are written by the background flusher."""
+        now = time.time()
+        with self._lock:
+            self._pending.extend((session_id, m['role'], m['content'], now) for m in messages)
+            # The cached copy no longer matches the table; reload on next get()
+            self._cache.pop(session_id, None)
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+                self._flusher.start()
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Session flush failed: {e}")
+
+    def flush(self):
+        """Write buffered messages in one transaction and trim sessions to max_messages."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)", batch
+                )
+                for session_id in {row[0] for row in batch}:
+                    conn.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                        "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                        (session_id, session_id, self.max_messages)
+                    )
+        except Exception:
+            # Keep the messages for the next attempt
+            with self._lock:
+                self._pending = batch + self._pending
+            raise
+
+    def iter_sessions(self) -> Iterator[Tuple[str, List[Dict[str, str]]]]:
+        """Iterate over (session_id, messages) for every stored session."""
+        self.flush()
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT session_id, role, content FROM messages ORDER BY session_id, id")
+            session_id, messages = None, []
+            for sid, role, content in cursor:
+                if sid != session_id:
+                    if messages:
+                        yield session_id, messages
+                    session_id, messages = sid, []
+                messages.append({'role': role, 'content': content})
+            if messages:
+                yield session_id, messages
+
+    def export_jsonl(self, path: Path) -> int:
+        """
+        Write every session as one JSON line {"session_id", "messages"} (atomically).
+
+        Returns:
+            Number of sessions written
+        """
+        path = Path(path)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for session_id, messages in self.iter_sessions():
+                f.write(json.dumps({'session_id': session_id, 'messages': messages}, ensure_ascii=False) + "\n")
+                count += 1
+        tmp_path.replace(path)
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Session and message counts, for /stats."""
+        with self._connect() as conn:
+            sessions, messages = conn.execute(
+                "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM messages"
+            ).fetchone()
+        with self._lock:
+            return {
+                'sessions': sessions,
+                'messages': messages,
+                'cached_sessions': len(self._cache),
+                'pending_messages': len(self._pending)
+            }
@@ -0,0 +1,233 @@
+"""
+Prompt assembly for the wiki agent (/ask_wiki, /lint_wiki, the daily lint).
+
+llm-wiki.md and wiki/WIKI.md are read once and re-read only when their
+mtime or size changes. Every prompt starts with the same rendered prefix
+(wiki pattern, project schema, working directory), followed by a fixed
+per-kind block, with the per-request parts (history, question) last. The
+leading bytes are therefore identical across requests, so the model
+backend can reuse its prefix (KV) cache.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+WIKI_CONTEXT_TEMPLATE = """=== WIKI PATTERN (llm-wiki.md) ===
+{llm_wiki_content}
+
+=== PROJECT SCHEMA (WIKI.md) ===
+{project_schema_content}
+
+Working directory: {repo_root}
+
+"""
+
+ASK_INSTRUCTIONS = """You are a research assistant helping answer questions based on the wiki knowledge base above.
+
+=== AVAILABLE TOOLS ===
+
+You have access to the following tools running on localhost:5001:
+
+1. **Vector Search** (semantic similarity via FAISS):
+   curl -X POST http://localhost:5001/search \\
+     -H "Content-Type: application/json" \\
+     -d '{"query": "your search query", "k": 5, "return_scores": true}'
+
+   Returns: {"results": [{"content": "...", "metadata": {"title": "...", "url": "...", ...}, "score": 0.85}]}
+
+2. **SQL Query** (structured queries on papers database):
+   curl -X POST http://localhost:5001/query \\
+     -H "Content-Type: application/json" \\
+     -d '{"sql": "SELECT title, published_at FROM papers WHERE ..."}'
+
+   Returns: {"results": [{"title": "...", "published_at": "...", ...}]}
+
+   Available columns: title, published_at, url, content, date_added, personal_notes
+
+3. **Full-text Search** (keyword match on titles, summaries and personal notes, bm25-ranked):
+   curl -X POST http://localhost:5001/fulltext \\
+     -H "Content-Type: application/json" \\
+     -d '{"query": "speculative decoding", "k": 10}'
+
+   Returns: {"results": [{"title": "...", "url": "...", "score": 12.3, "snippet": "... **speculative** **decoding** ..."}]}
+
+4. **Database Schema**:
+   curl http://localhost:5001/schema
+
+Use these tools to find relevant papers when the wiki alone doesn't have enough information.
+For example:
+- Use vector search for semantic queries: "papers about transformers"
+- Use SQL for structured filters: "papers published after 2024-01-01"
+- Use full-text search for exact terms, names and acronyms: "LoRA", "Mamba"
+- Read wiki pages for curated summaries and cross-referenced knowledge
+
+"""
+
+ASK_QUESTION_TEMPLATE = """{history_context}=== CURRENT QUESTION ===
+
+The user asks: {question}
+
+Strategy:
+1. Consider the conversation history above (if any) for context
+2. Read wiki/index.md to see all pages across papers/, topics/, entities/, ideas/
+3. Read relevant wiki pages — follow [[wikilinks]] across directories, traversing at least 2 levels of connections
+4. The wiki contains personal notes and cross-cutting ideas — use these for richer context
+5. If wiki coverage is incomplete, use vector search or SQL to find additional papers
+6. Synthesize a comprehensive answer combining wiki knowledge and tool results
+
+Provide a comprehensive answer with citations to specific papers (use [[arxiv_id]] format).
+
+Answer:
+"""
+
+LINT_INSTRUCTIONS = """You are maintaining the research paper wiki above. Run a health check (lint operation).
+
+=== YOUR TASK ===
+
+Run a comprehensive health check on wiki/. Check all 4 directories: papers/, topics/, entities/, ideas/.
+
+STRUCTURAL CHECKS:
+1. **Contradictions**: Do different pages make conflicting claims?
+2. **Stale content**: Has newer content superseded old claims?
+3. **Orphan pages**: Papers not linked from any topic page
+4. **Orphan topics/entities/ideas**: Pages with no inbound links
+5. **Missing cross-references**: Papers that should be linked but aren't
+6. **Broken links**: [[references]] that don't have a corresponding page
+7. **Metadata consistency**: paper_count vs actual papers in topic pages
+8. **Data gaps**: Missing fields, incomplete summaries
+
+CONNECTION QUALITY CHECKS:
+9. **Shallow links**: Find connections that just say "Related:", "See also:", or link without annotation → REWRITE with WHY
+10. **Missing cross-connections**: Papers that share 2+ entities but have no direct connection → add connection
+11. **Topic pages missing ## Evolution**: Write a chronological narrative, not just a paper list
+12. **Topic pages missing ## Patterns & Insights**: Synthesize from papers
+13. **People in entities/**: Entity pages that are actually about people → flag for removal (entities are for technical things only)
+
+LEARN FROM CHAT HISTORY:
+14. Read wiki_sessions/sessions.jsonl (one line per session: {"session_id": "...", "messages": [{"role":"user","content":"..."}, ...]})
+15. Find questions that reveal gaps in the wiki → fill those gaps
+16. Find insights from Q&A worth adding to topic/entity/idea pages
+17. Find repeated questions → that page needs more depth
+Do NOT copy raw Q&A. Extract useful knowledge and integrate naturally.
+
+Read wiki/index.md, then systematically check all pages in papers/, topics/, entities/, ideas/.
+
+After identifying issues:
+1. Report all problems found
+2. Fix what you can (update pages, add missing links, correct counts, rewrite shallow connections)
+3. Update wiki/log.md with a lint entry
+
+Provide a summary report of what you found and fixed.
+"""
+
+DAILY_LINT_INSTRUCTIONS = """You are maintaining the research paper wiki above. Run a daily health check (lint operation).
+
+=== YOUR TASK ===
+
+This is a scheduled daily health check. Run a comprehensive check on wiki/.
+Check all 4 directories: papers/, topics/, entities/, ideas/.
+
+STRUCTURAL:
+1. Contradictions between pages
+2. Stale content superseded by newer sources
+3. Orphan pages (no inbound links) across all directories
+4. Missing cross-references
+5. Broken [[wikilinks]]
+6. Metadata consistency (paper_count vs actual)
+
+CONNECTION QUALITY:
+7. Shallow connections that just say "Related:" or "See also:" → rewrite with WHY
+8. Papers sharing 2+ entities but not connected → add connections
+9. Topic pages missing ## Evolution or ## Patterns & Insights → add them
+10. People appearing in entities/ → flag (entities are for technical things only)
+
+LEARN FROM CHAT HISTORY:
+11. Read wiki_sessions/sessions.jsonl (one line per session: {session_id, messages: [{role, content}, ...]})
+12. Find questions that reveal gaps in the wiki → fill those gaps with new content
+13. Find insights or connections from Q&A worth adding to topic/entity/idea pages
+14. Find repeated questions about the same subject → that page needs more depth
+
+Do NOT copy raw Q&A into the wiki. Extract useful knowledge and integrate it naturally.
+
+Fix what you can, and update wiki/log.md with a lint entry noting this was a scheduled daily check.
+
+Provide a summary report.
+"""
+
+PREFIX_INSTRUCTIONS = {
+    'ask': ASK_INSTRUCTIONS,
+    'lint': LINT_INSTRUCTIONS,
+    'daily_lint': DAILY_LINT_INSTRUCTIONS,
+}
+
+
+class WikiPromptContext:
+    """Schema files cached by (mtime, size) and the prompt prefixes rendered from them."""
+
+    def __init__(self, repo_root: Path):
+        """
+        Args:
+            repo_root: Directory holding llm-wiki.md and wiki/
+        """
+        self.repo_root = Path(repo_root)
+        self.wiki_dir = self.repo_root / 'wiki'
+        self.files = {
+            'llm_wiki_content': self.repo_root / 'llm-wiki.md',
+            'project_schema_content': self.wiki_dir / 'WIKI.md',
+        }
+        self._signature: Optional[Tuple] = None
+        self._prefixes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _stat_signature(self) -> Tuple:
+        """(mtime, size) of each schema file; None for missing files."""
+        signature = []
+        for path in self.files.values():
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def prefix(self, kind: str) -> str:
+        """
+        Rendered stable prefix for a prompt kind ("ask", "lint" or "daily_lint").
+
+        Raises:
+            OSError: a schema file exists but cannot be read
+        """
+        signature = self._stat_signature()
+        with self._lock:
+            if signature != self._signature:
+                contents = {
+                    name: path.read_text(encoding='utf-8') if path.exists() else ""
+                    for name, path in self.files.items()
+                }
+                context = WIKI_CONTEXT_TEMPLATE.format(repo_root=self.repo_root, **contents)
+                self._prefixes = {
+                    name: context + instructions
+                    for name, instructions in PREFIX_INSTRUCTIONS.items()
+                }
+                self._signature = signature
+                self.reloads += 1
+            return self._prefixes[kind]
+
+    def ask_prompt(self, question: str, history: List[Dict[str, str]]) -> str:
+        """Prompt for /ask_wiki; history is the window of recent messages to include."""
+        history_context = ""
+        if history:
+            history_context = "=== CONVERSATION HISTORY ===\n"
+            for msg in history:
+                role_label = "User" if msg['role'] == 'user' else "Assistant"
+                history_context += f"{role_label}: {msg['content']}\n\n"
+            history_context += "=== END HISTORY ===\n\n"
+        return self.prefix('ask') + ASK_QUESTION_TEMPLATE.format(
+            history_context=history_context,
+            question=question
+        )
+
+    def lint_prompt(self, scheduled: bool = False) -> str:
+        """Prompt for /lint_wiki, or for the scheduled daily lint."""
+        return self.prefix('daily_lint' if scheduled else 'lint')
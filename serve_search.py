@@ -7,22 +7,38 @@ Also provides SQLite database query endpoints for papers.
 Also provides wiki-based Q&A via ollama claude agent.
 """
 import argparse
+import fcntl
+import gc
+import hashlib
 import json
+import os
 import re
-import subprocess
+import sqlite3
 import threading
 import time
 import requests as http_requests
 from pathlib import Path
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from loguru import logger
 
+import faiss
 from langchain_ollama import OllamaEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
+from search_engine_utils.agent_jobs import ACTIVE_STATUSES, AgentJobQueue, QueueFullError
+from search_engine_utils.answer_cache import AnswerCache, WikiFingerprint, normalize_question
+from search_engine_utils.bm25_index import BM25_DIR_NAME, BM25Index, corpus_fingerprint
+from search_engine_utils.chunk_store import CHUNKS_DB_NAME, ChunkStore, faiss_documents
 from search_engine_utils.config import SearchEngineConfig
+from search_engine_utils.embeddings_manager import EmbeddingsManager
+from search_engine_utils.faiss_vectorstore import faiss_store_kwargs
 from search_engine_utils.hybrid_retriever import HybridRetriever
+from search_engine_utils.query_cache import QueryEmbeddingCache
+from search_engine_utils.paper_metadata import PaperMetadataStore, paper_store_path
 from search_engine_utils.paper_sqlite import PaperSqliteManager
+from search_engine_utils.session_store import SessionStore
+from search_engine_utils.wiki_prompts import WikiPromptContext
 
 
 def clean_text(text: str) -> str:
@@ -51,43 +67,126 @@ app = Flask(__name__)
 retriever = None
 config = None
 all_metadata_fields = set()
+paper_store = None
 
 # Global SQLite manager instance
 sqlite_manager = None
 
 # Session storage — persisted to disk so history survives restarts
 SESSIONS_DIR = Path(__file__).parent / "wiki_sessions"
-SESSIONS_DIR.mkdir(exist_ok=True)
-wiki_sessions = {}
+session_store = None
+# Snapshot of all sessions, written for the lint agent before each lint run
+SESSIONS_EXPORT = SESSIONS_DIR / "sessions.jsonl"
 
+# Agent runs happen in background jobs (see init_agent_jobs)
+AGENT_JOBS_DIR = Path(__file__).parent / "agent_jobs"
+agent_jobs = None
+# Open flock file of the worker running the daily lint (see start_daily_lint)
+daily_lint_lock = None
 
-def _load_session(session_id):
-    """Load session from disk into memory cache if not already loaded."""
-    if session_id in wiki_sessions:
-        return wiki_sessions[session_id]
-    session_file = SESSIONS_DIR / f"{session_id}.json"
-    if session_file.exists():
-        try:
-            wiki_sessions[session_id] = json.loads(session_file.read_text(encoding='utf-8'))
-        except Exception:
-            wiki_sessions[session_id] = []
-    else:
-        wiki_sessions[session_id] = []
-    return wiki_sessions[session_id]
+# Schema files and prompt prefixes shared by the agent endpoints
+wiki_prompts = WikiPromptContext(Path(__file__).parent)
 
+# Finished /ask_wiki answers (see init_answer_cache)
+ANSWER_CACHE_PATH = AGENT_JOBS_DIR / "answers.sqlite"
+answer_cache = None
+
+# Waiting on a job ("wait": true, /jobs/<id>/stream) holds a request thread
+# for minutes; cap how many threads that can take so /search always has some
+agent_slots = threading.BoundedSemaphore(2)
+
+
+def set_agent_slots(slots: int):
+    """Set how many requests per process may wait on an agent job at once."""
+    global agent_slots
+    agent_slots = threading.BoundedSemaphore(slots)
+
+
+def init_session_store():
+    """Open the /ask_wiki session store (its writer thread starts on first append)."""
+    global session_store
+    session_store = SessionStore(SESSIONS_DIR)
+
+
+def init_agent_jobs(max_workers: int = 2, max_pending: int = 16):
+    """Open the agent job store and fail jobs interrupted by a restart."""
+    global agent_jobs
+    agent_jobs = AgentJobQueue(AGENT_JOBS_DIR, max_workers=max_workers, max_pending=max_pending)
+    agent_jobs.recover()
+
+
+def _agent_busy():
+    """503 for requests that would wait on an agent job while all slots are busy."""
+    logger.warning(f"{request.path} rejected: all agent slots busy")
+    response = jsonify({'error': 'Agent busy, retry later'})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
+
+def init_answer_cache(max_entries: int = 1000, ttl_seconds: float = 7 * 24 * 60 * 60):
+    """Open the /ask_wiki answer cache, invalidated by changes to wiki/ and llm-wiki.md."""
+    global answer_cache
+    repo_root = Path(__file__).parent
+    answer_cache = AnswerCache(
+        ANSWER_CACHE_PATH,
+        WikiFingerprint([repo_root / 'wiki', repo_root / 'llm-wiki.md']),
+        max_entries=max_entries,
+        ttl_seconds=ttl_seconds
+    )
+
+
+def _record_answer(session_id, question: str, answer: str):
+    """Append a question/answer turn to the session history (no-op without a session)."""
+    if not session_id:
+        return
+    session_store.append(session_id, [
+        {'role': 'user', 'content': question},
+        {'role': 'assistant', 'content': answer}
+    ])
+
+
+def _agent_command(model: str, prompt: str) -> list:
+    """argv for one non-interactive agent run."""
+    return [
+        'ollama', 'launch', 'claude',
+        '--model', model,
+        '--yes',
+        '--',
+        '-p', prompt,
+        '--permission-mode', 'dontAsk'
+    ]
+
+
+def _job_accepted(job_id: str, created: bool):
+    """202 response pointing at a submitted (or joined) job."""
+    return jsonify({
+        'job_id': job_id,
+        'status': agent_jobs.get(job_id)['status'],
+        'deduplicated': not created,
+        'status_url': f'/jobs/{job_id}',
+        'stream_url': f'/jobs/{job_id}/stream'
+    }), 202
 
-def _save_session(session_id):
-    """Persist session to disk."""
-    session_file = SESSIONS_DIR / f"{session_id}.json"
-    try:
-        session_file.write_text(json.dumps(wiki_sessions[session_id], ensure_ascii=False), encoding='utf-8')
-    except Exception as e:
-        logger.error(f"Failed to save session {session_id}: {e}")
+
+def _wait_for_job(job_id: str, created: bool, timeout: float):
+    """
+    Block until a job finishes and answer like the old synchronous endpoints.
+
+    The caller holds an agent slot. Falls back to 202 if the job is still
+    running after timeout (e.g. it waited in the queue).
+    """
+    job = agent_jobs.wait(job_id, timeout)
+    if job['status'] == 'completed':
+        return jsonify(job['result'])
+    if job['status'] == 'failed':
+        status = 504 if 'timed out' in (job['error'] or '') else 500
+        return jsonify({'error': job['error'], 'job_id': job_id}), status
+    return _job_accepted(job_id, created)
 
 
 def init_retriever(index_dir: Path):
     """Initialize the hybrid retriever from index directory."""
-    global retriever, config, all_metadata_fields
+    global retriever, config, all_metadata_fields, paper_store
 
     # Load config
     config_file = index_dir / "config.json"
@@ -103,52 +202,94 @@ def init_retriever(index_dir: Path):
         base_url=config.ollama_host
     )
 
-    # Load FAISS index
+    # Load only the FAISS vectors; chunk text and metadata stay on disk in the
+    # chunk store and are read for the final top-k of each search
     logger.info(f"Loading FAISS index from {index_dir}")
-    db = FAISS.load_local(
-        str(index_dir),
-        embedding_client,
-        allow_dangerous_deserialization=True
+    db = FAISS(
+        embedding_function=embedding_client,
+        index=faiss.read_index(str(index_dir / "index.faiss")),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        **faiss_store_kwargs(config.faiss_metric)
     )
 
-    # Get documents for hybrid retriever
-    # Note: FAISS doesn't expose documents directly, but HybridRetriever needs them
-    # We'll reconstruct from the index
-    logger.info("Extracting documents from FAISS index...")
-    documents = []
-
-    # Show progress for large indexes
-    total_docs = db.index.ntotal
-    if total_docs > 1000:
-        from tqdm import tqdm
-        for i in tqdm(range(total_docs), desc="Loading documents"):
-            doc = db.docstore.search(db.index_to_docstore_id[i])
-            documents.append(doc)
-            all_metadata_fields.update(doc.metadata.keys())
-    else:
-        for i in range(total_docs):
-            doc = db.docstore.search(db.index_to_docstore_id[i])
-            documents.append(doc)
-            all_metadata_fields.update(doc.metadata.keys())
+    chunk_store = ChunkStore(index_dir / CHUNKS_DB_NAME)
+    docstore_file = index_dir / "index.pkl"
+    if (len(chunk_store) != db.index.ntotal
+            or docstore_file.stat().st_mtime > chunk_store.db_path.stat().st_mtime):
+        # Older index (or index.pkl rewritten by an older tool): convert once
+        logger.info("Chunk store missing or out of date, building it from index.pkl...")
+        full_db = FAISS.load_local(
+            str(index_dir),
+            embedding_client,
+            allow_dangerous_deserialization=True,
+            **faiss_store_kwargs(config.faiss_metric)
+        )
+        documents = list(faiss_documents(full_db))
+        fingerprint = corpus_fingerprint([doc.page_content for doc in documents], config.get_config_hash())
+        chunk_store.write(documents, fingerprint)
+        del full_db, documents
+
+    # Paper-level fields are joined from the paper store at query time
+    paper_store = PaperMetadataStore(paper_store_path(index_dir))
+    all_metadata_fields.update(chunk_store.fields())
+    all_metadata_fields.update(paper_store.fields())
 
-    logger.info(f"Loaded {len(documents)} document chunks")
+    logger.info(f"Chunk store has {len(chunk_store)} document chunks")
     logger.info(f"Available metadata fields: {all_metadata_fields}")
 
+    # Memory-map the saved BM25 index; rebuild (and re-save) if missing or stale
+    bm25_dir = index_dir / BM25_DIR_NAME
+    bm25_index = BM25Index.load(bm25_dir, chunk_store.fingerprint)
+    if bm25_index is None:
+        logger.info("No up-to-date BM25 index on disk, building it...")
+        bm25_index = BM25Index.from_texts(list(chunk_store.iter_texts()))
+        try:
+            bm25_index.save(bm25_dir, chunk_store.fingerprint)
+        except Exception as e:
+            logger.warning(f"Failed to save BM25 index: {e}")
+    else:
+        logger.info(f"Loaded BM25 index from {bm25_dir}")
+
+    # Exact vectors for re-ranking quantized indexes (memory-mapped, not loaded)
+    exact_vectors = None
+    if config.rerank_k:
+        exact_vectors = EmbeddingsManager(index_dir).get_vectors()
+        if len(exact_vectors) != db.index.ntotal:
+            logger.warning(
+                f"Embedding store has {len(exact_vectors)} rows, index has {db.index.ntotal}; "
+                f"exact re-ranking disabled"
+            )
+            exact_vectors = None
+
     # Initialize hybrid retriever
     logger.info("Initializing hybrid retriever (vector + BM25)...")
     retriever = HybridRetriever(
-        documents=documents,
+        documents=chunk_store,
         embedding_client=embedding_client,
         vector_weight=config.vector_weight,
         bm25_weight=config.bm25_weight,
-        faiss_db=db  # Pass pre-loaded FAISS index to avoid re-embedding
+        faiss_db=db,  # Pass pre-loaded FAISS index to avoid re-embedding
+        candidate_k=config.search_candidates,
+        bm25_index=bm25_index,
+        query_cache=QueryEmbeddingCache(
+            embedding_client,
+            max_bytes=config.query_cache_mb * 1024 * 1024,
+            ttl_seconds=config.query_cache_ttl,
+            batch_window_ms=config.query_batch_ms
+        ),
+        exact_vectors=exact_vectors,
+        rerank_k=config.rerank_k
     )
 
     logger.info("="*60)
     logger.info("✓ Retriever initialized successfully!")
-    logger.info(f"  - Vector search: FAISS ({config.faiss_index_type})")
+    logger.info(f"  - Vector search: FAISS ({config.faiss_index_type}, {config.faiss_metric})")
+    if retriever.rerank_k:
+        logger.info(f"  - Exact re-rank: top {retriever.rerank_k}")
     logger.info(f"  - Keyword search: BM25")
-    logger.info(f"  - Total documents: {len(documents)}")
+    logger.info(f"  - Fusion candidates: {config.search_candidates or 'all'}")
+    logger.info(f"  - Total documents: {len(chunk_store)}")
     logger.info("="*60)
 
 
@@ -214,7 +355,8 @@ def search():
         "query": "your search query",
         "k": 5,  // optional, default 5
         "return_fields": ["title", "url", "content"],  // optional, return all if not specified
-        "return_scores": true  // optional, default true
+        "return_scores": true,  // optional, default true
+        "candidate_k": 200  // optional, fusion candidates per retriever (0 = full scan)
     }
 
     Response:
@@ -248,13 +390,23 @@ def search():
     k = data.get('k', 5)
     return_fields = data.get('return_fields', None)  # None means return all
     return_scores = data.get('return_scores', True)
+    candidate_k = data.get('candidate_k', None)  # None means use config
 
     try:
         # Perform search
         results = retriever.similarity_search(
             query=query,
             k=k,
-            return_scores=True  # Always get scores internally
+            return_scores=True,  # Always get scores internally
+            candidate_k=candidate_k,
+            # Read only the requested fields (plus the paper id for the join)
+            metadata_fields=return_fields + ['paper_id'] if return_fields else None
+        )
+
+        # Fetch paper fields for the returned chunks only (just return_fields if given)
+        papers = paper_store.get_many(
+            (doc.metadata['paper_id'] for doc, _ in results if doc.metadata.get('paper_id')),
+            fields=return_fields or None
         )
 
         # Format results
@@ -267,16 +419,18 @@ def search():
             if return_scores:
                 result['score'] = float(score)
 
+            metadata = {**papers.get(doc.metadata.get('paper_id'), {}), **doc.metadata}
+
             # Filter metadata fields if specified
             if return_fields:
                 filtered_metadata = {
-                    field: doc.metadata.get(field)
+                    field: metadata.get(field)
                     for field in return_fields
-                    if field in doc.metadata
+                    if field in metadata
                 }
                 result['metadata'] = filtered_metadata
             else:
-                result['metadata'] = doc.metadata
+                result['metadata'] = metadata
 
             formatted_results.append(result)
 
@@ -314,8 +468,15 @@ def stats():
             'chunk_overlap': config.chunk_overlap,
             'embedding_model': config.embedding_model,
             'vector_weight': config.vector_weight,
-            'bm25_weight': config.bm25_weight
-        }
+            'bm25_weight': config.bm25_weight,
+            'search_candidates': config.search_candidates,
+            'faiss_index_type': config.faiss_index_type,
+            'faiss_metric': config.faiss_metric
+        },
+        'query_embedding_cache': retriever.query_cache.stats(),
+        'agent_jobs': agent_jobs.stats() if agent_jobs else None,
+        'answer_cache': answer_cache.stats() if answer_cache else None,
+        'sessions': session_store.stats() if session_store else None
     })
 
 
@@ -388,6 +549,12 @@ def execute_query():
         if keyword in sql_upper:
             return jsonify({'error': f'Keyword {keyword} is not allowed in queries'}), 400
 
+    try:
+        # Pick up papers appended to summaries.jsonl and edited notes since the last query
+        sqlite_manager.sync_if_changed()
+    except Exception as e:
+        logger.error(f"SQLite sync failed: {e}")
+
     try:
         # Execute query
         results = sqlite_manager.query_dict(sql)
@@ -403,6 +570,71 @@ def execute_query():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/fulltext', methods=['POST'])
+def fulltext_search():
+    """
+    Keyword search over paper titles, summaries and personal notes (SQLite FTS5).
+
+    Request body:
+    {
+        "query": "speculative decoding",
+        "k": 10,                 # optional, default 10
+        "raw": false,            # optional, true = FTS5 query syntax (OR, NEAR, "phrase", prefix*)
+        "fuzzy": false           # optional, true = typo-tolerant title lookup (fuzzy_match scoring, no snippet)
+    }
+
+    Response:
+    {
+        "query": "speculative decoding",
+        "num_results": 2,
+        "results": [
+            {
+                "title": "Paper title",
+                "url": "https://arxiv.org/...",
+                "published_at": "2024-01-15",
+                "date_added": "2024-01-20",
+                "score": 12.3,
+                "snippet": "... **speculative** **decoding** ..."
+            },
+            ...
+        ]
+    }
+    """
+    if sqlite_manager is None:
+        return jsonify({'error': 'SQLite database not initialized'}), 500
+
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return jsonify({'error': 'Missing query parameter'}), 400
+
+    query = data['query']
+    k = int(data.get('k', 10))
+    raw = bool(data.get('raw', False))
+    fuzzy = bool(data.get('fuzzy', False))
+
+    try:
+        sqlite_manager.sync_if_changed()
+    except Exception as e:
+        logger.error(f"SQLite sync failed: {e}")
+
+    try:
+        if fuzzy:
+            results = sqlite_manager.fuzzy_titles(query, k=k)
+        else:
+            results = sqlite_manager.fulltext(query, k=k, raw=raw)
+    except sqlite3.OperationalError as e:
+        return jsonify({'error': f'Invalid full-text query: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Full-text search error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'query': query,
+        'num_results': len(results),
+        'results': results
+    })
+
+
 SAFETY_SERVICE_URL = 'http://localhost:5003/filter'
 
 
@@ -426,20 +658,36 @@ def ask_wiki():
     """
     Ask a question based on the wiki knowledge base.
 
+    The agent runs as a background job; the response points at it.
+
     Request body:
     {
         "question": "What are recent advances in diffusion models?",
         "model": "minimax-m2.7:cloud",  // optional, defaults to minimax-m2.7:cloud
-        "session_id": "abc123"  // optional, for conversation history
+        "session_id": "abc123",  // optional, for conversation history
+        "wait": false  // optional, block until answered (old synchronous behaviour)
     }
 
-    Response:
+    Response (202):
+    {
+        "job_id": "...",
+        "status": "queued",
+        "deduplicated": false,  // true if the same question was already running
+        "status_url": "/jobs/...",
+        "stream_url": "/jobs/.../stream"
+    }
+
+    The finished job's result (or the response with "wait": true):
     {
         "question": "...",
         "answer": "...",
         "model": "minimax-m2.7:cloud",
         "session_id": "abc123"
     }
+
+    A question already answered with the same recent history and an
+    unchanged wiki is answered from the answer cache right away (200, same
+    body plus "cached": true).
     """
     data = request.get_json()
     if not data or 'question' not in data:
@@ -448,139 +696,68 @@ def ask_wiki():
     question = data['question']
     model = data.get('model', 'minimax-m2.7:cloud')
     session_id = data.get('session_id', None)
+    wait = bool(data.get('wait', False))
 
-    conversation_history = _load_session(session_id) if session_id else []
+    conversation_history = session_store.get(session_id) if session_id else []
 
-    # Find repo root (where wiki/ directory is)
-    repo_root = Path(__file__).parent
-    wiki_dir = repo_root / 'wiki'
-    llm_wiki_path = repo_root / 'llm-wiki.md'
-    project_schema_path = wiki_dir / 'WIKI.md'
-
-    if not wiki_dir.exists():
+    repo_root = wiki_prompts.repo_root
+    if not wiki_prompts.wiki_dir.exists():
         return jsonify({'error': 'wiki/ directory not found'}), 500
 
-    # Read schema files
+    # Last 3 turns (6 messages) go into the prompt
+    history_window = conversation_history[-6:]
+
+    # Same question, history window and wiki as an earlier answer: reuse it
+    cache_key, cached = answer_cache.lookup(question, model, history_window)
+    if cached is not None:
+        logger.info(f"Answer cache hit for question: {question[:60]}...")
+        _record_answer(session_id, question, cached['answer'])
+        return jsonify({**cached, 'question': question, 'session_id': session_id, 'cached': True})
+
     try:
-        llm_wiki_content = llm_wiki_path.read_text(encoding='utf-8') if llm_wiki_path.exists() else ""
-        project_schema_content = project_schema_path.read_text(encoding='utf-8') if project_schema_path.exists() else ""
+        prompt = wiki_prompts.ask_prompt(question, history_window)
     except Exception as e:
         logger.error(f"Failed to read schema files: {e}")
         return jsonify({'error': f'Failed to read schema: {str(e)}'}), 500
 
-    # Build conversation history context
-    history_context = ""
-    if conversation_history:
-        history_context = "\n=== CONVERSATION HISTORY ===\n"
-        for msg in conversation_history[-6:]:  # Last 3 turns (6 messages)
-            role_label = "User" if msg['role'] == 'user' else "Assistant"
-            history_context += f"{role_label}: {msg['content']}\n\n"
-        history_context += "=== END HISTORY ===\n\n"
-
-    # Build the prompt for the agent
-    prompt = f"""You are a research assistant helping answer questions based on a wiki knowledge base.
-
-=== WIKI PATTERN (llm-wiki.md) ===
-{llm_wiki_content}
-
-=== PROJECT SCHEMA (WIKI.md) ===
-{project_schema_content}
-
-=== AVAILABLE TOOLS ===
-
-You have access to the following tools running on localhost:5001:
-
-1. **Vector Search** (semantic similarity via FAISS):
-   curl -X POST http://localhost:5001/search \\
-     -H "Content-Type: application/json" \\
-     -d '{{"query": "your search query", "k": 5, "return_scores": true}}'
-
-   Returns: {{"results": [{{"content": "...", "metadata": {{"title": "...", "url": "...", ...}}, "score": 0.85}}]}}
-
-2. **SQL Query** (structured queries on papers database):
-   curl -X POST http://localhost:5001/query \\
-     -H "Content-Type: application/json" \\
-     -d '{{"sql": "SELECT title, published_at FROM papers WHERE ..."}}'
-
-   Returns: {{"results": [{{"title": "...", "published_at": "...", ...}}]}}
-
-   Available columns: title, published_at, url, content, date_added, personal_notes
-
-3. **Database Schema**:
-   curl http://localhost:5001/schema
-
-Use these tools to find relevant papers when the wiki alone doesn't have enough information.
-For example:
-- Use vector search for semantic queries: "papers about transformers"
-- Use SQL for structured filters: "papers published after 2024-01-01"
-- Read wiki pages for curated summaries and cross-referenced knowledge
-
-{history_context}=== CURRENT QUESTION ===
-
-Working directory: {repo_root}
-
-The user asks: {question}
-
-Strategy:
-1. Consider the conversation history above (if any) for context
-2. Read wiki/index.md to see all pages across papers/, topics/, entities/, ideas/
-3. Read relevant wiki pages — follow [[wikilinks]] across directories, traversing at least 2 levels of connections
-4. The wiki contains personal notes and cross-cutting ideas — use these for richer context
-5. If wiki coverage is incomplete, use vector search or SQL to find additional papers
-6. Synthesize a comprehensive answer combining wiki knowledge and tool results
-
-Provide a comprehensive answer with citations to specific papers (use [[arxiv_id]] format).
-
-Answer:
-"""
-
-    # Call ollama launch claude
-    try:
-        logger.info(f"Calling ollama claude for question: {question[:60]}...")
-        result = subprocess.run(
-            [
-                'ollama', 'launch', 'claude',
-                '--model', model,
-                '--yes',
-                '--',
-                '-p', prompt,
-                '--permission-mode', 'dontAsk'
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(repo_root),
-            timeout=300  # 5 minutes timeout (agent may use FAISS/SQL tools)
-        )
-
-        if result.returncode != 0:
-            logger.error(f"ollama claude failed: {result.stderr}")
-            return jsonify({'error': f'Agent failed: {result.stderr}'}), 500
-
-        answer = result.stdout.strip()
-        logger.info(f"Answer generated ({len(answer)} chars)")
-
+    def finish(answer):
         answer = _filter_pii(answer)
-
-        if session_id:
-            wiki_sessions[session_id].append({'role': 'user', 'content': question})
-            wiki_sessions[session_id].append({'role': 'assistant', 'content': answer})
-            if len(wiki_sessions[session_id]) > 20:
-                wiki_sessions[session_id] = wiki_sessions[session_id][-20:]
-            _save_session(session_id)
-
-        return jsonify({
+        answer_cache.put(cache_key, {'answer': answer, 'model': model})
+        _record_answer(session_id, question, answer)
+        return {
             'question': question,
             'answer': answer,
             'model': model,
             'session_id': session_id
-        })
+        }
 
-    except subprocess.TimeoutExpired:
-        logger.error("ollama claude timed out")
-        return jsonify({'error': 'Request timed out (5 min limit)'}), 504
-    except Exception as e:
-        logger.error(f"ask_wiki error: {e}")
-        return jsonify({'error': str(e)}), 500
+    # The same question in the same session shares one agent run
+    dedup_key = hashlib.sha256(json.dumps(
+        ['ask', model, session_id, normalize_question(question)], ensure_ascii=False
+    ).encode('utf-8')).hexdigest()
+
+    if wait and not agent_slots.acquire(blocking=False):
+        return _agent_busy()
+    try:
+        job_id, created = agent_jobs.submit(
+            'ask',
+            dedup_key,
+            _agent_command(model, prompt),
+            cwd=repo_root,
+            timeout=300,  # 5 minutes timeout (agent may use FAISS/SQL tools)
+            on_success=finish,
+            line_filter=_filter_pii
+        )
+        logger.info(f"{'Queued' if created else 'Joined'} ask job {job_id} for question: {question[:60]}...")
+        if wait:
+            return _wait_for_job(job_id, created, timeout=330)
+        return _job_accepted(job_id, created)
+    except QueueFullError as e:
+        logger.warning(f"ask_wiki rejected: {e}")
+        return jsonify({'error': 'Too many agent jobs, retry later'}), 503
+    finally:
+        if wait:
+            agent_slots.release()
 
 
 @app.route('/lint_wiki', methods=['POST'])
@@ -596,124 +773,123 @@ def lint_wiki():
     - Missing cross-references
     - Data gaps
 
+    Runs as a background job like /ask_wiki; only one lint per model runs
+    at a time (a second request joins the running one).
+
     Request body (optional):
     {
-        "model": "minimax-m2.7:cloud"  // optional
+        "model": "minimax-m2.7:cloud",  // optional
+        "wait": false  // optional, block until done
     }
 
-    Response:
+    Response (202): job reference, see /ask_wiki
+
+    The finished job's result (or the response with "wait": true):
     {
         "status": "completed",
         "report": "...",
         "model": "minimax-m2.7:cloud"
     }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     model = data.get('model', 'minimax-m2.7:cloud')
+    wait = bool(data.get('wait', False))
 
-    # Find repo root
-    repo_root = Path(__file__).parent
-    wiki_dir = repo_root / 'wiki'
-    llm_wiki_path = repo_root / 'llm-wiki.md'
-    project_schema_path = wiki_dir / 'WIKI.md'
-
-    if not wiki_dir.exists():
+    repo_root = wiki_prompts.repo_root
+    if not wiki_prompts.wiki_dir.exists():
         return jsonify({'error': 'wiki/ directory not found'}), 500
 
-    # Read schema files
     try:
-        llm_wiki_content = llm_wiki_path.read_text(encoding='utf-8') if llm_wiki_path.exists() else ""
-        project_schema_content = project_schema_path.read_text(encoding='utf-8') if project_schema_path.exists() else ""
+        prompt = wiki_prompts.lint_prompt()
     except Exception as e:
         logger.error(f"Failed to read schema files: {e}")
         return jsonify({'error': f'Failed to read schema: {str(e)}'}), 500
 
-    # Build the lint prompt
-    prompt = f"""You are maintaining a research paper wiki. Run a health check (lint operation).
-
-=== WIKI PATTERN (llm-wiki.md) ===
-{llm_wiki_content}
-
-=== PROJECT SCHEMA (WIKI.md) ===
-{project_schema_content}
-
-=== YOUR TASK ===
-
-Working directory: {repo_root}
-
-Run a comprehensive health check on wiki/. Check all 4 directories: papers/, topics/, entities/, ideas/.
-
-STRUCTURAL CHECKS:
-1. **Contradictions**: Do different pages make conflicting claims?
-2. **Stale content**: Has newer content superseded old claims?
-3. **Orphan pages**: Papers not linked from any topic page
-4. **Orphan topics/entities/ideas**: Pages with no inbound links
-5. **Missing cross-references**: Papers that should be linked but aren't
-6. **Broken links**: [[references]] that don't have a corresponding page
-7. **Metadata consistency**: paper_count vs actual papers in topic pages
-8. **Data gaps**: Missing fields, incomplete summaries
-
-CONNECTION QUALITY CHECKS:
-9. **Shallow links**: Find connections that just say "Related:", "See also:", or link without annotation → REWRITE with WHY
-10. **Missing cross-connections**: Papers that share 2+ entities but have no direct connection → add connection
-11. **Topic pages missing ## Evolution**: Write a chronological narrative, not just a paper list
-12. **Topic pages missing ## Patterns & Insights**: Synthesize from papers
-13. **People in entities/**: Entity pages that are actually about people → flag for removal (entities are for technical things only)
-
-LEARN FROM CHAT HISTORY:
-14. Read JSON files in wiki_sessions/ (each is a JSON array of [{{"role":"user","content":"..."}}, ...])
-15. Find questions that reveal gaps in the wiki → fill those gaps
-16. Find insights from Q&A worth adding to topic/entity/idea pages
-17. Find repeated questions → that page needs more depth
-Do NOT copy raw Q&A. Extract useful knowledge and integrate naturally.
-
-Read wiki/index.md, then systematically check all pages in papers/, topics/, entities/, ideas/.
-
-After identifying issues:
-1. Report all problems found
-2. Fix what you can (update pages, add missing links, correct counts, rewrite shallow connections)
-3. Update wiki/log.md with a lint entry
-
-Provide a summary report of what you found and fixed.
-"""
+    # The agent reads chat history from one snapshot file
+    try:
+        session_store.export_jsonl(SESSIONS_EXPORT)
+    except Exception as e:
+        logger.warning(f"Failed to export sessions for lint: {e}")
 
-    # Call ollama launch claude
+    if wait and not agent_slots.acquire(blocking=False):
+        return _agent_busy()
     try:
-        logger.info("Running wiki lint operation...")
-        result = subprocess.run(
-            [
-                'ollama', 'launch', 'claude',
-                '--model', model,
-                '--yes',
-                '--',
-                '-p', prompt,
-                '--permission-mode', 'dontAsk'
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(repo_root),
-            timeout=600  # 10 minutes timeout for lint
+        job_id, created = agent_jobs.submit(
+            'lint',
+            f'lint:{model}',
+            _agent_command(model, prompt),
+            cwd=repo_root,
+            timeout=600,  # 10 minutes timeout for lint
+            on_success=lambda report: {'status': 'completed', 'report': report, 'model': model}
         )
+        logger.info(f"{'Queued' if created else 'Joined'} lint job {job_id}")
+        if wait:
+            return _wait_for_job(job_id, created, timeout=630)
+        return _job_accepted(job_id, created)
+    except QueueFullError as e:
+        logger.warning(f"lint_wiki rejected: {e}")
+        return jsonify({'error': 'Too many agent jobs, retry later'}), 503
+    finally:
+        if wait:
+            agent_slots.release()
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll an agent job.
+
+    Query parameters:
+        offset: optional byte offset; the response then also carries the
+            agent output written since it ("output") and the next offset
 
-        if result.returncode != 0:
-            logger.error(f"ollama claude failed: {result.stderr}")
-            return jsonify({'error': f'Lint failed: {result.stderr}'}), 500
+    Response:
+    {
+        "job_id": "...",
+        "kind": "ask",
+        "status": "running",  // queued, running, completed or failed
+        "created_at": 1700000000.0,
+        "started_at": 1700000001.0,
+        "finished_at": null,
+        "result": null,  // the endpoint's response once completed
+        "error": null
+    }
+    """
+    job = agent_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    offset = request.args.get('offset', type=int)
+    if offset is not None:
+        job['output'], job['offset'] = agent_jobs.read_output(
+            job_id, offset, final=job['status'] not in ACTIVE_STATUSES
+        )
+    return jsonify(job)
 
-        report = result.stdout.strip()
-        logger.info(f"Lint completed ({len(report)} chars)")
 
-        return jsonify({
-            'status': 'completed',
-            'report': report,
-            'model': model
-        })
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """
+    Stream an agent job as server-sent events.
 
-    except subprocess.TimeoutExpired:
-        logger.error("ollama claude timed out during lint")
-        return jsonify({'error': 'Lint timed out (10 min limit)'}), 504
-    except Exception as e:
-        logger.error(f"lint_wiki error: {e}")
-        return jsonify({'error': str(e)}), 500
+    Emits "output" events (JSON-encoded text) as the agent writes, then one
+    "done" event with the job as returned by /jobs/<job_id>.
+    """
+    if agent_jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    slots = agent_slots
+    if not slots.acquire(blocking=False):
+        return _agent_busy()
+
+    response = Response(
+        stream_with_context(agent_jobs.stream(job_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The server closes the response even if the client leaves before the
+    # first event, when a generator's finally block would never run
+    response.call_on_close(slots.release)
+    return response
 
 
 def run_daily_lint():
@@ -725,83 +901,139 @@ def run_daily_lint():
             time.sleep(DAY_SECONDS)
             logger.info("Running scheduled daily wiki lint...")
 
-            repo_root = Path(__file__).parent
-            wiki_dir = repo_root / 'wiki'
-
-            if not wiki_dir.exists():
+            if not wiki_prompts.wiki_dir.exists():
                 logger.warning("wiki/ directory not found, skipping scheduled lint")
                 continue
 
-            llm_wiki_path = repo_root / 'llm-wiki.md'
-            project_schema_path = wiki_dir / 'WIKI.md'
-
-            llm_wiki_content = llm_wiki_path.read_text(encoding='utf-8') if llm_wiki_path.exists() else ""
-            project_schema_content = project_schema_path.read_text(encoding='utf-8') if project_schema_path.exists() else ""
-
-            prompt = f"""You are maintaining a research paper wiki. Run a daily health check (lint operation).
+            repo_root = wiki_prompts.repo_root
+            prompt = wiki_prompts.lint_prompt(scheduled=True)
+            session_store.export_jsonl(SESSIONS_EXPORT)
+
+            # Through the job queue, so it never overlaps a manual /lint_wiki run
+            model = 'minimax-m2.7:cloud'
+            job_id, created = agent_jobs.submit(
+                'lint',
+                f'lint:{model}',
+                _agent_command(model, prompt),
+                cwd=repo_root,
+                timeout=600,
+                on_success=lambda report: {'status': 'completed', 'report': report, 'model': model}
+            )
+            if not created:
+                logger.info(f"Wiki lint already running (job {job_id}), skipping scheduled lint")
+                continue
 
-=== WIKI PATTERN (llm-wiki.md) ===
-{llm_wiki_content}
+            job = agent_jobs.wait(job_id, timeout=630)
+            if job['status'] == 'completed':
+                logger.info(f"Daily lint completed successfully ({len(job['result']['report'])} chars)")
+            else:
+                logger.error(f"Daily lint failed: {job['error'] or job['status']}")
 
-=== PROJECT SCHEMA (WIKI.md) ===
-{project_schema_content}
+        except Exception as e:
+            logger.error(f"Error in daily lint thread: {e}")
 
-=== YOUR TASK ===
 
-Working directory: {repo_root}
+def start_daily_lint(exclusive: bool = False) -> bool:
+    """
+    Start the daily lint thread in this process.
 
-This is a scheduled daily health check. Run a comprehensive check on wiki/.
-Check all 4 directories: papers/, topics/, entities/, ideas/.
+    With exclusive=True (gunicorn workers) only the process that gets an
+    flock on agent_jobs/daily_lint.lock runs it. The lock goes away with the
+    process, so a replacement worker takes over if that worker exits.
 
-STRUCTURAL:
-1. Contradictions between pages
-2. Stale content superseded by newer sources
-3. Orphan pages (no inbound links) across all directories
-4. Missing cross-references
-5. Broken [[wikilinks]]
-6. Metadata consistency (paper_count vs actual)
+    Returns:
+        True if this process runs the daily lint
+    """
+    global daily_lint_lock
+    if exclusive:
+        AGENT_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        lock = open(AGENT_JOBS_DIR / "daily_lint.lock", 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        daily_lint_lock = lock
+
+    threading.Thread(target=run_daily_lint, daemon=True).start()
+    logger.info(f"Daily lint thread started (pid {os.getpid()})")
+    return True
+
+
+def init_app(
+    index_dir: Path,
+    summaries_path: Path = None,
+    sqlite_path: Path = Path('papers.sqlite'),
+    overwrite_db: bool = False
+):
+    """Load the retriever and the SQLite database (once, before any worker is forked)."""
+    # Initialize retriever
+    init_retriever(index_dir)
 
-CONNECTION QUALITY:
-7. Shallow connections that just say "Related:" or "See also:" → rewrite with WHY
-8. Papers sharing 2+ entities but not connected → add connections
-9. Topic pages missing ## Evolution or ## Patterns & Insights → add them
-10. People appearing in entities/ → flag (entities are for technical things only)
+    # Initialize SQLite database
+    # Auto-detect summaries.jsonl path if not specified
+    if summaries_path is None:
+        # Try to find summaries.jsonl in parent directories
+        current_dir = Path.cwd()
+        for parent in [current_dir] + list(current_dir.parents):
+            candidate = parent / 'summaries.jsonl'
+            if candidate.exists():
+                logger.info(f"Auto-detected summaries.jsonl at: {candidate}")
+                summaries_path = candidate
+                break
 
-LEARN FROM CHAT HISTORY:
-11. Read JSON files in wiki_sessions/ (each is a JSON array of {{role, content}} messages)
-12. Find questions that reveal gaps in the wiki → fill those gaps with new content
-13. Find insights or connections from Q&A worth adding to topic/entity/idea pages
-14. Find repeated questions about the same subject → that page needs more depth
+    if summaries_path and summaries_path.exists():
+        init_sqlite(
+            summaries_path=summaries_path,
+            sqlite_path=sqlite_path,
+            overwrite=overwrite_db
+        )
+    else:
+        logger.warning("Summaries file not found. SQLite endpoints will not be available.")
+        logger.warning("Use --summaries-path to specify the path to summaries.jsonl")
 
-Do NOT copy raw Q&A into the wiki. Extract useful knowledge and integrate it naturally.
 
-Fix what you can, and update wiki/log.md with a lint entry noting this was a scheduled daily check.
+def serve_production(host: str, port: int, workers: int, threads: int):
+    """
+    Serve app with gunicorn: forked workers, each with a pool of request threads.
 
-Provide a summary report.
-"""
+    Everything is loaded by init_app before the fork, so the FAISS index and
+    BM25 arrays are shared copy-on-write between workers (memory-mapped
+    files share the page cache) instead of being loaded once per worker.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        # Each request thread runs one query at a time; OpenMP threads per
+        # query would only oversubscribe the CPUs across workers and threads
+        faiss.omp_set_num_threads(1)
+        # The daily lint waits on agent subprocesses; the arbiter's SIGCHLD
+        # handler would reap them, so one worker runs it instead
+        start_daily_lint(exclusive=True)
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'timeout': 120,
+        'graceful_timeout': 30
+    }
 
-            result = subprocess.run(
-                [
-                    'ollama', 'launch', 'claude',
-                    '--model', 'minimax-m2.7:cloud',
-                    '--yes',
-                    '--',
-                    '-p', prompt,
-                    '--permission-mode', 'dontAsk'
-                ],
-                capture_output=True,
-                text=True,
-                cwd=str(repo_root),
-                timeout=600
-            )
+    class SearchApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
 
-            if result.returncode == 0:
-                logger.info(f"Daily lint completed successfully ({len(result.stdout)} chars)")
-            else:
-                logger.error(f"Daily lint failed: {result.stderr}")
+        def load(self):
+            return app
 
-        except Exception as e:
-            logger.error(f"Error in daily lint thread: {e}")
+    # Objects loaded so far live as long as the process; freezing them keeps
+    # the garbage collector from writing to (and so copying) their pages
+    gc.freeze()
+    SearchApplication().run()
 
 
 def main():
@@ -827,7 +1059,7 @@ def main():
     parser.add_argument(
         '--overwrite-db',
         action='store_true',
-        help='Recreate SQLite database from summaries.jsonl'
+        help='Recreate SQLite database from summaries.jsonl (by default an existing one is synced incrementally)'
     )
     parser.add_argument(
         '--host',
@@ -841,6 +1073,48 @@ def main():
         default=5001,
         help='Port to bind to (default: 5001)'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Serve with this many gunicorn worker processes (default: 0 = Flask development server)'
+    )
+    parser.add_argument(
+        '--threads',
+        type=int,
+        default=8,
+        help='Request threads per gunicorn worker (default: 8)'
+    )
+    parser.add_argument(
+        '--agent-slots',
+        type=int,
+        default=2,
+        help='Requests per process that may wait on an agent job (wait=true, /stream); must be below --threads (default: 2)'
+    )
+    parser.add_argument(
+        '--agent-workers',
+        type=int,
+        default=2,
+        help='Agent jobs (/ask_wiki, /lint_wiki) run at once per process (default: 2)'
+    )
+    parser.add_argument(
+        '--agent-queue',
+        type=int,
+        default=16,
+        help='Agent jobs queued or running before new ones get 503 (default: 16)'
+    )
+    parser.add_argument(
+        '--answer-cache-size',
+        type=int,
+        default=1000,
+        help='/ask_wiki answers kept in the answer cache (default: 1000)'
+    )
+    parser.add_argument(
+        '--answer-cache-ttl',
+        type=float,
+        default=7 * 24,
+        help='Hours a cached /ask_wiki answer stays valid (default: 168; 0 = until the wiki changes)'
+    )
 
     args = parser.parse_args()
 
@@ -848,44 +1122,31 @@ def main():
         logger.error(f"Index directory not found: {args.index_dir}")
         return
 
-    # Initialize retriever
-    init_retriever(args.index_dir)
-
-    # Initialize SQLite database
-    # Auto-detect summaries.jsonl path if not specified
-    if args.summaries_path is None:
-        # Try to find summaries.jsonl in parent directories
-        current_dir = Path.cwd()
-        for parent in [current_dir] + list(current_dir.parents):
-            summaries_path = parent / 'summaries.jsonl'
-            if summaries_path.exists():
-                logger.info(f"Auto-detected summaries.jsonl at: {summaries_path}")
-                args.summaries_path = summaries_path
-                break
-
-    if args.summaries_path and args.summaries_path.exists():
-        init_sqlite(
-            summaries_path=args.summaries_path,
-            sqlite_path=args.sqlite_path,
-            overwrite=args.overwrite_db
-        )
-    else:
-        logger.warning("Summaries file not found. SQLite endpoints will not be available.")
-        logger.warning("Use --summaries-path to specify the path to summaries.jsonl")
+    if args.workers and args.agent_slots >= args.threads:
+        logger.error("--agent-slots must be smaller than --threads, or agent waits can take every search thread")
+        return
+    set_agent_slots(args.agent_slots)
+    init_session_store()
+    init_agent_jobs(args.agent_workers, args.agent_queue)
+    init_answer_cache(args.answer_cache_size, args.answer_cache_ttl * 60 * 60)
 
-    # Start daily lint background thread
-    logger.info("Starting daily lint background thread...")
-    lint_thread = threading.Thread(target=run_daily_lint, daemon=True)
-    lint_thread.start()
+    init_app(args.index_dir, args.summaries_path, args.sqlite_path, args.overwrite_db)
 
-    # Start Flask server
-    logger.info(f"Starting server on {args.host}:{args.port}")
+    # Start server
+    mode = f"gunicorn, {args.workers} workers x {args.threads} threads" if args.workers else "Flask development server"
+    logger.info(f"Starting server on {args.host}:{args.port} ({mode})")
     logger.info("  - POST /search - Hybrid search")
     logger.info("  - POST /query - SQL queries")
-    logger.info("  - POST /ask_wiki - Wiki-based Q&A")
-    logger.info("  - POST /lint_wiki - Wiki health check (manual)")
+    logger.info("  - POST /ask_wiki - Wiki-based Q&A (background job)")
+    logger.info("  - POST /lint_wiki - Wiki health check (manual, background job)")
+    logger.info("  - GET /jobs/<id>, /jobs/<id>/stream - Agent job status and output")
     logger.info("  - Daily automated lint enabled")
-    app.run(host=args.host, port=args.port, debug=False)
+    if args.workers:
+        # Each worker tries to start the daily lint in post_fork; one wins
+        serve_production(args.host, args.port, args.workers, args.threads)
+    else:
+        start_daily_lint()
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
 
 
 if __name__ == '__main__':
@@ -10,6 +10,7 @@ BRANCH="main"
 INTERVAL=600  # 10 minutes
 
 PORT=5001
+WORKERS=2  # gunicorn workers (0 = Flask development server)
 PIDFILE="/tmp/paper_search_server.pid"
 LOGFILE="/tmp/paper_search_server.log"
 
@@ -96,7 +97,7 @@ start_server() {
 
   nohup python3 -u serve_search.py \
     --index-dir vector_indices/chunk2500_overlap300_model_embeddinggemma_300m \
-    --port "$PORT" >> "$LOGFILE" 2>&1 &
+    --port "$PORT" --workers "$WORKERS" >> "$LOGFILE" 2>&1 &
 
   local pid=$!
   echo "$pid" > "$PIDFILE"
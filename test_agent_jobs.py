@@ -0,0 +1,157 @@
+"""
+Tests for the SQLite-backed agent job queue.
+
+Run with: python -m pytest test_agent_jobs.py
+Jobs run small Python subprocesses instead of the agent CLI.
+"""
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from search_engine_utils import agent_jobs
+from search_engine_utils.agent_jobs import AgentJobQueue, QueueFullError
+
+
+def python_command(code):
+    return [sys.executable, "-c", code]
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def insert_job(queue, job_id, dedup_key, status='running', **fields):
+    row = {
+        'id': job_id, 'kind': 'ask', 'dedup_key': dedup_key, 'status': status,
+        'created_at': time.time(), **fields
+    }
+    with queue._connect() as conn:
+        conn.execute(
+            f"INSERT INTO jobs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            list(row.values())
+        )
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return AgentJobQueue(tmp_path / "jobs", max_workers=2, max_pending=2)
+
+
+def test_job_runs_and_records_result(queue, tmp_path):
+    job_id, created = queue.submit(
+        'ask', 'ask:q1', python_command("print('line 1'); print('answer')"), tmp_path, timeout=30,
+        on_success=lambda stdout: {'answer': stdout.splitlines()[-1]}
+    )
+    assert created
+    job = queue.wait(job_id, timeout=30)
+    assert job['status'] == 'completed'
+    assert job['result'] == {'answer': 'answer'}
+    assert queue.read_output(job_id, final=True)[0] == "line 1\nanswer\n"
+
+
+def test_failed_and_timed_out_jobs(queue, tmp_path):
+    failed, _ = queue.submit('ask', 'ask:fail', python_command("raise SystemExit(3)"), tmp_path, timeout=30)
+    slow, _ = queue.submit('ask', 'ask:slow', python_command("import time; time.sleep(30)"), tmp_path, timeout=0.5)
+    assert queue.wait(failed, timeout=30)['status'] == 'failed'
+    job = queue.wait(slow, timeout=30)
+    assert job['status'] == 'failed'
+    assert 'timed out' in job['error']
+
+
+def test_same_dedup_key_joins_active_job(queue, tmp_path):
+    command = python_command("import time; time.sleep(1); print('done')")
+    first, created = queue.submit('ask', 'ask:same', command, tmp_path, timeout=30)
+    second, joined = queue.submit('ask', 'ask:same', command, tmp_path, timeout=30)
+    assert created and not joined
+    assert second == first
+
+    # Once finished, the same key starts a new job
+    queue.wait(first, timeout=30)
+    third, created = queue.submit('ask', 'ask:same', command, tmp_path, timeout=30)
+    assert created and third != first
+    queue.wait(third, timeout=30)
+
+
+def test_max_pending(queue, tmp_path):
+    command = python_command("import time; time.sleep(1)")
+    jobs = [queue.submit('ask', f'ask:{i}', command, tmp_path, timeout=30)[0] for i in range(2)]
+    with pytest.raises(QueueFullError):
+        queue.submit('ask', 'ask:2', command, tmp_path, timeout=30)
+    # Joining an active job does not need a free slot
+    assert queue.submit('ask', 'ask:0', command, tmp_path, timeout=30) == (jobs[0], False)
+
+    for job_id in jobs:
+        queue.wait(job_id, timeout=30)
+    queue.submit('ask', 'ask:2', command, tmp_path, timeout=30)
+
+
+def test_recover_fails_active_jobs(queue):
+    insert_job(queue, 'old-queued', 'ask:a', status='queued')
+    insert_job(queue, 'old-running', 'ask:b', status='running')
+    queue.recover()
+    for job_id in ('old-queued', 'old-running'):
+        job = queue.get(job_id)
+        assert job['status'] == 'failed'
+        assert job['error'] == 'Server restarted'
+
+
+def test_job_of_dead_process_is_failed(queue, tmp_path):
+    insert_job(queue, 'orphan', 'ask:orphan', owner_pid=dead_pid(), started_at=time.time(), timeout=600)
+
+    # A new submit with the same key does not join the orphan
+    job_id, created = queue.submit('ask', 'ask:orphan', python_command("print('ok')"), tmp_path, timeout=30)
+    assert created and job_id != 'orphan'
+    assert queue.get('orphan')['status'] == 'failed'
+    assert queue.wait(job_id, timeout=30)['status'] == 'completed'
+
+
+def test_job_past_its_timeout_is_failed(queue):
+    insert_job(queue, 'stuck', 'lint:m', owner_pid=None, started_at=time.time() - 3600, timeout=600)
+    job = queue.get('stuck')
+    assert job['status'] == 'failed'
+    assert 'timeout' in job['error']
+    assert 'owner_pid' not in job
+
+
+def test_orphans_free_max_pending_slots(queue, tmp_path):
+    insert_job(queue, 'orphan-1', 'ask:x', owner_pid=dead_pid())
+    insert_job(queue, 'orphan-2', 'ask:y', owner_pid=dead_pid())
+    job_id, created = queue.submit('ask', 'ask:z', python_command("print('ok')"), tmp_path, timeout=30)
+    assert created
+    queue.wait(job_id, timeout=30)
+
+
+def test_locked_database_error_is_not_hidden(queue, monkeypatch):
+    # Another writer holds the lock, so BEGIN IMMEDIATE fails and there is nothing to roll back
+    holder = sqlite3.connect(str(queue.db_path), isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    connect = sqlite3.connect
+    monkeypatch.setattr(agent_jobs.sqlite3, 'connect', lambda path, **kwargs: connect(path, **{**kwargs, 'timeout': 0.1}))
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            with queue._connect():
+                pass
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_stream_releases_agent_slot_when_never_iterated(queue, tmp_path, monkeypatch):
+    import serve_search
+
+    monkeypatch.setattr(serve_search, 'agent_jobs', queue)
+    monkeypatch.setattr(serve_search, 'agent_slots', serve_search.threading.BoundedSemaphore(1))
+    job_id, _ = queue.submit('ask', 'ask:stream', python_command("print('ok')"), tmp_path, timeout=30)
+
+    # The client disconnects before the first event: the body is closed, not read
+    with serve_search.app.test_request_context(f'/jobs/{job_id}/stream'):
+        response = serve_search.stream_job(job_id)
+    response.close()
+
+    assert serve_search.agent_slots.acquire(blocking=False)
+    queue.wait(job_id, timeout=30)
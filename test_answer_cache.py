@@ -0,0 +1,111 @@
+"""
+Tests for the /ask_wiki answer cache.
+
+Run with: python -m pytest test_answer_cache.py
+"""
+import os
+
+import pytest
+
+from search_engine_utils import answer_cache
+from search_engine_utils.answer_cache import AnswerCache, WikiFingerprint, normalize_question
+
+HISTORY = [{'role': 'user', 'content': 'earlier question'}]
+
+
+class Clock:
+    """Stands in for time.time() in answer_cache, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def wiki(tmp_path):
+    wiki_dir = tmp_path / "wiki"
+    wiki_dir.mkdir()
+    (wiki_dir / "page.md").write_text("first version")
+    return wiki_dir
+
+
+def make_cache(tmp_path, wiki, **kwargs):
+    return AnswerCache(tmp_path / "answers.sqlite", WikiFingerprint([wiki], refresh_seconds=0), **kwargs)
+
+
+def answer(cache, question, result=None, model='m', history=HISTORY):
+    """Look up a question and store result on a miss; returns the cached result or None."""
+    key, cached = cache.lookup(question, model, history)
+    if cached is None and result is not None:
+        cache.put(key, result)
+    return cached
+
+
+def test_hit_after_put(tmp_path, wiki, clock):
+    cache = make_cache(tmp_path, wiki)
+    assert answer(cache, "What is RAG?", {'answer': 'a1'}) is None
+    assert answer(cache, "  what is   rag? ") == {'answer': 'a1'}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Model and history are part of the key
+    assert answer(cache, "What is RAG?", model='other') is None
+    assert answer(cache, "What is RAG?", history=[]) is None
+
+
+def test_ttl(tmp_path, wiki, clock):
+    cache = make_cache(tmp_path, wiki, ttl_seconds=60)
+    answer(cache, "q", {'answer': 'a'})
+    clock.now += 59
+    assert answer(cache, "q") == {'answer': 'a'}
+    clock.now += 2
+    assert answer(cache, "q") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction(tmp_path, wiki, clock):
+    cache = make_cache(tmp_path, wiki, max_entries=2)
+    for question in ("q1", "q2"):
+        answer(cache, question, {'answer': question})
+        clock.now += 1
+    # q1 is used again, so q2 is now the least recently used
+    assert answer(cache, "q1") == {'answer': 'q1'}
+    clock.now += 1
+    answer(cache, "q3", {'answer': 'q3'})
+
+    assert answer(cache, "q1") == {'answer': 'q1'}
+    assert answer(cache, "q2") is None
+    assert answer(cache, "q3") == {'answer': 'q3'}
+
+
+def test_wiki_change_invalidates_answers(tmp_path, wiki, clock):
+    cache = make_cache(tmp_path, wiki)
+    answer(cache, "q", {'answer': 'old'})
+
+    page = wiki / "page.md"
+    page.write_text("second, longer version")
+    os.utime(page, ns=(page.stat().st_atime_ns, page.stat().st_mtime_ns + 10 ** 9))
+    assert answer(cache, "q") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_answer_for_older_wiki_is_not_stored(tmp_path, wiki, clock):
+    cache = make_cache(tmp_path, wiki)
+    key, _ = cache.lookup("q", 'm', HISTORY)
+
+    # The wiki is rebuilt while the agent is still answering
+    (wiki / "new_page.md").write_text("new")
+    cache.put(key, {'answer': 'stale'})
+    assert cache.stats()['entries'] == 0
+
+
+def test_normalize_question():
+    assert normalize_question("  What IS\tRAG? ") == "what is rag?"
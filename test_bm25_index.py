@@ -0,0 +1,70 @@
+"""
+Tests for the inverted-index BM25 against rank_bm25's BM25Okapi.
+
+Run with: python -m pytest test_bm25_index.py
+rank_bm25 is no longer a requirement; the comparison tests are skipped
+without it.
+"""
+import numpy as np
+import pytest
+
+from search_engine_utils.bm25_index import BM25Index
+
+VOCAB = [f"w{i}" for i in range(300)]
+
+
+def random_corpus(num_docs=500, seed=0):
+    rng = np.random.default_rng(seed)
+    # Zipf-like term distribution so some terms fall in more than half the docs
+    weights = 1 / np.arange(1, len(VOCAB) + 1)
+    weights /= weights.sum()
+    return [
+        list(rng.choice(VOCAB, size=int(rng.integers(0, 60)), p=weights))
+        for _ in range(num_docs)
+    ]
+
+
+QUERIES = [
+    ["w0"],
+    ["w1", "w5", "w250"],
+    ["w3", "w3", "w40"],  # repeated term
+    ["w7", "unknown"],
+    ["unknown"],
+    [],
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_bm25okapi(query):
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    corpus = random_corpus()
+    expected = rank_bm25.BM25Okapi(corpus).get_scores(query)
+    np.testing.assert_allclose(BM25Index(corpus).get_scores(query), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_top_k_is_best_positive_scores():
+    corpus = random_corpus()
+    index = BM25Index(corpus)
+    query = ["w1", "w5", "w250"]
+    scores = index.get_scores(query)
+
+    ids, top_scores = index.top_k(query, 10)
+    assert len(ids) == 10
+    assert np.all(np.diff(top_scores) <= 0)
+    np.testing.assert_allclose(top_scores, np.sort(scores)[::-1][:10])
+    np.testing.assert_allclose(scores[ids], top_scores)
+
+    assert len(index.top_k(["unknown"], 10)[0]) == 0
+
+
+def test_save_load_roundtrip(tmp_path):
+    corpus = random_corpus(num_docs=100)
+    index = BM25Index(corpus)
+    index.save(tmp_path / "bm25", "fp1")
+
+    loaded = BM25Index.load(tmp_path / "bm25", "fp1")
+    query = ["w2", "w9"]
+    np.testing.assert_allclose(loaded.get_scores(query), index.get_scores(query))
+
+    # A different corpus/config fingerprint means the saved index is stale
+    assert BM25Index.load(tmp_path / "bm25", "fp2") is None
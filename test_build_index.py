@@ -0,0 +1,82 @@
+"""
+Tests for incremental index builds and FAISS rebuilds.
+
+Run with: python -m pytest test_build_index.py
+No Ollama server is needed: embeddings are written to the store directly and
+the incremental build has no new papers to embed.
+"""
+import json
+import sys
+
+import numpy as np
+
+import rebuild_faiss
+from build_index import build_index, save_processed_papers
+from rebuild_faiss import rebuild_index
+from search_engine_utils.config import SearchEngineConfig
+from search_engine_utils.embeddings_manager import EmbeddingsManager
+
+
+def make_index_dir(tmp_path, num_papers=20, chunks_per_paper=15, dim=16):
+    """Write a Flat-config index dir with random unit vectors and a summaries file."""
+    config = SearchEngineConfig(index_base_dir=str(tmp_path / "indices"))
+    index_dir = config.get_index_dir()
+    index_dir.mkdir(parents=True)
+    config.save(index_dir / "config.json")
+
+    rng = np.random.default_rng(0)
+    urls = [f"https://arxiv.org/abs/2401.{i:05d}" for i in range(num_papers)]
+    text_embeddings, metadatas = [], []
+    for url in urls:
+        for j in range(chunks_per_paper):
+            text_embeddings.append((f"{url} chunk {j}", rng.standard_normal(dim).astype(np.float32)))
+            metadatas.append({'paper_id': url, 'chunk_index': j})
+    EmbeddingsManager(index_dir, normalize=True).append_embeddings(text_embeddings, metadatas, urls)
+    save_processed_papers(index_dir, set(urls))
+
+    summaries_file = tmp_path / "summaries.jsonl"
+    with open(summaries_file, 'w') as f:
+        for url in urls:
+            f.write(json.dumps({'url': url, 'title': url}) + "\n")
+    return index_dir, summaries_file
+
+
+def test_incremental_build_keeps_index_layout(tmp_path):
+    index_dir, summaries_file = make_index_dir(tmp_path)
+    base_dir = str(tmp_path / "indices")
+
+    rebuild_index(index_dir, SearchEngineConfig(
+        index_base_dir=base_dir, faiss_index_type="IVFPQ",
+        ivf_nlist=4, ivf_nprobe=2, pq_m=4, pq_nbits=4, faiss_train_size=1000, rerank_k=50
+    ))
+
+    # CLI defaults (Flat, default IVF/PQ parameters) must not replace the saved layout
+    build_index(summaries_file, SearchEngineConfig(index_base_dir=base_dir))
+
+    saved = SearchEngineConfig.load(index_dir / "config.json")
+    assert saved.faiss_index_type == "IVFPQ"
+    assert (saved.ivf_nlist, saved.ivf_nprobe) == (4, 2)
+    assert (saved.pq_m, saved.pq_nbits) == (4, 4)
+    assert (saved.faiss_train_size, saved.rerank_k) == (1000, 50)
+    assert saved.faiss_metric == "IP"
+
+
+def test_rebuild_without_flags_keeps_index_layout(tmp_path, monkeypatch):
+    index_dir, _ = make_index_dir(tmp_path)
+    base_dir = str(tmp_path / "indices")
+    rebuild_index(index_dir, SearchEngineConfig(
+        index_base_dir=base_dir, faiss_index_type="IVFPQ",
+        ivf_nlist=4, ivf_nprobe=2, pq_m=4, pq_nbits=4, faiss_train_size=1000, rerank_k=50
+    ))
+
+    # What supervisor.sh runs on every restart
+    monkeypatch.setattr(sys, 'argv', ['rebuild_faiss.py', '--index-dir', str(index_dir)])
+    rebuild_faiss.main()
+    saved = SearchEngineConfig.load(index_dir / "config.json")
+    assert (saved.faiss_index_type, saved.rerank_k, saved.pq_m) == ("IVFPQ", 50, 4)
+
+    # Flags given on the command line still win
+    monkeypatch.setattr(sys, 'argv', ['rebuild_faiss.py', '--index-dir', str(index_dir), '--faiss-type', 'Flat'])
+    rebuild_faiss.main()
+    saved = SearchEngineConfig.load(index_dir / "config.json")
+    assert (saved.faiss_index_type, saved.rerank_k) == ("Flat", 50)
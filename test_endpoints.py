@@ -6,6 +6,7 @@ Tests both FAISS vector search and wiki-based Q&A.
 """
 import requests
 import json
+import time
 
 API_URL = "http://localhost:5001"
 
@@ -77,17 +78,42 @@ def test_wiki_qa():
             "question": "总结一下 agent systems 这个主题，有哪些代表性论文？",
             "model": "minimax-m2.7:cloud"
         },
-        timeout=120  # 2 minutes timeout
+        timeout=10
     )
 
-    if response.status_code == 200:
+    # Answered from the answer cache without running the agent
+    if response.status_code == 200 and response.json().get('cached'):
         data = response.json()
-        print("✓ Answer received:\n")
+        print("✓ Answer received (cached):\n")
         print(data['answer'])
         print(f"\n(Model: {data['model']})")
-    else:
+        return
+
+    if response.status_code != 202:
         print(f"✗ Error: {response.status_code}")
         print(response.text)
+        return
+
+    # Poll the job, printing agent output as it arrives
+    job_id = response.json()['job_id']
+    print(f"Job {job_id} queued, polling...\n")
+    offset = 0
+    deadline = time.time() + 360
+    while time.time() < deadline:
+        job = requests.get(f"{API_URL}/jobs/{job_id}", params={"offset": offset}, timeout=10).json()
+        print(job['output'], end="")
+        offset = job['offset']
+        if job['status'] == 'completed':
+            print("\n✓ Answer received:\n")
+            print(job['result']['answer'])
+            print(f"\n(Model: {job['result']['model']})")
+            return
+        if job['status'] == 'failed':
+            print(f"✗ Job failed: {job['error']}")
+            return
+        time.sleep(2)
+
+    print("✗ Timed out waiting for the job")
 
 
 def main():
@@ -0,0 +1,82 @@
+"""
+Tests for HybridRetriever score fusion.
+
+Run with: python -m pytest test_hybrid_retriever.py
+Query embeddings come from a fixed table, so no Ollama server is needed.
+"""
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from search_engine_utils.faiss_vectorstore import faiss_store_kwargs
+from search_engine_utils.hybrid_retriever import HybridRetriever
+
+DIM = 8
+
+
+class TableEmbeddings(Embeddings):
+    """Embeddings looked up from a dict (unit vectors)."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text].tolist()
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_retriever(**kwargs):
+    """
+    60 filler documents near the query plus one "zebra" document that BM25
+    ranks first but whose vector is orthogonal to the query.
+    """
+    rng = np.random.default_rng(0)
+    query_vector = unit(np.eye(DIM)[0])
+    texts, vectors = [], []
+    for i in range(60):
+        texts.append(f"filler document number {i} about agents")
+        vectors.append(unit(query_vector + rng.normal(scale=0.5, size=DIM)))
+    texts.append("zebra zebra zebra")
+    vectors.append(unit(np.eye(DIM)[1]))
+
+    embeddings = TableEmbeddings({"zebra": query_vector})
+    db = FAISS.from_embeddings(
+        list(zip(texts, vectors)), embeddings,
+        metadatas=[{'row': i} for i in range(len(texts))],
+        **faiss_store_kwargs("IP")
+    )
+    documents = [Document(page_content=text, metadata={'row': i}) for i, text in enumerate(texts)]
+    retriever = HybridRetriever(documents, embeddings, faiss_db=db, **kwargs)
+    return retriever, np.array(vectors) @ query_vector
+
+
+@pytest.mark.parametrize("candidate_k", [0, 10])
+def test_threshold_applies_to_bm25_candidates(candidate_k):
+    retriever, similarities = make_retriever(similarity_threshold=0.5)
+    results = retriever.similarity_search("zebra", k=61, candidate_k=candidate_k)
+
+    rows = [doc.metadata['row'] for doc in results]
+    assert 60 not in rows
+    assert all(similarities[row] >= 0.5 for row in rows)
+
+
+def test_bm25_candidates_without_threshold():
+    retriever, _ = make_retriever()
+    results = retriever.similarity_search("zebra", k=5, candidate_k=10)
+    assert 60 in [doc.metadata['row'] for doc in results]
+
+
+def test_row_similarities_match_faiss():
+    retriever, similarities = make_retriever()
+    query_vector = retriever._query_vector("zebra")
+    rows = np.array([3, 60, 17])
+    np.testing.assert_allclose(retriever._row_similarities(query_vector, rows), similarities[rows], atol=1e-5)
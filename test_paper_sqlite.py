@@ -0,0 +1,150 @@
+"""
+Tests for incremental sync of the papers SQLite database.
+
+Run with: python -m pytest test_paper_sqlite.py
+Covers appended and rewritten summaries.jsonl lines, notes files and the
+full-text index the triggers keep in sync.
+"""
+import json
+
+import pytest
+
+from search_engine_utils.paper_sqlite import PaperSqliteManager
+
+
+def paper(i, content=None, date="2024-01-01"):
+    return {
+        'title': f"Paper {i}",
+        'url': f"https://arxiv.org/abs/2401.{i:05d}",
+        'published_at': "2024-01-01",
+        'content': content or f"summary number {i}",
+        'date': date,
+    }
+
+
+def append_papers(path, papers):
+    with open(path, 'a') as f:
+        for p in papers:
+            f.write(json.dumps(p) + "\n")
+
+
+def titles(db, query):
+    return {row['title'] for row in db.fulltext(query)}
+
+
+def notes_of(db, title):
+    return db.query_dict(f"SELECT personal_notes FROM papers WHERE title = '{title}'")[0]['personal_notes']
+
+
+@pytest.fixture
+def files(tmp_path):
+    summaries = tmp_path / "summaries.jsonl"
+    notes_dir = tmp_path / "notes"
+    notes_dir.mkdir()
+    append_papers(summaries, [paper(0, "transformers for retrieval"), paper(1, date="2024-01-02")])
+    (notes_dir / "2024-01-01.md").write_text("read this on the train")
+    return summaries, notes_dir
+
+
+def make_db(tmp_path, files, **kwargs):
+    summaries, notes_dir = files
+    return PaperSqliteManager(summaries, tmp_path / "papers.sqlite", notes_dir=notes_dir, **kwargs)
+
+
+def test_create_database(tmp_path, files):
+    db = make_db(tmp_path, files)
+    assert db.last_build['papers'] == 2
+    assert notes_of(db, "Paper 0") == "read this on the train"
+    assert notes_of(db, "Paper 1") is None
+    assert titles(db, "retrieval") == {"Paper 0"}
+    assert titles(db, "train") == {"Paper 0"}
+    assert db.sync()['mode'] == 'unchanged'
+
+
+def test_appended_lines_are_upserted(tmp_path, files):
+    summaries, _ = files
+    db = make_db(tmp_path, files)
+    # A new paper, and a later line for an existing title replacing its content
+    append_papers(summaries, [paper(2, "graph neural networks"), paper(0, "diffusion models for images")])
+
+    result = db.sync()
+    assert (result['mode'], result['rows']) == ('incremental', 2)
+    assert db.query_dict("SELECT COUNT(*) AS n FROM papers")[0]['n'] == 3
+    assert titles(db, "graph") == {"Paper 2"}
+    assert titles(db, "diffusion") == {"Paper 0"}
+    # The old content is gone from the full-text index
+    assert titles(db, "transformers") == set()
+    # New rows get the notes of their date
+    assert notes_of(db, "Paper 2") == "read this on the train"
+
+    # Reopening an existing database syncs it rather than rebuilding
+    append_papers(summaries, [paper(3)])
+    reopened = make_db(tmp_path, files)
+    assert reopened.last_build is None
+    assert reopened.last_sync['mode'] == 'incremental'
+    assert titles(reopened, "number 3") == {"Paper 3"}
+
+
+def test_partial_last_line_waits(tmp_path, files):
+    summaries, _ = files
+    db = make_db(tmp_path, files)
+    line = json.dumps(paper(2, "half written"))
+    with open(summaries, 'a') as f:
+        f.write(line[:20])
+    assert db.sync()['mode'] == 'unchanged'
+
+    with open(summaries, 'a') as f:
+        f.write(line[20:] + "\n")
+    assert db.sync()['rows'] == 1
+    assert titles(db, "half written") == {"Paper 2"}
+
+
+def test_rewritten_file_rebuilds(tmp_path, files):
+    summaries, _ = files
+    db = make_db(tmp_path, files)
+    summaries.write_text(json.dumps(paper(5, "completely different corpus")) + "\n")
+
+    assert db.sync()['mode'] == 'rebuild'
+    assert db.query_dict("SELECT title FROM papers") == [{'title': "Paper 5"}]
+    assert titles(db, "retrieval") == set()
+    assert titles(db, "different") == {"Paper 5"}
+
+
+def test_notes_changes(tmp_path, files):
+    _, notes_dir = files
+    db = make_db(tmp_path, files)
+
+    (notes_dir / "2024-01-01.md").write_text("revisit the ablation section")
+    (notes_dir / "2024-01-02.md").write_text("compare with baseline")
+    result = db.sync()
+    assert (result['mode'], result['notes']) == ('incremental', 2)
+    assert notes_of(db, "Paper 0") == "revisit the ablation section"
+    assert titles(db, "ablation") == {"Paper 0"}
+    assert titles(db, "train") == set()
+    assert titles(db, "baseline") == {"Paper 1"}
+
+    (notes_dir / "2024-01-02.md").unlink()
+    assert db.sync()['notes'] == 1
+    assert notes_of(db, "Paper 1") is None
+    assert titles(db, "baseline") == set()
+
+
+def test_sync_if_changed(tmp_path, files):
+    summaries, notes_dir = files
+    db = make_db(tmp_path, files, sync_interval=0)
+    assert db.sync_if_changed() is None
+
+    append_papers(summaries, [paper(2, "sparse attention")])
+    assert db.sync_if_changed()['rows'] == 1
+    assert titles(db, "sparse") == {"Paper 2"}
+    # The fuzzy title matcher sees the new title
+    assert [row['title'] for row in db.fuzzy_titles("Paper 2", k=1)] == ["Paper 2"]
+    assert db.sync_if_changed() is None
+
+    (notes_dir / "2024-01-01.md").write_text("notes edited again, longer this time")
+    assert db.sync_if_changed()['notes'] == 1
+
+    # Checked at most every sync_interval seconds
+    db.sync_interval = 3600
+    append_papers(summaries, [paper(3)])
+    assert db.sync_if_changed() is None
@@ -0,0 +1,93 @@
+"""
+Tests for FuzzyMatcher against the plain fuzzy_match() UDF.
+
+Run with: python -m pytest test_search_utils.py
+"""
+import pytest
+
+from search_engine_utils.search_utils import FuzzyMatcher, fuzzy_match
+
+CORPUS = [
+    "Attention Is All You Need",
+    "BERT: Pre-training of Deep Bidirectional Transformers for Language Understanding",
+    "Retrieval-Augmented Generation for Knowledge-Intensive NLP Tasks",
+    "Dense Passage Retrieval for Open-Domain Question Answering",
+    "Language Models are Few-Shot Learners",
+    "LoRA: Low-Rank Adaptation of Large Language Models",
+    "Denoising Diffusion Probabilistic Models",
+    "Généralisation des modèles de langue",
+    "Scaling Laws for Neural Language Models",
+    "Chain-of-Thought Prompting Elicits Reasoning in Large Language Models",
+    "Deep Residual Learning for Image Recognition",
+    "An Image is Worth 16x16 Words: Transformers for Image Recognition at Scale",
+    "ResNet",
+    "GPT-4 Technical Report",
+    "Q8",
+]
+
+TERMS = [
+    "attention",
+    "retreival augmented generation",  # typo
+    "language models",
+    "large language model lora",
+    "diffusion",
+    "generalisation modeles",
+    "image recognition transformer",
+    "resnet",
+    "gpt 4",
+    "q8",
+    "zzz unrelated",
+]
+
+
+def trigram_candidates(trigrams):
+    """Texts containing any of the trigrams, like an FTS5 trigram index."""
+    return [text for text in CORPUS if any(trigram in text.lower() for trigram in trigrams)]
+
+
+def shares_trigram(text, matcher, term):
+    _, trigrams, _, _ = matcher._term(term)
+    return not trigrams or any(trigram in text.lower() for trigram in trigrams)
+
+
+@pytest.mark.parametrize("batch_min", [1, 1000])
+@pytest.mark.parametrize("term", TERMS)
+def test_matches_fuzzy_match(term, batch_min):
+    matcher = FuzzyMatcher(trigram_candidates, lambda: CORPUS, batch_min=batch_min)
+    for text in CORPUS:
+        # Texts without a trigram of the term are never candidates (see FuzzyMatcher)
+        expected = fuzzy_match(text, term) if shares_trigram(text, matcher, term) else 0
+        assert matcher(text, term) == expected, text
+
+
+@pytest.mark.parametrize("term", TERMS)
+def test_texts_outside_the_corpus(term):
+    matcher = FuzzyMatcher(trigram_candidates, lambda: CORPUS[:5])
+    for text in CORPUS[5:]:
+        expected = fuzzy_match(text, term) if shares_trigram(text, matcher, term) else 0
+        assert matcher(text, term) == expected, text
+
+
+def test_best_is_sorted_fuzzy_matches():
+    matcher = FuzzyMatcher(trigram_candidates, lambda: CORPUS)
+    best = matcher.best("language models")
+    assert {text for text, _ in best} == {text for text in CORPUS if fuzzy_match(text, "language models")}
+    scores = [score for _, score in best]
+    assert scores == sorted(scores, reverse=True)
+    assert best[:2] == matcher.best("language models", limit=2)
+
+
+def test_none_and_refresh():
+    corpus = list(CORPUS[:3])
+    matcher = FuzzyMatcher(
+        lambda trigrams: [text for text in corpus if any(t in text.lower() for t in trigrams)],
+        lambda: corpus
+    )
+    assert matcher(None, "attention") == 0
+    assert matcher("Attention Is All You Need", None) == 0
+    assert len(matcher.best("attention")) == 1
+
+    # Titles added since are found once the matcher is refreshed
+    corpus.append("Attention Is Not All You Need")
+    matcher.refresh()
+    assert len(matcher.best("attention")) == 2
@@ -0,0 +1,93 @@
+"""
+Tests for the write-behind /ask_wiki session store.
+
+Run with: python -m pytest test_session_store.py
+"""
+import json
+import time
+
+from search_engine_utils.session_store import SessionStore
+
+
+def turn(i):
+    return [{'role': 'user', 'content': f'q{i}'}, {'role': 'assistant', 'content': f'a{i}'}]
+
+
+def stored_count(store, session_id):
+    with store._connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+
+def test_append_is_written_behind(tmp_path):
+    store = SessionStore(tmp_path, flush_interval=60, batch_size=1000)
+    store.append('s1', turn(1))
+    assert stored_count(store, 's1') == 0
+    assert store.stats()['pending_messages'] == 2
+
+    # get() flushes the session's pending messages first
+    assert store.get('s1') == turn(1)
+    assert stored_count(store, 's1') == 2
+
+
+def test_background_flush(tmp_path):
+    store = SessionStore(tmp_path, flush_interval=0.05)
+    store.append('s1', turn(1))
+    deadline = time.monotonic() + 5
+    while stored_count(store, 's1') < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert stored_count(store, 's1') == 2
+
+
+def test_full_batch_wakes_flusher(tmp_path):
+    store = SessionStore(tmp_path, flush_interval=60, batch_size=4)
+    store.append('s1', turn(1))
+    store.append('s1', turn(2))
+    deadline = time.monotonic() + 5
+    while stored_count(store, 's1') < 4 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert stored_count(store, 's1') == 4
+
+
+def test_history_is_trimmed(tmp_path):
+    store = SessionStore(tmp_path, max_messages=4, flush_interval=60)
+    for i in range(5):
+        store.append('s1', turn(i))
+    store.append('s2', turn(0))
+    store.flush()
+
+    assert store.get('s1') == turn(3) + turn(4)
+    assert stored_count(store, 's1') == 4
+    assert store.get('s2') == turn(0)
+
+
+def test_cached_history_sees_writes_from_other_processes(tmp_path):
+    store = SessionStore(tmp_path, flush_interval=60)
+    other = SessionStore(tmp_path, flush_interval=60)
+    store.append('s1', turn(1))
+    assert store.get('s1') == turn(1)
+
+    other.append('s1', turn(2))
+    other.flush()
+    assert store.get('s1') == turn(1) + turn(2)
+
+
+def test_persists_across_instances_and_exports(tmp_path):
+    store = SessionStore(tmp_path, flush_interval=60)
+    store.append('s1', turn(1))
+    store.append('s2', turn(2))
+    store.flush()
+
+    reopened = SessionStore(tmp_path)
+    assert reopened.get('s1') == turn(1)
+    assert reopened.get('unknown') == []
+
+    export = tmp_path / "sessions.jsonl"
+    assert reopened.export_jsonl(export) == 2
+    lines = [json.loads(line) for line in export.read_text().splitlines()]
+    assert lines == [{'session_id': 's1', 'messages': turn(1)}, {'session_id': 's2', 'messages': turn(2)}]
+
+
+def test_imports_legacy_json_files(tmp_path):
+    (tmp_path / "old.json").write_text(json.dumps(turn(1) + turn(2)))
+    store = SessionStore(tmp_path, max_messages=2)
+    assert store.get('old') == turn(2)
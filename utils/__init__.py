@@ -5,6 +5,7 @@ This package contains modular utility functions organized by domain:
 - ai_utils: AI model interactions (summaries, quizzes, flowcharts)
 - huggingface_utils: HuggingFace API interactions
 - arxiv_utils: arXiv PDF downloading and processing
+- pdf_cache: Persistent PDF/extracted-text cache used by arxiv_utils
 - google_chat_utils: Google Chat webhook integrations
 - html_utils: HTML/markdown rendering utilities
 - file_utils: File I/O operations
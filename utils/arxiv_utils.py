@@ -11,7 +11,20 @@ import requests
 from pypdf import PdfReader
 from loguru import logger
 
+from .pdf_cache import PdfCache
+
 PDF_CACHE_DIR = os.path.expanduser("~/daily_paper/pdf_cache")
+PDF_STORE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_MB", "4096")) * 1024 * 1024
+
+_pdf_store = None
+
+
+def get_pdf_store():
+    """Shared PDF/text cache under PDF_CACHE_DIR/store (opened on first use)."""
+    global _pdf_store
+    if _pdf_store is None:
+        _pdf_store = PdfCache(os.path.join(PDF_CACHE_DIR, "store"), max_bytes=PDF_STORE_MAX_BYTES)
+    return _pdf_store
 
 
 def extract_arxiv_id(paper_info):
@@ -57,9 +70,9 @@ def get_arxiv_pdf_url(paper_info):
     return f"http://arxiv.org/pdf/{arxiv_id}"
 
 
-def download_paper_text(paper_info):
+def fetch_paper_pdf(paper_info):
     """
-    Download and extract text from a paper PDF.
+    Download the raw PDF bytes of a paper (network only, no parsing).
 
     Args:
         paper_info: Either a dict with paper_id/url or a string ID
@@ -69,8 +82,7 @@ def download_paper_text(paper_info):
             "success": bool,
             "message": str,
             "pdf_url": str or None,
-            "text": str or None,
-            "pages": int
+            "content": bytes or None
         }
     """
     pdf_url = get_arxiv_pdf_url(paper_info)
@@ -79,15 +91,95 @@ def download_paper_text(paper_info):
             "success": False,
             "message": "Not an arXiv paper or invalid paper information",
             "pdf_url": None,
-            "text": None,
-            "pages": 0
+            "content": None
+        }
+
+    arxiv_id = extract_arxiv_id(paper_info)
+    try:
+        cached = get_pdf_store().get_pdf(arxiv_id)
+    except Exception as e:
+        logger.warning(f"PDF store read failed: {e}")
+        cached = None
+    if cached is not None:
+        return {
+            "success": True,
+            "message": "Loaded PDF from cache",
+            "pdf_url": cached[1] or pdf_url,
+            "content": cached[0]
         }
 
     try:
         response = requests.get(pdf_url)
         response.raise_for_status()
+        try:
+            get_pdf_store().put_pdf(arxiv_id, response.content, pdf_url)
+        except Exception as e:
+            logger.warning(f"PDF store write failed: {e}")
+        return {
+            "success": True,
+            "message": "Successfully downloaded PDF",
+            "pdf_url": pdf_url,
+            "content": response.content
+        }
+
+    except requests.RequestException as e:
+        logger.error(f"Error downloading PDF: {e}")
+        return {
+            "success": False,
+            "message": f"Failed to download PDF: {str(e)}",
+            "pdf_url": pdf_url,
+            "content": None
+        }
+
+
+def get_cached_paper_text(paper_info, count_miss=True):
+    """
+    Look up already extracted text in the PDF store (no network, no parsing).
+
+    Args:
+        paper_info: Either a dict with paper_id/url or a string ID
+        count_miss: Count a store miss; pass False when fetch_paper_pdf is
+            called next, since its PDF lookup counts the paper
+
+    Returns:
+        dict in download_paper_text format, or None on a cache miss
+    """
+    arxiv_id = extract_arxiv_id(paper_info)
+    if not arxiv_id:
+        return None
+
+    try:
+        cached = get_pdf_store().get_text(arxiv_id, count_miss=count_miss)
+    except Exception as e:
+        logger.warning(f"PDF store read failed: {e}")
+        return None
+    if cached is None:
+        return None
+
+    text, pages, pdf_url = cached
+    return {
+        "success": True,
+        "message": "Loaded extracted text from cache",
+        "pdf_url": pdf_url or get_arxiv_pdf_url(arxiv_id),
+        "text": text,
+        "pages": pages
+    }
+
+
+def extract_paper_text(paper_info, pdf_bytes, pdf_url=None):
+    """
+    Extract text from already downloaded PDF bytes (CPU only, no network).
 
-        pdf_file = io.BytesIO(response.content)
+    Args:
+        paper_info: Either a dict with paper_id/url or a string ID
+        pdf_bytes: Raw PDF content
+        pdf_url: URL the PDF was downloaded from (reported back in the result)
+
+    Returns:
+        dict: same shape as download_paper_text
+    """
+    try:
+        pdf_file = io.BytesIO(pdf_bytes)
         pdf_reader = PdfReader(pdf_file)
         num_pages = len(pdf_reader.pages)
 
@@ -110,6 +202,14 @@ def download_paper_text(paper_info):
         except Exception as e:
             logger.warning(f"PDF cache write failed: {e}")
 
+        # Keep bytes + text in the PDF store so later runs skip download and parsing
+        try:
+            arxiv_id = extract_arxiv_id(paper_info)
+            if arxiv_id:
+                get_pdf_store().put_text(arxiv_id, pdf_bytes, text, num_pages, pdf_url)
+        except Exception as e:
+            logger.warning(f"PDF store write failed: {e}")
+
         return {
             "success": True,
             "message": "Successfully downloaded and extracted text",
@@ -118,22 +218,45 @@ def download_paper_text(paper_info):
             "pages": num_pages
         }
 
-    except requests.RequestException as e:
-        logger.error(f"Error downloading PDF: {e}")
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {e}")
         return {
             "success": False,
-            "message": f"Failed to download PDF: {str(e)}",
+            "message": f"Failed to extract text: {str(e)}",
             "pdf_url": pdf_url,
             "text": None,
             "pages": 0
         }
 
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {e}")
+
+def download_paper_text(paper_info):
+    """
+    Download and extract text from a paper PDF.
+
+    Args:
+        paper_info: Either a dict with paper_id/url or a string ID
+
+    Returns:
+        dict: {
+            "success": bool,
+            "message": str,
+            "pdf_url": str or None,
+            "text": str or None,
+            "pages": int
+        }
+    """
+    cached = get_cached_paper_text(paper_info, count_miss=False)
+    if cached is not None:
+        return cached
+
+    download = fetch_paper_pdf(paper_info)
+    if not download["success"]:
         return {
             "success": False,
-            "message": f"Failed to extract text: {str(e)}",
-            "pdf_url": pdf_url,
+            "message": download["message"],
+            "pdf_url": download["pdf_url"],
             "text": None,
             "pages": 0
         }
+
+    return extract_paper_text(paper_info, download["content"], download["pdf_url"])
@@ -0,0 +1,214 @@
+"""
+Persistent, content-addressed cache for arXiv PDFs and their extracted text.
+
+PDF bytes are stored once per SHA-256 under blobs/, with the extracted text
+next to them. A small SQLite index maps arXiv ids (with version, if given)
+to blobs and tracks last access for size-bounded LRU eviction. SQLite keeps
+the index safe to share between the download threads and parse processes
+of build_index.py --pipeline.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+
+class PdfCache:
+    """LRU-bounded cache of PDF bytes and extracted text keyed by arXiv id."""
+
+    def __init__(self, cache_dir, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Open (or create) the cache.
+
+        Args:
+            cache_dir: Directory for blobs/ and index.sqlite
+            max_bytes: Total size of cached PDFs + text before LRU eviction
+        """
+        self.cache_dir = Path(cache_dir)
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "index.sqlite"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                arxiv_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                pdf_url TEXT,
+                pages INTEGER,
+                has_text INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _pdf_path(self, sha256: str) -> Path:
+        return self.blobs_dir / f"{sha256}.pdf"
+
+    def _text_path(self, sha256: str) -> Path:
+        return self.blobs_dir / f"{sha256}.txt"
+
+    def _lookup(self, arxiv_id: str):
+        """Return the entry row for arxiv_id and mark it recently used."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sha256, pdf_url, pages, has_text FROM entries WHERE arxiv_id = ?",
+                (arxiv_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE arxiv_id = ?",
+                    (time.time(), arxiv_id)
+                )
+        return row
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_pdf(self, arxiv_id: str):
+        """
+        Cached PDF bytes for an arXiv id.
+
+        Returns:
+            (pdf_bytes, pdf_url), or None on a miss
+        """
+        row = self._lookup(arxiv_id)
+        path = self._pdf_path(row[0]) if row else None
+        if path is None or not path.exists():
+            self._count(False)
+            return None
+        self._count(True)
+        return path.read_bytes(), row[1]
+
+    def get_text(self, arxiv_id: str, count_miss: bool = True):
+        """
+        Cached extracted text for an arXiv id.
+
+        Args:
+            arxiv_id: arXiv id
+            count_miss: Count a miss; callers that fall back to get_pdf pass
+                False so the paper is counted once, by that lookup
+
+        Returns:
+            (text, pages, pdf_url), or None on a miss
+        """
+        row = self._lookup(arxiv_id)
+        path = self._text_path(row[0]) if row and row[3] else None
+        if path is None or not path.exists():
+            if count_miss:
+                self._count(False)
+            return None
+        self._count(True)
+        return path.read_text(encoding="utf-8"), row[2], row[1]
+
+    def put_pdf(self, arxiv_id: str, pdf_bytes: bytes, pdf_url: str = None) -> str:
+        """
+        Store PDF bytes for an arXiv id.
+
+        Returns:
+            SHA-256 of the PDF (the blob name)
+        """
+        sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+        path = self._pdf_path(sha256)
+        if not path.exists():
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(pdf_bytes)
+            tmp_path.replace(path)
+
+        with self._connect() as conn:
+            conn.execute("""
+            INSERT INTO entries (arxiv_id, sha256, pdf_url, pages, has_text, size, last_access)
+            VALUES (?, ?, ?, 0, 0, ?, ?)
+            ON CONFLICT(arxiv_id) DO UPDATE SET
+                sha256 = excluded.sha256,
+                pdf_url = excluded.pdf_url,
+                has_text = CASE WHEN sha256 = excluded.sha256 THEN has_text ELSE 0 END,
+                size = CASE WHEN sha256 = excluded.sha256 THEN size ELSE excluded.size END,
+                last_access = excluded.last_access
+            """, (arxiv_id, sha256, pdf_url, len(pdf_bytes), time.time()))
+
+        self._evict()
+        return sha256
+
+    def put_text(self, arxiv_id: str, pdf_bytes: bytes, text: str, pages: int, pdf_url: str = None):
+        """Store the PDF and its extracted text for an arXiv id."""
+        sha256 = self.put_pdf(arxiv_id, pdf_bytes, pdf_url)
+        path = self._text_path(sha256)
+        encoded = text.encode("utf-8")
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(encoded)
+        tmp_path.replace(path)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET pages = ?, has_text = 1, size = ? WHERE arxiv_id = ?",
+                (pages, len(pdf_bytes) + len(encoded), arxiv_id)
+            )
+
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            evicted = []
+            for arxiv_id, sha256, size in conn.execute(
+                "SELECT arxiv_id, sha256, size FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE arxiv_id = ?", (arxiv_id,))
+                total -= size
+                evicted.append(sha256)
+
+            # Blobs are shared by content; only delete ones nothing points to
+            for sha256 in set(evicted):
+                in_use = conn.execute(
+                    "SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)
+                ).fetchone()
+                if not in_use:
+                    self._pdf_path(sha256).unlink(missing_ok=True)
+                    self._text_path(sha256).unlink(missing_ok=True)
+
+        logger.info(f"PDF cache evicted {len(evicted)} entries")
+
+    def stats(self) -> dict:
+        """Hit/miss counters (this process) and current size."""
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes
+        }